@@ -0,0 +1,134 @@
+"""
+Benchmark do tempo de import (partida a frio) do serviço e de cada capacidade.
+
+Cada medição roda num processo Python novo (nada em cache no sys.modules):
+importa transcribe_whisper (o que o servidor paga antes de aceitar
+conexões) e em seguida carrega a capacidade pedida pelo CapabilityLoader
+(o que o primeiro uso ou o aquecimento paga). Reporta a mediana das
+repetições; com --baseline, termina com código 1 se algum tempo regredir
+além da tolerância.
+
+Uso:
+    python benchmarks/bench_imports.py --repeat 5
+    python benchmarks/bench_imports.py --capabilities audio,ocr --update-baseline
+    python benchmarks/bench_imports.py --baseline benchmarks/import_baseline.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+SRC_DIR = Path(__file__).resolve().parent.parent / "src"
+sys.path.insert(0, str(SRC_DIR))
+
+from capabilities import CAPABILITY_MODULES  # noqa: E402
+
+DEFAULT_BASELINE = Path(__file__).resolve().parent / "import_baseline.json"
+
+# Executado num processo novo: imprime os tempos em JSON na última linha
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import transcribe_whisper as service
+server = time.perf_counter() - start
+capability = None
+if sys.argv[1]:
+    start = time.perf_counter()
+    service.capabilities.load(sys.argv[1])
+    capability = time.perf_counter() - start
+print(json.dumps({"server": server, "capability": capability}))
+"""
+
+
+def measure(capability: str, cwd: str) -> dict:
+    """Tempos de import de um processo novo (capability vazio = só o servidor)"""
+    env = {
+        **os.environ,
+        "PYTHONPATH": str(SRC_DIR),
+        "ENABLED_CAPABILITIES": capability or "all"
+    }
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE, capability],
+        cwd=cwd, env=env, capture_output=True, text=True
+    )
+    if output.returncode != 0:
+        raise RuntimeError(f"Falha ao importar {capability or 'servidor'}:\n{output.stderr[-2000:]}")
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def run(capabilities: list, repeat: int) -> dict:
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        # O serviço cria ./cache relativo ao cwd
+        measure("", tmp)  # aquece o cache de bytecode e o page cache do disco
+        for name in [""] + capabilities:
+            runs = [measure(name, tmp) for _ in range(repeat)]
+            key = name or "server"
+            field = "capability" if name else "server"
+            seconds = statistics.median(run[field] for run in runs)
+            results[key] = {"import_seconds": round(seconds, 3)}
+            print(f"{key:>10}: {seconds:.3f}s")
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Lista as regressões (tempo acima de baseline * (1 + tolerância))"""
+    regressions = []
+    for name, current in results.items():
+        expected = baseline.get(name)
+        if not expected:
+            continue
+        limit = expected["import_seconds"] * (1 + tolerance)
+        if current["import_seconds"] > limit:
+            regressions.append(
+                f"{name}: {current['import_seconds']}s > {expected['import_seconds']}s (+{tolerance:.0%})"
+            )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do tempo de import por capacidade")
+    parser.add_argument("--capabilities", default=",".join(CAPABILITY_MODULES),
+                        help="Capacidades separadas por vírgula")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Regressão tolerada (0.25 = 25%%)")
+    parser.add_argument("--update-baseline", action="store_true", help="Grava os resultados como novo baseline")
+    parser.add_argument("--json", type=Path, help="Grava o relatório em JSON")
+    args = parser.parse_args()
+
+    capabilities = [name for name in args.capabilities.split(",") if name]
+    unknown = [name for name in capabilities if name not in CAPABILITY_MODULES]
+    if unknown:
+        sys.exit(f"Capacidades desconhecidas: {', '.join(unknown)}")
+
+    results = run(capabilities, max(1, args.repeat))
+
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2), encoding="utf-8")
+        print(f"💾 Relatório salvo em {args.json}")
+
+    if args.update_baseline:
+        args.baseline.write_text(json.dumps(results, indent=2), encoding="utf-8")
+        print(f"📌 Baseline atualizado: {args.baseline}")
+        return
+
+    if not args.baseline.exists():
+        print(f"⚠️  Sem baseline em {args.baseline}; rode com --update-baseline para criar")
+        return
+
+    regressions = compare(results, json.loads(args.baseline.read_text(encoding="utf-8")), args.tolerance)
+    if regressions:
+        print("❌ Regressões no tempo de import:")
+        for regression in regressions:
+            print(f"   - {regression}")
+        sys.exit(1)
+    print("✅ Sem regressões em relação ao baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Benchmark fp32 x int8 (quantização dinâmica) dos modelos Whisper em CPU.
+
+Para cada modelo, transcreve o corpus nas duas precisões e reporta tempo,
+fator de tempo real (RTF), speedup do int8 e a diferença de WER. Arquivos
+de referência opcionais: para cada áudio, um .txt de mesmo nome com a
+transcrição correta; sem eles, o WER do int8 é medido contra a saída fp32.
+
+Uso:
+    python benchmarks/bench_quantization.py corpus/ --models tiny,base --threads 4
+"""
+import argparse
+import json
+import re
+import sys
+import time
+import unicodedata
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+import torch  # noqa: E402
+import whisper  # noqa: E402
+
+from quantization import PRECISIONS, load_model_variant, model_key  # noqa: E402
+
+AUDIO_EXTENSIONS = {".mp3", ".wav", ".m4a", ".ogg", ".opus", ".webm", ".flac", ".mp4"}
+
+
+def normalize(text: str) -> list:
+    """Minúsculas, sem pontuação nem acentos, separado em palavras"""
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return re.sub(r"[^\w\s]", " ", text).split()
+
+
+def word_error_rate(reference: str, hypothesis: str) -> float:
+    """WER por distância de edição entre palavras"""
+    ref, hyp = normalize(reference), normalize(hypothesis)
+    if not ref:
+        return 0.0 if not hyp else 1.0
+    previous = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, 1):
+        current = [i] + [0] * len(hyp)
+        for j, hyp_word in enumerate(hyp, 1):
+            current[j] = min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (ref_word != hyp_word)
+            )
+        previous = current
+    return previous[-1] / len(ref)
+
+
+def load_corpus(corpus_dir: Path) -> list:
+    corpus = []
+    for path in sorted(corpus_dir.iterdir()):
+        if path.suffix.lower() not in AUDIO_EXTENSIONS:
+            continue
+        reference = path.with_suffix(".txt")
+        corpus.append({
+            "name": path.name,
+            "audio": whisper.load_audio(str(path)),
+            "reference": reference.read_text(encoding="utf-8") if reference.exists() else None
+        })
+    return corpus
+
+
+def run(model, corpus: list, language: str) -> dict:
+    texts = {}
+    elapsed = 0.0
+    for item in corpus:
+        start = time.perf_counter()
+        result = model.transcribe(item["audio"], language=language, fp16=False, temperature=0.0)
+        elapsed += time.perf_counter() - start
+        texts[item["name"]] = result["text"].strip()
+    return {"seconds": elapsed, "texts": texts}
+
+
+def corpus_wer(corpus: list, texts: dict, references: dict) -> float:
+    scored = [item for item in corpus if references.get(item["name"])]
+    if not scored:
+        return None
+    return sum(word_error_rate(references[i["name"]], texts[i["name"]]) for i in scored) / len(scored)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark fp32 x int8 dos modelos Whisper")
+    parser.add_argument("corpus", type=Path, help="Diretório com os áudios (e .txt de referência)")
+    parser.add_argument("--models", default="tiny,base", help="Modelos separados por vírgula")
+    parser.add_argument("--language", default="pt")
+    parser.add_argument("--threads", type=int, default=0, help="Threads do torch (0 = padrão)")
+    parser.add_argument("--json", type=Path, help="Grava o relatório em JSON")
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    corpus = load_corpus(args.corpus)
+    if not corpus:
+        sys.exit(f"Nenhum áudio encontrado em {args.corpus}")
+    audio_seconds = sum(len(item["audio"]) for item in corpus) / whisper.audio.SAMPLE_RATE
+    print(f"📂 {len(corpus)} arquivos, {audio_seconds:.1f}s de áudio, {torch.get_num_threads()} threads")
+
+    report = {"files": len(corpus), "audio_seconds": round(audio_seconds, 2), "models": {}}
+    for model_name in [m.strip() for m in args.models.split(",") if m.strip()]:
+        runs = {}
+        for precision in PRECISIONS:
+            model = load_model_variant(model_key(model_name, precision))
+            # Aquecimento (alocação de buffers, kernels) fora da medição
+            model.transcribe(corpus[0]["audio"][:whisper.audio.SAMPLE_RATE], language=args.language, fp16=False)
+            runs[precision] = run(model, corpus, args.language)
+            del model
+
+        # Sem referências, a saída fp32 é a referência
+        references = {item["name"]: item["reference"] for item in corpus}
+        against = "referência" if any(references.values()) else "fp32"
+        if against == "fp32":
+            references = runs["fp32"]["texts"]
+
+        fp32, int8 = runs["fp32"], runs["int8"]
+        entry = {
+            "fp32_seconds": round(fp32["seconds"], 2),
+            "int8_seconds": round(int8["seconds"], 2),
+            "fp32_rtf": round(fp32["seconds"] / audio_seconds, 3),
+            "int8_rtf": round(int8["seconds"] / audio_seconds, 3),
+            "speedup": round(fp32["seconds"] / int8["seconds"], 2),
+            "wer_against": against,
+            "fp32_wer": corpus_wer(corpus, fp32["texts"], references) if against != "fp32" else 0.0,
+            "int8_wer": corpus_wer(corpus, int8["texts"], references)
+        }
+        entry["wer_delta"] = round(entry["int8_wer"] - entry["fp32_wer"], 4) if entry["int8_wer"] is not None else None
+        report["models"][model_name] = entry
+
+        print(
+            f"🧠 {model_name}: fp32 {entry['fp32_seconds']}s (RTF {entry['fp32_rtf']}) | "
+            f"int8 {entry['int8_seconds']}s (RTF {entry['int8_rtf']}) | "
+            f"speedup {entry['speedup']}x | ΔWER {entry['wer_delta']} (vs {against})"
+        )
+
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+        print(f"💾 Relatório salvo em {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,323 @@
+"""
+Benchmark offline do pipeline de transcrição (transcribe_whisper.transcribe_audio).
+
+Roda um corpus local (notas de voz curtas, clipes médios e vídeos longos)
+por cada combinação de modelo x filtro do WhatsApp x cache e reporta:
+fator de tempo real (RTF), latência p50/p95, pico de RSS e vazão. Com
+--baseline, compara com os números salvos e termina com código 1 se algum
+cenário regredir além da tolerância.
+
+Sem --corpus, gera um corpus sintético com ffmpeg (tons modulados com
+ruído, formatos reais: opus, m4a e mp4 com vídeo). Serve para medir
+desempenho, não qualidade; para números representativos use áudios reais.
+
+Uso:
+    python benchmarks/bench_transcribe.py --models tiny,base --repeat 3
+    python benchmarks/bench_transcribe.py --corpus corpus/ --update-baseline
+    python benchmarks/bench_transcribe.py --corpus corpus/ --baseline benchmarks/baseline.json
+"""
+import argparse
+import asyncio
+import io
+import itertools
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+SRC_DIR = Path(__file__).resolve().parent.parent / "src"
+sys.path.insert(0, str(SRC_DIR))
+
+DEFAULT_BASELINE = Path(__file__).resolve().parent / "baseline.json"
+
+# Categorias pela duração: (nome, duração sintética em s, formato, limite superior em s)
+CATEGORIES = [
+    ("short", 15, "ogg", 60),
+    ("medium", 150, "m4a", 600),
+    ("long", 900, "mp4", None)
+]
+
+CONTENT_TYPES = {
+    ".ogg": "audio/ogg", ".opus": "audio/ogg", ".mp3": "audio/mpeg", ".wav": "audio/wav",
+    ".m4a": "audio/m4a", ".webm": "audio/webm", ".flac": "audio/flac",
+    ".mp4": "video/mp4", ".mkv": "video/mkv", ".mov": "video/mov", ".avi": "video/avi"
+}
+
+# Métricas em que valores maiores são piores, com tolerância relativa padrão
+GATED_METRICS = ("rtf", "p50_seconds", "p95_seconds", "peak_rss_mb")
+
+
+class RssSampler:
+    """Amostra o RSS do processo em segundo plano e guarda o pico"""
+
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.peak = 0
+        self.stopping = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    @staticmethod
+    def current() -> int:
+        try:
+            with open("/proc/self/statm") as f:
+                return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except (OSError, ValueError):
+            # ru_maxrss (KB no Linux) é o pico do processo inteiro, não do cenário
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+    def _run(self):
+        while not self.stopping.is_set():
+            self.peak = max(self.peak, self.current())
+            self.stopping.wait(self.interval)
+
+    def __enter__(self):
+        self.peak = self.current()
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stopping.set()
+        self.thread.join()
+        self.peak = max(self.peak, self.current())
+
+
+def generate_corpus(directory: Path, categories: list) -> list:
+    """Gera áudios sintéticos com ffmpeg (envelope de fala: tom modulado + ruído)"""
+    files = []
+    for name, seconds, fmt, _ in categories:
+        path = directory / f"{name}.{fmt}"
+        source = (
+            f"sine=frequency=220:duration={seconds},"
+            f"volume='0.5*(0.6+0.4*sin(2*PI*3*t))*gt(sin(2*PI*0.25*t),-0.5)':eval=frame"
+        )
+        cmd = [
+            "ffmpeg", "-y", "-loglevel", "error",
+            "-f", "lavfi", "-i", source,
+            "-f", "lavfi", "-i", f"anoisesrc=color=pink:amplitude=0.02:duration={seconds}"
+        ]
+        if fmt == "mp4":
+            cmd += ["-f", "lavfi", "-i", f"testsrc=size=320x240:rate=10:duration={seconds}"]
+        cmd += ["-filter_complex", "[0:a][1:a]amix=inputs=2:duration=shortest[a]", "-map", "[a]"]
+        if fmt == "mp4":
+            cmd += ["-map", "2:v", "-c:v", "libx264", "-preset", "ultrafast", "-c:a", "aac"]
+        elif fmt == "ogg":
+            cmd += ["-c:a", "libopus", "-b:a", "24k"]
+        else:
+            cmd += ["-c:a", "aac", "-b:a", "64k"]
+        subprocess.run(cmd + [str(path)], check=True)
+        files.append((name, path))
+    return files
+
+
+def probe_seconds(path: Path) -> float:
+    output = subprocess.run(
+        ["ffprobe", "-v", "error", "-show_entries", "format=duration",
+         "-of", "default=noprint_wrappers=1:nokey=1", str(path)],
+        capture_output=True, text=True, check=True
+    ).stdout
+    return float(output.strip())
+
+
+def load_corpus(directory: Path) -> list:
+    """Classifica os arquivos do diretório em short/medium/long pela duração"""
+    files = []
+    for path in sorted(directory.iterdir()):
+        if path.suffix.lower() not in CONTENT_TYPES:
+            continue
+        seconds = probe_seconds(path)
+        for name, _, _, limit in CATEGORIES:
+            if limit is None or seconds < limit:
+                files.append((name, path))
+                break
+    return files
+
+
+def make_upload(path: Path, data: bytes):
+    from fastapi import UploadFile
+    from starlette.datastructures import Headers
+
+    return UploadFile(
+        file=io.BytesIO(data),
+        filename=path.name,
+        headers=Headers({"content-type": CONTENT_TYPES[path.suffix.lower()]})
+    )
+
+
+def percentile(values: list, q: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def run_scenario(service, files: list, model: str, whatsapp: bool, use_cache: bool,
+                       repeat: int, concurrency: int) -> dict:
+    """Executa o corpus repeat vezes e agrega as métricas por categoria"""
+    service.transcription_cache.clear()
+    if service.result_store is not None:
+        service.result_store.clear()
+
+    payloads = [(name, path, path.read_bytes(), probe_seconds(path)) for name, path in files]
+    semaphore = asyncio.Semaphore(concurrency)
+    samples = []
+
+    async def transcribe(name, path, data, seconds):
+        async with semaphore:
+            start = time.perf_counter()
+            result = await service.transcribe_audio(
+                file=make_upload(path, data),
+                language="pt",
+                use_cache=use_cache,
+                whatsapp_optimization=whatsapp,
+                long_media=False,
+                precision=None,
+                model=None if model == "auto" else model
+            )
+            samples.append({
+                "category": name,
+                "seconds": time.perf_counter() - start,
+                "audio_seconds": seconds,
+                "cached": result.get("cached", False)
+            })
+
+    with RssSampler() as rss:
+        wall_start = time.perf_counter()
+        for _ in range(repeat):
+            # As repetições são sequenciais para que o cache (se ligado) seja exercitado
+            await asyncio.gather(*[transcribe(*payload) for payload in payloads])
+        wall = time.perf_counter() - wall_start
+
+    def summarize(items: list) -> dict:
+        latencies = [item["seconds"] for item in items]
+        audio = sum(item["audio_seconds"] for item in items)
+        return {
+            "requests": len(items),
+            "cache_hits": sum(1 for item in items if item["cached"]),
+            "rtf": round(sum(latencies) / audio, 4) if audio else None,
+            "p50_seconds": round(percentile(latencies, 0.5), 3),
+            "p95_seconds": round(percentile(latencies, 0.95), 3)
+        }
+
+    report = {
+        **summarize(samples),
+        "peak_rss_mb": round(rss.peak / (1024 * 1024), 1),
+        "throughput_rps": round(len(samples) / wall, 3),
+        "throughput_audio_x": round(sum(s["audio_seconds"] for s in samples) / wall, 2),
+        "categories": {
+            name: summarize([s for s in samples if s["category"] == name])
+            for name in sorted({s["category"] for s in samples})
+        }
+    }
+    return report
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Lista as regressões (métrica acima de baseline * (1 + tolerância))"""
+    regressions = []
+    for scenario, metrics in results.items():
+        reference = baseline.get(scenario)
+        if reference is None:
+            continue
+        checks = [(scenario, metrics, reference)] + [
+            (f"{scenario}/{category}", values, reference.get("categories", {}).get(category))
+            for category, values in metrics.get("categories", {}).items()
+        ]
+        for name, current, expected in checks:
+            if not expected:
+                continue
+            for metric in GATED_METRICS:
+                if current.get(metric) is None or not expected.get(metric):
+                    continue
+                limit = expected[metric] * (1 + tolerance)
+                if current[metric] > limit:
+                    regressions.append(
+                        f"{name} {metric}: {current[metric]} > {expected[metric]} (+{tolerance:.0%})"
+                    )
+    return regressions
+
+
+async def main_async(args, files: list) -> dict:
+    import transcribe_whisper as service
+
+    await service.start_job_queue()
+    # Modelos aquecidos antes da medição
+    await service.warmup_task
+    results = {}
+    try:
+        models = [m.strip() for m in args.models.split(",") if m.strip()]
+        for model, whatsapp, use_cache in itertools.product(models, (False, True), (False, True)):
+            scenario = f"{model}|whatsapp={'on' if whatsapp else 'off'}|cache={'on' if use_cache else 'off'}"
+            print(f"▶️  {scenario}")
+            report = await run_scenario(
+                service, files, model, whatsapp, use_cache, args.repeat, args.concurrency
+            )
+            results[scenario] = report
+            print(
+                f"   RTF {report['rtf']} | p50 {report['p50_seconds']}s | p95 {report['p95_seconds']}s | "
+                f"RSS {report['peak_rss_mb']}MB | {report['throughput_rps']} req/s "
+                f"({report['throughput_audio_x']}x tempo real) | cache hits {report['cache_hits']}"
+            )
+    finally:
+        await service.stop_job_queue()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark offline do pipeline de transcrição")
+    parser.add_argument("--corpus", type=Path, help="Diretório com áudios/vídeos (padrão: corpus sintético)")
+    parser.add_argument("--categories", default="short,medium,long", help="Categorias do corpus sintético")
+    parser.add_argument("--models", default="tiny,base", help="Modelos separados por vírgula ('auto' = roteamento)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--concurrency", type=int, default=1, help="Requisições simultâneas")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Regressão tolerada (0.15 = 15%%)")
+    parser.add_argument("--update-baseline", action="store_true", help="Grava os resultados como novo baseline")
+    parser.add_argument("--json", type=Path, help="Grava o relatório completo em JSON")
+    args = parser.parse_args()
+
+    baseline_path = args.baseline.resolve()
+    json_path = args.json.resolve() if args.json else None
+    corpus_dir = args.corpus.resolve() if args.corpus else None
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # O serviço cria ./cache relativo ao cwd: cada execução começa com cache vazio
+        os.chdir(tmp)
+        if corpus_dir:
+            files = load_corpus(corpus_dir)
+        else:
+            selected = set(args.categories.split(","))
+            files = generate_corpus(Path(tmp), [c for c in CATEGORIES if c[0] in selected])
+        if not files:
+            sys.exit("Corpus vazio")
+        print(f"📂 Corpus: {', '.join(f'{name}={path.name}' for name, path in files)}")
+
+        results = asyncio.run(main_async(args, files))
+
+    if json_path:
+        json_path.write_text(json.dumps(results, indent=2), encoding="utf-8")
+        print(f"💾 Relatório salvo em {json_path}")
+
+    if args.update_baseline:
+        baseline_path.write_text(json.dumps(results, indent=2), encoding="utf-8")
+        print(f"📌 Baseline atualizado: {baseline_path}")
+        return
+
+    if not baseline_path.exists():
+        print(f"⚠️  Sem baseline em {baseline_path}; rode com --update-baseline para criar")
+        return
+
+    regressions = compare(results, json.loads(baseline_path.read_text(encoding="utf-8")), args.tolerance)
+    if regressions:
+        print("❌ Regressões de desempenho:")
+        for regression in regressions:
+            print(f"   - {regression}")
+        sys.exit(1)
+    print("✅ Sem regressões em relação ao baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Controle de admissão: vagas reais de processamento e fila de espera limitada.
+
+Os recursos do sistema (CPU/memória) são amostrados por uma task em segundo
+plano, então nenhuma requisição paga pela medição. Cada requisição admitida
+ocupa uma vaga (asyncio.Semaphore); sem vaga, espera na fila até o limite
+de max_queue. Só a fila cheia (ou a memória acima do limite) recusa a
+requisição, com um Retry-After estimado pela fila e pela duração média
+medida dos processamentos. CPU alta é o estado normal com as vagas ocupadas:
+é reportada como métrica, mas não recusa quem ainda cabe na fila.
+"""
+import asyncio
+import logging
+import math
+import time
+from contextlib import asynccontextmanager
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class AdmissionRejected(Exception):
+    """Requisição recusada (fila cheia ou pressão de memória)"""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Vagas de processamento com fila limitada e amostragem de recursos em segundo plano"""
+
+    def __init__(
+        self,
+        max_concurrent: int,
+        max_queue: int,
+        sampler: Callable[[], dict],
+        sample_interval: float = 2.0,
+        memory_limit: float = 90,
+        initial_duration: float = 10.0,
+        alpha: float = 0.2
+    ):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.sampler = sampler
+        self.sample_interval = sample_interval
+        self.memory_limit = memory_limit
+        self.alpha = alpha
+        self.avg_duration = initial_duration  # EWMA da duração de cada processamento
+        self.semaphore: Optional[asyncio.Semaphore] = None
+        self.sampler_task: Optional[asyncio.Task] = None
+        self.resources: dict = {}
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = {"queue_full": 0, "memory_pressure": 0}
+
+    async def start(self):
+        """Cria o semáforo e inicia a amostragem (dentro do event loop)"""
+        if self.sampler_task is not None:
+            return
+        self.semaphore = asyncio.Semaphore(self.max_concurrent)
+        self.resources = self.sampler()
+        self.sampler_task = asyncio.create_task(self._sample())
+        logger.info(f"Admissão iniciada: {self.max_concurrent} vagas, fila de {self.max_queue}")
+
+    async def stop(self):
+        if self.sampler_task is not None:
+            self.sampler_task.cancel()
+            await asyncio.gather(self.sampler_task, return_exceptions=True)
+            self.sampler_task = None
+
+    async def _sample(self):
+        while True:
+            await asyncio.sleep(self.sample_interval)
+            try:
+                self.resources = self.sampler()
+            except Exception as e:
+                logger.warning(f"Falha ao amostrar recursos: {e}")
+
+    @property
+    def overloaded(self) -> bool:
+        """Memória acima do limite (a CPU não entra: vagas ocupadas a saturam)"""
+        return self.resources.get("memory_percent", 0) > self.memory_limit
+
+    def retry_after(self) -> int:
+        """Segundos até haver vaga: rodadas de processamento à frente x duração média"""
+        rounds = (self.active + self.waiting + 1) / self.max_concurrent
+        return max(1, math.ceil(rounds * self.avg_duration))
+
+    def _reject(self, reason: str):
+        self.rejected[reason] += 1
+        raise AdmissionRejected(reason, self.retry_after())
+
+    @asynccontextmanager
+    async def slot(self):
+        """Ocupa uma vaga durante o bloco (aguardando na fila se preciso)"""
+        if self.semaphore is None:
+            raise RuntimeError("AdmissionController não iniciado")
+        if self.overloaded:
+            self._reject("memory_pressure")
+        if self.semaphore.locked() and self.waiting >= self.max_queue:
+            self._reject("queue_full")
+
+        self.waiting += 1
+        try:
+            await self.semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.active += 1
+        self.admitted += 1
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            elapsed = time.monotonic() - start
+            self.avg_duration = self.alpha * elapsed + (1 - self.alpha) * self.avg_duration
+            self.active -= 1
+            self.semaphore.release()
+
+    def stats(self) -> dict:
+        return {
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "active": self.active,
+            "waiting": self.waiting,
+            "admitted": self.admitted,
+            "rejected": dict(self.rejected),
+            "avg_duration_seconds": round(self.avg_duration, 2),
+            "overloaded": self.overloaded,
+            "cpu_percent": self.resources.get("cpu_percent"),
+            "resources": self.resources
+        }
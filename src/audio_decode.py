@@ -0,0 +1,87 @@
+"""
+Decodificação de áudio em um único processo ffmpeg.
+
+Extrai o áudio (inclusive de vídeos), aplica os filtros de voz e entrega
+PCM float32 mono a 16 kHz direto pelo pipe para um array NumPy, que é
+passado ao model.transcribe sem arquivos WAV intermediários.
+"""
+import asyncio
+import logging
+from typing import Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000  # Sample rate esperado pelo Whisper
+READ_SIZE = 1024 * 1024
+
+# Filtros para voz (áudios do WhatsApp)
+WHATSAPP_VOICE_FILTER = "volume=2.0,highpass=f=200,lowpass=f=3000"
+
+
+class AudioDecodeError(Exception):
+    """Falha do ffmpeg ao decodificar o arquivo"""
+
+
+class AudioDecodeTimeout(AudioDecodeError):
+    """ffmpeg excedeu o tempo limite"""
+
+
+async def _run_ffmpeg(cmd: list, timeout: Optional[float]) -> bytearray:
+    process = await asyncio.create_subprocess_exec(
+        *cmd,
+        stdin=asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE
+    )
+
+    async def read_stdout() -> bytearray:
+        # bytearray mantém o buffer gravável para np.frombuffer (sem cópia extra)
+        data = bytearray()
+        while True:
+            chunk = await process.stdout.read(READ_SIZE)
+            if not chunk:
+                return data
+            data += chunk
+
+    try:
+        pcm, stderr = await asyncio.wait_for(
+            asyncio.gather(read_stdout(), process.stderr.read()),
+            timeout
+        )
+        await process.wait()
+    except asyncio.TimeoutError:
+        process.kill()
+        await process.wait()
+        raise AudioDecodeTimeout("Timeout na decodificação do áudio")
+
+    if process.returncode != 0:
+        raise AudioDecodeError(stderr.decode("utf-8", errors="ignore")[-2000:])
+    return pcm
+
+
+async def decode_audio(
+    path: str,
+    audio_filter: Optional[str] = None,
+    threads: int = 0,
+    timeout: Optional[float] = None
+) -> np.ndarray:
+    """
+    Decodifica áudio/vídeo para um array float32 mono a 16 kHz.
+    Se o filtro falhar, tenta novamente sem ele.
+    """
+    cmd = ['ffmpeg', '-nostdin', '-threads', str(threads), '-i', path, '-vn']
+    base_output = ['-f', 'f32le', '-acodec', 'pcm_f32le', '-ac', '1', '-ar', str(SAMPLE_RATE), '-']
+
+    if audio_filter:
+        try:
+            pcm = await _run_ffmpeg(cmd + ['-af', audio_filter] + base_output, timeout)
+            return np.frombuffer(pcm, dtype=np.float32)
+        except AudioDecodeTimeout:
+            raise
+        except AudioDecodeError as e:
+            logger.warning(f"Falha ao aplicar filtros de áudio, decodificando sem filtro: {e}")
+
+    pcm = await _run_ffmpeg(cmd + base_output, timeout)
+    return np.frombuffer(pcm, dtype=np.float32)
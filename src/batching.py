@@ -0,0 +1,158 @@
+"""
+Micro-batching de clipes curtos (áudios do WhatsApp).
+
+Clipes que chegam com poucos milissegundos de diferença são agrupados e
+decodificados pelo Whisper em um único tensor (encoder + decoder em lote),
+em vez de um passe completo por requisição sobre uma janela de 30s.
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# whisper.audio.SAMPLE_RATE / N_SAMPLES, sem importar o whisper (e o torch) no import
+SAMPLE_RATE = 16000
+N_SAMPLES = 30 * SAMPLE_RATE
+
+# Limiares equivalentes aos usados por whisper.transcribe
+NO_SPEECH_THRESHOLD = 0.6
+LOGPROB_THRESHOLD = -1.0
+COMPRESSION_RATIO_THRESHOLD = 2.4
+
+BatchRunner = Callable[[Hashable, List[Any]], Awaitable[List[Any]]]
+
+
+class MicroBatcher:
+    """Agrupa itens por chave e executa em lote após max_wait_ms ou max_batch_size"""
+
+    def __init__(self, run_batch: BatchRunner, max_batch_size: int = 8, max_wait_ms: float = 10):
+        self.run_batch = run_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.pending: Dict[Hashable, List[Tuple[Any, asyncio.Future]]] = {}
+        self.timers: Dict[Hashable, asyncio.TimerHandle] = {}
+        self.tasks: set = set()
+        self.batches_run = 0
+        self.items_run = 0
+
+    async def submit(self, key: Hashable, item: Any) -> Any:
+        """Adiciona um item ao lote da chave e aguarda o resultado individual"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        batch = self.pending.setdefault(key, [])
+        batch.append((item, future))
+
+        if len(batch) >= self.max_batch_size:
+            self._flush(key)
+        elif key not in self.timers:
+            self.timers[key] = loop.call_later(self.max_wait, self._flush, key)
+
+        return await future
+
+    def _flush(self, key: Hashable):
+        timer = self.timers.pop(key, None)
+        if timer:
+            timer.cancel()
+        batch = self.pending.pop(key, [])
+        if not batch:
+            return
+        task = asyncio.create_task(self._run(key, batch))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def _run(self, key: Hashable, batch: List[Tuple[Any, asyncio.Future]]):
+        items = [item for item, _ in batch]
+        try:
+            results = await self.run_batch(key, items)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self.batches_run += 1
+        self.items_run += len(items)
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    def stats(self) -> dict:
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "batches_run": self.batches_run,
+            "items_run": self.items_run,
+            "avg_batch_size": round(self.items_run / self.batches_run, 2) if self.batches_run else 0,
+            "pending": sum(len(b) for b in self.pending.values())
+        }
+
+
+def fits_single_window(audio: np.ndarray) -> bool:
+    """True se o áudio cabe em uma única janela de 30s do Whisper"""
+    return len(audio) <= N_SAMPLES
+
+
+def transcribe_batch(model, audios: List[np.ndarray], language: Optional[str] = None) -> List[Optional[dict]]:
+    """
+    Decodifica vários clipes de até 30s em um único lote.
+
+    Retorna um dicionário no formato de whisper.transcribe para cada clipe, ou
+    None quando o resultado não passou nos limiares de qualidade e o clipe
+    deve ser transcrito individualmente (com fallback de temperatura).
+    """
+    import torch
+    import whisper
+
+    start = time.perf_counter()
+    mels = torch.stack([
+        whisper.log_mel_spectrogram(whisper.pad_or_trim(audio), model.dims.n_mels)
+        for audio in audios
+    ]).to(model.device)
+
+    options = whisper.DecodingOptions(
+        language=language,
+        temperature=0.0,
+        fp16=False,
+        without_timestamps=True
+    )
+    decoded = whisper.decode(model, mels, options)
+    # Tempo do lote rateado pela duração de cada clipe (mesmo RTF para todos)
+    elapsed = time.perf_counter() - start
+    total_samples = sum(len(audio) for audio in audios)
+
+    results: List[Optional[dict]] = []
+    for audio, r in zip(audios, decoded):
+        duration = len(audio) / SAMPLE_RATE
+        no_speech = r.no_speech_prob > NO_SPEECH_THRESHOLD and r.avg_logprob < LOGPROB_THRESHOLD
+
+        if not no_speech and (
+            r.compression_ratio > COMPRESSION_RATIO_THRESHOLD or r.avg_logprob < LOGPROB_THRESHOLD
+        ):
+            results.append(None)
+            continue
+
+        text = "" if no_speech else r.text
+        segments = [] if no_speech else [{
+            "id": 0,
+            "seek": 0,
+            "start": 0.0,
+            "end": round(duration, 2),
+            "text": text,
+            "tokens": r.tokens,
+            "temperature": r.temperature,
+            "avg_logprob": r.avg_logprob,
+            "compression_ratio": r.compression_ratio,
+            "no_speech_prob": r.no_speech_prob
+        }]
+        results.append({
+            "text": text,
+            "segments": segments,
+            "language": r.language,
+            "inference_seconds": elapsed * len(audio) / total_samples
+        })
+
+    return results
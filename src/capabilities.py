@@ -0,0 +1,102 @@
+"""
+Capacidades do serviço carregadas sob demanda.
+
+Cada capacidade (áudio, OCR de imagens, PDF, documentos Office) vive num
+módulo próprio que importa suas dependências pesadas; o serviço só importa
+esse módulo no primeiro uso (ou no aquecimento), e não no import do
+servidor. ENABLED_CAPABILITIES restringe a instância a um subconjunto:
+uma capacidade desabilitada nunca é importada e seus endpoints respondem
+404.
+"""
+import importlib
+import logging
+import threading
+import time
+from types import ModuleType
+from typing import Dict, Iterable
+
+from fastapi import HTTPException
+
+from metrics import record_stage
+
+logger = logging.getLogger(__name__)
+
+# Capacidade -> módulo que a implementa (o áudio usa o próprio whisper, que traz o torch)
+CAPABILITY_MODULES = {
+    "audio": "whisper",
+    "ocr": "ocr_handler",
+    "pdf": "pdf_handler",
+    "documents": "office_handler"
+}
+
+
+def parse_capabilities(spec: str) -> tuple:
+    """Capacidades habilitadas no formato "audio,ocr,pdf,documents" (vazio = todas)"""
+    if not spec or spec.strip() == "all":
+        return tuple(CAPABILITY_MODULES)
+    names = tuple(name.strip() for name in spec.split(",") if name.strip())
+    unknown = [name for name in names if name not in CAPABILITY_MODULES]
+    if unknown:
+        raise ValueError(
+            f"Capacidades desconhecidas: {', '.join(unknown)} "
+            f"(use {', '.join(CAPABILITY_MODULES)})"
+        )
+    return names
+
+
+class CapabilityLoader:
+    """Importa o módulo de cada capacidade uma única vez, no primeiro uso"""
+
+    def __init__(self, enabled: Iterable[str]):
+        self.enabled = tuple(enabled)
+        self.modules: Dict[str, ModuleType] = {}
+        self.import_seconds: Dict[str, float] = {}
+        self.lock = threading.Lock()
+
+    def is_enabled(self, name: str) -> bool:
+        return name in self.enabled
+
+    def is_loaded(self, name: str) -> bool:
+        return name in self.modules
+
+    def check(self, name: str):
+        """Recusa (404) o uso de uma capacidade desabilitada nesta instância"""
+        if not self.is_enabled(name):
+            raise HTTPException(
+                status_code=404,
+                detail=f"Capacidade '{name}' desabilitada nesta instância"
+            )
+
+    def load(self, name: str) -> ModuleType:
+        """Módulo da capacidade, importando-o na primeira chamada"""
+        module = self.modules.get(name)
+        if module is not None:
+            return module
+        self.check(name)
+        with self.lock:
+            if name not in self.modules:
+                start = time.perf_counter()
+                try:
+                    module = importlib.import_module(CAPABILITY_MODULES[name])
+                except ImportError as e:
+                    logger.error(f"Falha ao importar a capacidade {name}: {e}")
+                    raise HTTPException(
+                        status_code=503,
+                        detail=f"Capacidade '{name}' indisponível: {e}"
+                    )
+                elapsed = time.perf_counter() - start
+                self.import_seconds[name] = round(elapsed, 3)
+                record_stage(f"import_{name}", elapsed)
+                logger.info(f"Capacidade {name} carregada em {elapsed:.2f}s")
+                self.modules[name] = module
+        return self.modules[name]
+
+    def stats(self) -> dict:
+        return {
+            name: {
+                "enabled": self.is_enabled(name),
+                "loaded": self.is_loaded(name),
+                "import_seconds": self.import_seconds.get(name)
+            }
+            for name in CAPABILITY_MODULES
+        }
@@ -0,0 +1,131 @@
+"""
+Divisão dos cores entre os jobs de inferência/OCR em andamento.
+
+Cada job roda dentro de scheduler.job(): ao entrar, os cores são
+redivididos entre os jobs ativos e o job aplica sua fatia com
+torch.set_num_threads (e, opcionalmente, afinidade de CPU) na própria
+thread. Jobs já em execução adotam a nova fatia no próximo passe do
+encoder (um por janela de 30s), via hook instalado nos modelos.
+
+Com OpenMP (builds Linux do PyTorch) o número de threads e a afinidade
+valem para a thread que os define, e as threads do OpenMP criadas por ela
+herdam a afinidade.
+"""
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List
+
+logger = logging.getLogger(__name__)
+
+
+def available_cores() -> List[int]:
+    """Cores que o processo pode usar (respeita cgroups/taskset)"""
+    try:
+        return sorted(os.sched_getaffinity(0))
+    except AttributeError:
+        return list(range(os.cpu_count() or 1))
+
+
+class CpuScheduler:
+    """Reparte os cores entre os jobs ativos e rebalanceia quando entram/saem"""
+
+    def __init__(self, cores: int = 0, use_affinity: bool = False, enabled: bool = True):
+        self.enabled = enabled
+        self.cores = available_cores()
+        if cores:
+            self.cores = self.cores[:cores]
+        self.use_affinity = use_affinity and hasattr(os, "sched_setaffinity")
+        self.lock = threading.Lock()
+        self.jobs: Dict[int, dict] = {}  # thread id -> job
+        self.local = threading.local()
+        self.completed = 0
+        self.rebalances = 0
+
+    def _rebalance(self):
+        """Recalcula a fatia de cada job ativo (chamar com lock)"""
+        jobs = sorted(self.jobs.values(), key=lambda job: job["started"])
+        if not jobs:
+            return
+        total = len(self.cores)
+        share, extra = divmod(total, len(jobs))
+        offset = 0
+        for i, job in enumerate(jobs):
+            # Com mais jobs que cores, cada um fica com 1 thread (cores compartilhados)
+            threads = max(1, share + (1 if i < extra else 0))
+            job["threads"] = threads
+            start = offset % total
+            job["cpus"] = [self.cores[(start + k) % total] for k in range(threads)]
+            offset += threads
+        self.rebalances += 1
+
+    def _apply(self, job: dict):
+        """Aplica a fatia do job na thread atual"""
+        threads, cpus = job["threads"], job["cpus"]
+        if self.local.applied == (threads, cpus):
+            return
+        import torch
+
+        torch.set_num_threads(threads)
+        if self.use_affinity:
+            try:
+                os.sched_setaffinity(0, cpus)
+            except OSError as e:
+                logger.warning(f"Não foi possível definir afinidade de CPU: {e}")
+        self.local.applied = (threads, cpus)
+
+    @contextmanager
+    def job(self, kind: str = "inference"):
+        """Executa o bloco como um job com fatia própria de cores"""
+        if not self.enabled:
+            yield None
+            return
+        thread_id = threading.get_ident()
+        job = {"kind": kind, "started": time.monotonic(), "threads": len(self.cores), "cpus": self.cores}
+        with self.lock:
+            self.jobs[thread_id] = job
+            self._rebalance()
+        self.local.applied = None
+        self._apply(job)
+        try:
+            yield job
+        finally:
+            with self.lock:
+                del self.jobs[thread_id]
+                self.completed += 1
+                self._rebalance()
+            if self.use_affinity:
+                try:
+                    os.sched_setaffinity(0, self.cores)
+                except OSError:
+                    pass
+            self.local.applied = None
+
+    def refresh(self):
+        """Adota a fatia atual se a thread estiver em um job (chamado pelos hooks)"""
+        job = self.jobs.get(threading.get_ident())
+        if job is not None and getattr(self.local, "applied", None) is not None:
+            self._apply(job)
+
+    def attach(self, model):
+        """Rebalanceia a cada passe do encoder do modelo Whisper"""
+        encoder = getattr(model, "encoder", None)
+        if encoder is not None:
+            encoder.register_forward_pre_hook(lambda module, inputs: self.refresh())
+        return model
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "enabled": self.enabled,
+                "cores": len(self.cores),
+                "affinity": self.use_affinity,
+                "active": [
+                    {"kind": job["kind"], "threads": job["threads"]}
+                    for job in self.jobs.values()
+                ],
+                "completed": self.completed,
+                "rebalances": self.rebalances
+            }
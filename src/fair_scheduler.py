@@ -0,0 +1,123 @@
+"""
+Fila justa ponderada (WFQ) para as execuções de inferência.
+
+Cada execução entra em uma faixa de prioridade (interactive, standard,
+bulk) com um custo (segundos de áudio). Quando todas as vagas estão
+ocupadas, a próxima a rodar é a de menor tag de término virtual:
+    tag = max(tempo virtual, última tag da faixa) + custo / peso
+Assim um áudio de 5s do WhatsApp passa na frente de um trecho de 30s de
+um vídeo longo, mas o vídeo nunca fica sem andar. Mídias longas rodam
+trecho a trecho (long_media, streaming), e cada trecho disputa a vaga de
+novo: é nos limites dos trechos que as faixas interativas "preemptam".
+"""
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+LANES = ("interactive", "standard", "bulk")
+DEFAULT_WEIGHTS = {"interactive": 6.0, "standard": 2.0, "bulk": 1.0}
+
+
+def parse_weights(spec: str) -> Dict[str, float]:
+    """Lê pesos no formato "interactive:6,standard:2,bulk:1" (faixas omitidas usam o padrão)"""
+    weights = dict(DEFAULT_WEIGHTS)
+    for item in spec.split(","):
+        if not item.strip():
+            continue
+        lane, _, weight = item.partition(":")
+        lane = lane.strip()
+        if lane not in LANES:
+            raise ValueError(f"Faixa inválida: {lane}. Use: {', '.join(LANES)}")
+        weights[lane] = float(weight)
+        if weights[lane] <= 0:
+            raise ValueError(f"Peso da faixa {lane} deve ser positivo")
+    return weights
+
+
+class FairScheduler:
+    """Vagas de inferência distribuídas entre as faixas por WFQ"""
+
+    def __init__(self, slots: int, weights: Optional[Dict[str, float]] = None):
+        self.slots = max(1, slots)
+        self.weights = weights or dict(DEFAULT_WEIGHTS)
+        self.running = 0
+        self.virtual_time = 0.0
+        self.last_tag = {lane: 0.0 for lane in LANES}
+        self.waiters: List[tuple] = []  # (tag, seq, lane, future)
+        self.sequence = itertools.count()
+        self.dispatched = {lane: 0 for lane in LANES}
+        self.wait_seconds = {lane: 0.0 for lane in LANES}
+        self.max_wait_seconds = {lane: 0.0 for lane in LANES}
+
+    def waiting(self, lane: Optional[str] = None) -> int:
+        return sum(
+            1 for _, _, waiter_lane, future in self.waiters
+            if not future.done() and (lane is None or waiter_lane == lane)
+        )
+
+    def _grant_next(self):
+        """Passa a vaga liberada para a espera de menor tag"""
+        while self.waiters and self.running < self.slots:
+            tag, _, lane, future = heapq.heappop(self.waiters)
+            if future.done():  # cancelada enquanto esperava
+                continue
+            self.virtual_time = max(self.virtual_time, tag)
+            self.running += 1
+            future.set_result(None)
+
+    @asynccontextmanager
+    async def slot(self, lane: str = "standard", cost: float = 1.0):
+        """Ocupa uma vaga de inferência durante o bloco"""
+        if lane not in LANES:
+            raise ValueError(f"Faixa inválida: {lane}")
+        tag = max(self.virtual_time, self.last_tag[lane]) + max(cost, 0.1) / self.weights[lane]
+        self.last_tag[lane] = tag
+        start = time.monotonic()
+
+        if self.running < self.slots and not self.waiting():
+            self.virtual_time = max(self.virtual_time, tag)
+            self.running += 1
+        else:
+            future = asyncio.get_event_loop().create_future()
+            heapq.heappush(self.waiters, (tag, next(self.sequence), lane, future))
+            try:
+                await future
+            except asyncio.CancelledError:
+                # Vaga concedida no mesmo instante do cancelamento: devolve
+                if future.done() and not future.cancelled():
+                    self.running -= 1
+                    self._grant_next()
+                raise
+
+        waited = time.monotonic() - start
+        self.dispatched[lane] += 1
+        self.wait_seconds[lane] += waited
+        self.max_wait_seconds[lane] = max(self.max_wait_seconds[lane], waited)
+        try:
+            yield waited
+        finally:
+            self.running -= 1
+            self._grant_next()
+
+    def stats(self) -> dict:
+        return {
+            "slots": self.slots,
+            "running": self.running,
+            "lanes": {
+                lane: {
+                    "weight": self.weights[lane],
+                    "waiting": self.waiting(lane),
+                    "dispatched": self.dispatched[lane],
+                    "avg_wait_seconds": round(self.wait_seconds[lane] / self.dispatched[lane], 3)
+                    if self.dispatched[lane] else None,
+                    "max_wait_seconds": round(self.max_wait_seconds[lane], 3)
+                }
+                for lane in LANES
+            }
+        }
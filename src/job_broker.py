@@ -0,0 +1,525 @@
+"""
+Broker de jobs para a implantação dividida (NODE_ROLE=api / worker).
+
+Os nós de API não transcrevem: gravam o arquivo num diretório compartilhado
+e enfileiram o job no broker. Os workers puxam jobs só quando têm uma vaga
+livre, preferindo os de modelos que já têm carregados, e devolvem o
+resultado pelo próprio broker. Um worker ocupado com um vídeo longo não
+puxa notas de voz que não conseguiria começar na hora; outro worker as
+pega.
+
+O broker é um arquivo SQLite (modo WAL) num volume compartilhado: serve
+para vários containers no mesmo host. Jobs de workers que param de mandar
+heartbeat voltam para a fila quando o lease expira.
+
+As chamadas ao SQLite bloqueiam (BEGIN IMMEDIATE espera até busy_timeout):
+no event loop elas passam por JobBroker.run, num pool de threads próprio.
+"""
+import asyncio
+import functools
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+from fastapi import HTTPException
+
+from job_queue import post_callback
+
+logger = logging.getLogger(__name__)
+
+NODE_ROLES = ("all", "api", "worker")
+
+# Atraso de cada faixa na fila (s): o job disputa como se tivesse chegado
+# created_at + atraso. Notas de voz passam à frente de vídeos que chegaram até
+# 60s antes delas, e um job bulk nunca fica esperando para sempre
+LANE_DELAY = {"interactive": 0.0, "standard": 10.0, "bulk": 60.0}
+
+# Ordem da fila em SQL (as faixas vêm da constante acima, não da requisição)
+QUEUE_ORDER = "created_at + CASE lane {} ELSE 0 END".format(
+    " ".join(f"WHEN '{lane}' THEN {delay}" for lane, delay in LANE_DELAY.items())
+)
+
+# Limpeza de jobs finalizados a cada N enfileiramentos
+PURGE_EVERY = 50
+
+JobRunner = Callable[[dict], Awaitable[Dict[str, Any]]]
+
+
+def _timestamp(value: Optional[float]) -> Optional[str]:
+    return datetime.fromtimestamp(value).isoformat() if value else None
+
+
+def _discard_spool(payload: str):
+    """Remove o upload enfileirado de um job que não vai mais rodar"""
+    path = json.loads(payload).get("temp_file_path")
+    if path:
+        try:
+            Path(path).unlink(missing_ok=True)
+        except OSError as e:
+            logger.warning(f"Erro ao remover arquivo do spool {path}: {e}")
+
+
+class JobBroker:
+    """Fila de jobs em SQLite compartilhada entre nós de API e workers"""
+
+    def __init__(
+        self,
+        path: Path,
+        max_queued: int = 1000,
+        lease_seconds: float = 60,
+        affinity_seconds: float = 1.0,
+        max_attempts: int = 2,
+        result_ttl: int = 3600,
+        threads: int = 4
+    ):
+        self.path = str(path)
+        self.max_queued = max_queued
+        self.lease_seconds = lease_seconds
+        self.affinity_seconds = affinity_seconds
+        self.max_attempts = max_attempts
+        self.result_ttl = result_ttl
+        self.local = threading.local()
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="broker")
+        self.enqueued = 0
+        self.queued = 0  # última contagem de jobs na fila (lida pelas métricas)
+
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " id TEXT PRIMARY KEY,"
+                " status TEXT NOT NULL,"
+                " lane TEXT NOT NULL,"
+                " model TEXT,"
+                " cost REAL NOT NULL,"
+                " payload TEXT NOT NULL,"
+                " result TEXT,"
+                " error TEXT,"
+                " error_status INTEGER,"
+                " callback_url TEXT,"
+                " metadata TEXT NOT NULL,"
+                " worker TEXT,"
+                " attempts INTEGER NOT NULL DEFAULT 0,"
+                " created_at REAL NOT NULL,"
+                " started_at REAL,"
+                " finished_at REAL,"
+                " lease_until REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created_at)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS workers ("
+                " id TEXT PRIMARY KEY,"
+                " slots INTEGER NOT NULL,"
+                " free_slots INTEGER NOT NULL,"
+                " models TEXT NOT NULL,"
+                " lanes TEXT NOT NULL,"
+                " last_seen REAL NOT NULL)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        """Uma conexão por thread (sqlite3 não compartilha conexões entre threads)"""
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self.local.conn = conn
+        return conn
+
+    async def run(self, func: Callable, *args, **kwargs):
+        """Executa um método do broker fora do event loop"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(func, *args, **kwargs))
+
+    # ---------- lado da API ----------
+
+    def enqueue(
+        self,
+        payload: dict,
+        lane: str,
+        model: Optional[str],
+        cost: float,
+        callback_url: Optional[str] = None,
+        metadata: Optional[dict] = None
+    ) -> dict:
+        """Enfileira um job e retorna seu registro"""
+        conn = self._connect()
+        queued = conn.execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'").fetchone()[0]
+        if queued >= self.max_queued:
+            raise HTTPException(status_code=503, detail="Fila de jobs cheia. Tente novamente mais tarde.")
+
+        job_id = uuid.uuid4().hex
+        conn.execute(
+            "INSERT INTO jobs (id, status, lane, model, cost, payload, callback_url, metadata, created_at)"
+            " VALUES (?, 'queued', ?, ?, ?, ?, ?, ?, ?)",
+            (job_id, lane, model, cost, json.dumps(payload), callback_url,
+             json.dumps(metadata or {}), time.time())
+        )
+        self.enqueued += 1
+        if self.enqueued % PURGE_EVERY == 0:
+            self.purge()
+        logger.info(f"Job {job_id} enfileirado no broker ({lane}, {model}, {cost:.0f}s de áudio)")
+        return self.get(job_id)
+
+    def add_completed(
+        self,
+        result: Dict[str, Any],
+        callback_url: Optional[str] = None,
+        metadata: Optional[dict] = None
+    ) -> dict:
+        """Registra um job já concluído (ex.: resultado vindo do cache)"""
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        self._connect().execute(
+            "INSERT INTO jobs (id, status, lane, cost, payload, result, callback_url, metadata,"
+            " created_at, started_at, finished_at)"
+            " VALUES (?, 'completed', 'interactive', 0, '{}', ?, ?, ?, ?, ?, ?)",
+            (job_id, json.dumps(result, default=str), callback_url,
+             json.dumps(metadata or {}), now, now, now)
+        )
+        return self.get(job_id)
+
+    async def wait(self, job_id: str, poll_interval: float = 0.2, timeout: float = 600) -> dict:
+        """Aguarda o job terminar; falhas viram HTTPException com o status do worker"""
+        deadline = time.monotonic() + timeout
+        while True:
+            job = await self.run(self.get, job_id)
+            if job is None:
+                raise HTTPException(status_code=500, detail=f"Job {job_id} sumiu do broker")
+            if job["status"] == "completed":
+                return job["result"]
+            if job["status"] == "failed":
+                raise HTTPException(status_code=job.get("error_status") or 500, detail=job["error"])
+            if time.monotonic() > deadline:
+                raise HTTPException(status_code=504, detail="Tempo esgotado aguardando um worker")
+            await asyncio.sleep(poll_interval)
+
+    def get(self, job_id: str) -> Optional[dict]:
+        """Retorna o job no formato de JobManager.get, ou None"""
+        row = self._connect().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = {
+            "job_id": row["id"],
+            "status": row["status"],
+            "created_at": _timestamp(row["created_at"]),
+            "started_at": _timestamp(row["started_at"]),
+            "finished_at": _timestamp(row["finished_at"]),
+            "callback_url": row["callback_url"],
+            "metadata": json.loads(row["metadata"]),
+            "result": json.loads(row["result"]) if row["result"] else None,
+            "error": row["error"],
+            "lane": row["lane"],
+            "worker": row["worker"]
+        }
+        if row["error_status"]:
+            job["error_status"] = row["error_status"]
+        if row["status"] == "queued":
+            job["queue_position"] = self._connect().execute(
+                f"SELECT COUNT(*) FROM jobs WHERE status = 'queued'"
+                f" AND {QUEUE_ORDER} <= ? + ?",
+                (row["created_at"], LANE_DELAY.get(row["lane"], 0))
+            ).fetchone()[0]
+        return job
+
+    # ---------- lado do worker ----------
+
+    def heartbeat(
+        self,
+        worker_id: str,
+        slots: int,
+        free_slots: int,
+        models: Iterable[str],
+        lanes: Iterable[str],
+        job_ids: Iterable[str] = ()
+    ):
+        """Anuncia a capacidade do worker e renova o lease dos jobs em andamento"""
+        now = time.time()
+        conn = self._connect()
+        conn.execute(
+            "INSERT OR REPLACE INTO workers (id, slots, free_slots, models, lanes, last_seen)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            (worker_id, slots, free_slots, json.dumps(list(models)), json.dumps(list(lanes)), now)
+        )
+        job_ids = list(job_ids)
+        if job_ids:
+            conn.execute(
+                f"UPDATE jobs SET lease_until = ? WHERE worker = ? AND status = 'running'"
+                f" AND id IN ({','.join('?' * len(job_ids))})",
+                (now + self.lease_seconds, worker_id, *job_ids)
+            )
+
+    def claim(self, worker_id: str, models: Iterable[str], lanes: Iterable[str]) -> Optional[dict]:
+        """
+        Reserva o próximo job para o worker (chamar só com uma vaga livre).
+
+        Ordem: chegada mais o atraso da faixa. Jobs de um modelo que outro
+        worker com vaga já tem carregado ficam para ele por affinity_seconds.
+        """
+        models, lanes = set(models), list(lanes)
+        now = time.time()
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._requeue_expired(conn, now)
+            rows = conn.execute(
+                f"SELECT id, lane, model, created_at FROM jobs WHERE status = 'queued'"
+                f" AND lane IN ({','.join('?' * len(lanes))}) ORDER BY {QUEUE_ORDER} LIMIT 200",
+                lanes
+            ).fetchall()
+            warm_elsewhere = set()
+            for worker in conn.execute(
+                "SELECT models FROM workers WHERE id != ? AND free_slots > 0 AND last_seen > ?",
+                (worker_id, now - self.lease_seconds)
+            ):
+                warm_elsewhere.update(json.loads(worker["models"]))
+
+            chosen = None
+            for row in rows:
+                if (
+                    row["model"] is None or row["model"] in models
+                    or row["model"] not in warm_elsewhere
+                    or now - row["created_at"] >= self.affinity_seconds
+                ):
+                    chosen = row
+                    break
+
+            if chosen is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = 'running', worker = ?, started_at = ?, lease_until = ?,"
+                " attempts = attempts + 1 WHERE id = ?",
+                (worker_id, now, now + self.lease_seconds, chosen["id"])
+            )
+            job = dict(conn.execute("SELECT * FROM jobs WHERE id = ?", (chosen["id"],)).fetchone())
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+        job["payload"] = json.loads(job["payload"])
+        job["metadata"] = json.loads(job["metadata"])
+        return job
+
+    def complete(self, job_id: str, worker_id: str, result: Dict[str, Any]):
+        self._finish(job_id, worker_id, "completed", result=json.dumps(result, default=str))
+
+    def fail(self, job_id: str, worker_id: str, error: str, status_code: int = 500):
+        self._finish(job_id, worker_id, "failed", error=error, error_status=status_code)
+
+    def _finish(self, job_id: str, worker_id: str, status: str, result=None, error=None, error_status=None):
+        # Um job devolvido à fila (lease expirado) e pego por outro worker não é sobrescrito
+        conn = self._connect()
+        updated = conn.execute(
+            "UPDATE jobs SET status = ?, result = ?, error = ?, error_status = ?, finished_at = ?,"
+            " lease_until = NULL WHERE id = ? AND worker = ? AND status = 'running'",
+            (status, result, error, error_status, time.time(), job_id, worker_id)
+        ).rowcount
+        if not updated:
+            logger.warning(f"Resultado do job {job_id} descartado: não pertence mais a {worker_id}")
+        elif status == "failed":
+            # O pipeline remove o arquivo ao terminar, mas não se falhar antes de começar
+            row = conn.execute("SELECT payload FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is not None:
+                _discard_spool(row["payload"])
+
+    def _requeue_expired(self, conn: sqlite3.Connection, now: float):
+        """Devolve à fila os jobs de workers sem heartbeat (ou falha após max_attempts)"""
+        # Dentro da transação do claim: a seleção e o UPDATE veem as mesmas linhas
+        expired = "status = 'running' AND lease_until < ? AND attempts >= ?"
+        failed = conn.execute(f"SELECT payload FROM jobs WHERE {expired}", (now, self.max_attempts)).fetchall()
+        if failed:
+            conn.execute(
+                "UPDATE jobs SET status = 'failed', error = 'Worker parou de responder', error_status = 503,"
+                f" finished_at = ?, lease_until = NULL WHERE {expired}",
+                (now, now, self.max_attempts)
+            )
+            for row in failed:
+                _discard_spool(row["payload"])
+        requeued = conn.execute(
+            "UPDATE jobs SET status = 'queued', worker = NULL, started_at = NULL, lease_until = NULL"
+            " WHERE status = 'running' AND lease_until < ?",
+            (now,)
+        ).rowcount
+        if requeued:
+            logger.warning(f"{requeued} job(s) devolvidos à fila (lease expirado)")
+
+    def purge(self):
+        """Remove jobs finalizados há mais de result_ttl e workers sumidos"""
+        now = time.time()
+        conn = self._connect()
+        conn.execute(
+            "DELETE FROM jobs WHERE status IN ('completed', 'failed') AND finished_at < ?",
+            (now - self.result_ttl,)
+        )
+        conn.execute("DELETE FROM workers WHERE last_seen < ?", (now - self.result_ttl,))
+
+    def count_queued(self) -> int:
+        """Atualiza e retorna a contagem de jobs na fila"""
+        self.queued = self._connect().execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'").fetchone()[0]
+        return self.queued
+
+    def stats(self) -> dict:
+        now = time.time()
+        conn = self._connect()
+        counts = {
+            row["status"]: row["n"]
+            for row in conn.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status")
+        }
+        self.queued = counts.get("queued", 0)
+        queued = {
+            row["lane"]: row["n"]
+            for row in conn.execute(
+                "SELECT lane, COUNT(*) AS n FROM jobs WHERE status = 'queued' GROUP BY lane"
+            )
+        }
+        workers = [
+            {
+                "id": row["id"],
+                "slots": row["slots"],
+                "free_slots": row["free_slots"],
+                "models": json.loads(row["models"]),
+                "lanes": json.loads(row["lanes"]),
+                "last_seen_seconds": round(now - row["last_seen"], 1)
+            }
+            for row in conn.execute(
+                "SELECT * FROM workers WHERE last_seen > ? ORDER BY id", (now - self.lease_seconds,)
+            )
+        ]
+        return {
+            "path": self.path,
+            "jobs": counts,
+            "queued_by_lane": queued,
+            "max_queued": self.max_queued,
+            "workers": workers
+        }
+
+
+class BrokerWorker:
+    """Puxa jobs do broker enquanto houver vagas livres e devolve os resultados"""
+
+    def __init__(
+        self,
+        broker: JobBroker,
+        worker_id: str,
+        run_job: JobRunner,
+        slots: int,
+        loaded_models: Callable[[], List[str]],
+        lanes: Iterable[str],
+        poll_interval: float = 0.2
+    ):
+        self.broker = broker
+        self.worker_id = worker_id
+        self.run_job = run_job
+        self.slots = max(1, slots)
+        self.loaded_models = loaded_models
+        self.lanes = list(lanes)
+        if not self.lanes:
+            # claim montaria "lane IN ()", erro de sintaxe no SQLite a cada consulta
+            raise ValueError("BrokerWorker precisa de ao menos uma faixa")
+        self.poll_interval = poll_interval
+        self.running: Dict[str, asyncio.Task] = {}
+        self.task: Optional[asyncio.Task] = None
+        self._callbacks: set = set()
+        self.completed = 0
+        self.failed = 0
+
+    async def start(self):
+        if self.task is None:
+            self.task = asyncio.create_task(self._run())
+            logger.info(f"Worker {self.worker_id} puxando jobs ({self.slots} vagas, faixas {self.lanes})")
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+        # Jobs interrompidos voltam à fila quando o lease expirar
+        for task in self.running.values():
+            task.cancel()
+        await asyncio.gather(*self.running.values(), return_exceptions=True)
+
+    async def _heartbeat(self):
+        await self.broker.run(
+            self.broker.heartbeat,
+            self.worker_id,
+            self.slots,
+            self.slots - len(self.running),
+            self.loaded_models(),
+            self.lanes,
+            list(self.running)
+        )
+
+    async def _run(self):
+        last_heartbeat = 0.0
+        while True:
+            try:
+                now = time.monotonic()
+                if now - last_heartbeat >= min(self.broker.lease_seconds / 3, 5):
+                    await self._heartbeat()
+                    last_heartbeat = now
+                claimed = False
+                if len(self.running) < self.slots:
+                    job = await self.broker.run(self.broker.claim, self.worker_id, self.loaded_models(), self.lanes)
+                    if job is not None:
+                        claimed = True
+                        self.running[job["id"]] = asyncio.create_task(self._execute(job))
+                        # Anuncia na hora a vaga ocupada para os outros workers
+                        await self._heartbeat()
+                        last_heartbeat = time.monotonic()
+                if not claimed:
+                    await asyncio.sleep(self.poll_interval)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Falha ao consultar o broker: {e}")
+                await asyncio.sleep(self.poll_interval * 5)
+
+    async def _execute(self, job: dict):
+        job_id = job["id"]
+        logger.info(f"Worker {self.worker_id} processando job {job_id} ({job['lane']}, {job['model']})")
+        try:
+            try:
+                result = await self.run_job(job)
+                await self.broker.run(self.broker.complete, job_id, self.worker_id, result)
+                self.completed += 1
+            except HTTPException as e:
+                await self.broker.run(self.broker.fail, job_id, self.worker_id, str(e.detail), e.status_code)
+                self.failed += 1
+            except Exception as e:
+                logger.error(f"Erro no job {job_id}: {e}")
+                await self.broker.run(self.broker.fail, job_id, self.worker_id, str(e))
+                self.failed += 1
+
+        finally:
+            self.running.pop(job_id, None)
+
+        if job["callback_url"]:
+            # O callback roda fora da vaga para não atrasar o próximo job
+            task = asyncio.create_task(self._notify(job_id, job["callback_url"]))
+            self._callbacks.add(task)
+            task.add_done_callback(self._callbacks.discard)
+
+    async def _notify(self, job_id: str, url: str):
+        payload = await self.broker.run(self.broker.get, job_id)
+        if payload is not None:
+            await asyncio.to_thread(post_callback, url, payload)
+
+    def stats(self) -> dict:
+        return {
+            "worker_id": self.worker_id,
+            "slots": self.slots,
+            "running": len(self.running),
+            "lanes": self.lanes,
+            "completed": self.completed,
+            "failed": self.failed
+        }
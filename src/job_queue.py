@@ -0,0 +1,207 @@
+"""
+Fila de jobs assíncrona para transcrições longas.
+
+O cliente envia o arquivo, recebe um job_id imediatamente e consulta o
+status depois (ou recebe o resultado via callback), sem manter a conexão
+HTTP aberta durante toda a inferência.
+"""
+import asyncio
+import json
+import logging
+import time
+import urllib.request
+import uuid
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from fastapi import HTTPException
+
+logger = logging.getLogger(__name__)
+
+JobHandler = Callable[[], Awaitable[Dict[str, Any]]]
+
+
+def post_callback(url: str, payload: dict, timeout: int = 30, retries: int = 3) -> bool:
+    """Envia o resultado do job para a URL de callback (bloqueante)"""
+    data = json.dumps(payload, default=str).encode("utf-8")
+    for attempt in range(1, retries + 1):
+        try:
+            request = urllib.request.Request(
+                url,
+                data=data,
+                headers={"Content-Type": "application/json"},
+                method="POST"
+            )
+            with urllib.request.urlopen(request, timeout=timeout) as response:
+                logger.info(f"Callback enviado para {url} (HTTP {response.status})")
+                return True
+        except Exception as e:
+            logger.warning(f"Falha no callback para {url} (tentativa {attempt}/{retries}): {e}")
+            if attempt < retries:
+                time.sleep(min(2 ** attempt, 10))
+    return False
+
+
+class JobManager:
+    """Gerencia jobs com fila limitada e um número fixo de workers"""
+
+    def __init__(self, max_workers: int = 2, max_queue_size: int = 100, result_ttl: int = 3600):
+        self.max_workers = max_workers
+        self.max_queue_size = max_queue_size
+        self.result_ttl = result_ttl
+        self.jobs: Dict[str, dict] = {}
+        self.handlers: Dict[str, JobHandler] = {}
+        self.queue: Optional[asyncio.Queue] = None
+        self.workers: List[asyncio.Task] = []
+        self._callbacks: set = set()
+
+    async def start(self):
+        """Inicia os workers (deve ser chamado dentro do event loop)"""
+        if self.workers:
+            return
+        self.queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self.workers = [
+            asyncio.create_task(self._worker(i)) for i in range(self.max_workers)
+        ]
+        logger.info(f"Fila de jobs iniciada com {self.max_workers} workers")
+
+    async def stop(self):
+        """Cancela os workers"""
+        for task in self.workers:
+            task.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+
+    def _new_job(self, callback_url: Optional[str], metadata: Optional[dict]) -> dict:
+        self._purge_expired()
+        job_id = uuid.uuid4().hex
+        job = {
+            "job_id": job_id,
+            "status": "queued",
+            "created_at": datetime.now().isoformat(),
+            "started_at": None,
+            "finished_at": None,
+            "callback_url": callback_url,
+            "metadata": metadata or {},
+            "result": None,
+            "error": None,
+            "_finished_ts": None
+        }
+        self.jobs[job_id] = job
+        return job
+
+    def submit(
+        self,
+        handler: JobHandler,
+        callback_url: Optional[str] = None,
+        metadata: Optional[dict] = None
+    ) -> dict:
+        """Enfileira um job e retorna seu registro"""
+        if self.queue is None:
+            raise HTTPException(status_code=503, detail="Fila de jobs não iniciada")
+        if self.queue.full():
+            raise HTTPException(status_code=503, detail="Fila de jobs cheia. Tente novamente mais tarde.")
+
+        job = self._new_job(callback_url, metadata)
+        self.handlers[job["job_id"]] = handler
+        self.queue.put_nowait(job["job_id"])
+        logger.info(f"Job {job['job_id']} enfileirado (fila: {self.queue.qsize()})")
+        return job
+
+    def submit_completed(
+        self,
+        result: Dict[str, Any],
+        callback_url: Optional[str] = None,
+        metadata: Optional[dict] = None
+    ) -> dict:
+        """Registra um job já concluído (ex.: resultado vindo do cache)"""
+        job = self._new_job(callback_url, metadata)
+        self._finish(job, "completed", result=result)
+        if callback_url:
+            self._schedule_notify(job)
+        return job
+
+    def get(self, job_id: str) -> Optional[dict]:
+        """Retorna o job (sem campos internos) ou None"""
+        job = self.jobs.get(job_id)
+        if job is None:
+            return None
+        public = {k: v for k, v in job.items() if not k.startswith("_")}
+        if job["status"] == "queued":
+            public["queue_position"] = self._queue_position(job_id)
+        return public
+
+    def stats(self) -> dict:
+        """Resumo da fila"""
+        counts: Dict[str, int] = {}
+        for job in self.jobs.values():
+            counts[job["status"]] = counts.get(job["status"], 0) + 1
+        return {
+            "workers": self.max_workers,
+            "queue_size": self.queue.qsize() if self.queue else 0,
+            "max_queue_size": self.max_queue_size,
+            "jobs": counts
+        }
+
+    def _queue_position(self, job_id: str) -> Optional[int]:
+        if self.queue is None:
+            return None
+        try:
+            # asyncio.Queue não expõe os itens publicamente
+            return list(self.queue._queue).index(job_id) + 1
+        except ValueError:
+            return None
+
+    def _finish(self, job: dict, status: str, result=None, error: Optional[str] = None):
+        job["status"] = status
+        job["result"] = result
+        job["error"] = error
+        job["finished_at"] = datetime.now().isoformat()
+        job["_finished_ts"] = time.time()
+
+    def _purge_expired(self):
+        """Remove jobs finalizados há mais de result_ttl segundos"""
+        now = time.time()
+        expired = [
+            job_id for job_id, job in self.jobs.items()
+            if job["_finished_ts"] and now - job["_finished_ts"] > self.result_ttl
+        ]
+        for job_id in expired:
+            del self.jobs[job_id]
+
+    def _schedule_notify(self, job: dict):
+        # Callbacks rodam fora do worker para não ocupar um slot de inferência
+        task = asyncio.create_task(self._notify(job))
+        self._callbacks.add(task)
+        task.add_done_callback(self._callbacks.discard)
+
+    async def _notify(self, job: dict):
+        payload = {k: v for k, v in job.items() if not k.startswith("_")}
+        await asyncio.to_thread(post_callback, job["callback_url"], payload)
+
+    async def _worker(self, worker_id: int):
+        while True:
+            job_id = await self.queue.get()
+            job = self.jobs.get(job_id)
+            handler = self.handlers.pop(job_id, None)
+            try:
+                if job is None or handler is None:
+                    continue
+
+                job["status"] = "running"
+                job["started_at"] = datetime.now().isoformat()
+                logger.info(f"Worker {worker_id} processando job {job_id}")
+
+                try:
+                    result = await handler()
+                    self._finish(job, "completed", result=result)
+                except HTTPException as e:
+                    self._finish(job, "failed", error=str(e.detail))
+                except Exception as e:
+                    logger.error(f"Erro no job {job_id}: {e}")
+                    self._finish(job, "failed", error=str(e))
+
+                if job["callback_url"]:
+                    self._schedule_notify(job)
+            finally:
+                self.queue.task_done()
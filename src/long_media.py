@@ -0,0 +1,148 @@
+"""
+Modo para mídias longas: divide o áudio nos silêncios (VAD por energia),
+transcreve os trechos em paralelo pelo executor de inferência do serviço
+(run_chunk) e junta os segmentos com os timestamps corrigidos. Trechos
+silenciosos são ignorados.
+"""
+import asyncio
+import logging
+from collections import Counter
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+FRAME_MS = 30
+
+
+def _frame_energy_db(audio: np.ndarray, frame_len: int) -> np.ndarray:
+    n_frames = len(audio) // frame_len
+    if n_frames == 0:
+        return np.zeros(0, dtype=np.float32)
+    frames = audio[:n_frames * frame_len].reshape(n_frames, frame_len)
+    rms = np.sqrt(np.mean(frames ** 2, axis=1) + 1e-12)
+    return 20 * np.log10(rms)
+
+
+def split_on_silence(
+    audio: np.ndarray,
+    max_chunk_seconds: float = 60,
+    min_silence_ms: int = 500,
+    padding_ms: int = 200,
+    threshold_db: Optional[float] = None
+) -> List[Tuple[int, int]]:
+    """
+    Retorna (início, fim) em amostras dos trechos com fala.
+
+    O limiar padrão é adaptativo: 35 dB abaixo do pico (percentil 95) de
+    energia, nunca abaixo de -60 dBFS. Trechos longos são cortados no frame
+    mais silencioso dos últimos 5s antes de max_chunk_seconds.
+    """
+    frame_len = SAMPLE_RATE * FRAME_MS // 1000
+    energy = _frame_energy_db(audio, frame_len)
+    if len(energy) == 0:
+        return []
+
+    if threshold_db is None:
+        threshold_db = max(np.percentile(energy, 95) - 35, -60)
+    speech = energy > threshold_db
+
+    # Regiões contínuas de fala, unindo pausas menores que min_silence_ms
+    min_gap = max(1, min_silence_ms // FRAME_MS)
+    regions: List[List[int]] = []
+    for i in np.flatnonzero(speech):
+        if regions and i - regions[-1][1] <= min_gap:
+            regions[-1][1] = i + 1
+        else:
+            regions.append([i, i + 1])
+
+    pad = padding_ms // FRAME_MS
+    max_frames = int(max_chunk_seconds * 1000 // FRAME_MS)
+    search_frames = min(max_frames // 2, 5000 // FRAME_MS)
+    chunks: List[Tuple[int, int]] = []
+
+    for start, end in regions:
+        start = max(0, start - pad)
+        end = min(len(energy), end + pad)
+        while end - start > max_frames:
+            window_start = start + max_frames - search_frames
+            cut = window_start + int(np.argmin(energy[window_start:start + max_frames]))
+            chunks.append((start, cut))
+            start = cut
+        chunks.append((start, end))
+
+    # Une trechos curtos vizinhos enquanto couberem no tamanho máximo
+    merged: List[Tuple[int, int]] = []
+    for start, end in chunks:
+        if merged and end - merged[-1][0] <= max_frames and start - merged[-1][1] <= min_gap * 4:
+            merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+
+    last_sample = len(audio)
+    return [
+        (start * frame_len, last_sample if end == len(energy) else end * frame_len)
+        for start, end in merged
+    ]
+
+
+def stitch_results(results: List[dict], offsets: List[float]) -> dict:
+    """Junta os resultados dos trechos corrigindo timestamps e ids"""
+    segments = []
+    texts = []
+    languages = Counter()
+
+    for result, offset in zip(results, offsets):
+        languages[result.get("language")] += 1
+        text = result.get("text", "").strip()
+        if text:
+            texts.append(text)
+        for segment in result.get("segments", []):
+            segment = dict(segment)
+            segment["id"] = len(segments)
+            segment["seek"] = segment.get("seek", 0) + int(offset * 100)
+            segment["start"] = round(segment["start"] + offset, 2)
+            segment["end"] = round(segment["end"] + offset, 2)
+            segments.append(segment)
+
+    return {
+        "text": " ".join(texts),
+        "segments": segments,
+        "language": languages.most_common(1)[0][0] if languages else None
+    }
+
+
+class LongMediaTranscriber:
+    """Divide a mídia nos silêncios e transcreve os trechos em paralelo"""
+
+    def __init__(self, max_chunk_seconds: float = 60):
+        self.max_chunk_seconds = max_chunk_seconds
+
+    async def transcribe(
+        self,
+        audio: np.ndarray,
+        options: dict,
+        run_chunk: Callable[..., Awaitable[dict]]
+    ) -> dict:
+        """
+        Transcreve os trechos com fala em paralelo e junta o resultado.
+        run_chunk(trecho, **options) executa cada trecho (ex.: na faixa bulk
+        do escalonador, que limita quantos rodam ao mesmo tempo).
+        """
+        chunks = split_on_silence(audio, self.max_chunk_seconds)
+        speech_seconds = sum(end - start for start, end in chunks) / SAMPLE_RATE
+        logger.info(
+            f"Mídia longa: {len(chunks)} trechos, {speech_seconds:.1f}s de fala "
+            f"em {len(audio) / SAMPLE_RATE:.1f}s de áudio"
+        )
+
+        results = await asyncio.gather(*[
+            run_chunk(audio[start:end], **options) for start, end in chunks
+        ])
+
+        stitched = stitch_results(results, [start / SAMPLE_RATE for start, _ in chunks])
+        stitched["chunks"] = len(chunks)
+        stitched["speech_seconds"] = round(speech_seconds, 2)
+        return stitched
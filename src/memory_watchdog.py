@@ -0,0 +1,135 @@
+"""
+Watchdog de memória com níveis de degradação.
+
+Uma task em segundo plano mede o RSS do processo em relação ao limite de
+memória do container (cgroup) ou da máquina. Conforme a pressão sobe, o
+nível avança (direto para o nível da pressão atual: esperar um passo por
+amostra pode custar um OOM); quando cai, volta um nível por amostra e só
+abaixo do limiar menos a histerese, para não oscilar. O serviço decide o
+que cada nível faz através do callback on_change(anterior, novo).
+"""
+import asyncio
+import logging
+from typing import Callable, Optional, Sequence
+
+import psutil
+
+logger = logging.getLogger(__name__)
+
+# Nível 0 = normal; o nível N entra quando a pressão passa de thresholds[N - 1]
+TIERS = ("normal", "trim_cache", "unload_idle", "tiny_only", "reduced_ocr")
+DEFAULT_THRESHOLDS = (0.60, 0.70, 0.80, 0.90)
+
+CGROUP_LIMIT_FILES = (
+    "/sys/fs/cgroup/memory.max",  # cgroup v2
+    "/sys/fs/cgroup/memory/memory.limit_in_bytes"  # cgroup v1
+)
+
+
+def memory_limit() -> int:
+    """Limite de memória do container, ou a memória total da máquina"""
+    total = psutil.virtual_memory().total
+    for path in CGROUP_LIMIT_FILES:
+        try:
+            with open(path) as f:
+                value = f.read().strip()
+        except OSError:
+            continue
+        if value.isdigit():
+            # Sem limite, o cgroup v1 reporta um número enorme
+            return min(int(value), total)
+    return total
+
+
+def parse_thresholds(spec: str) -> tuple:
+    """Limiares (frações do limite) no formato "0.6,0.7,0.8,0.9", um por nível"""
+    if not spec:
+        return DEFAULT_THRESHOLDS
+    thresholds = tuple(float(value) for value in spec.split(","))
+    if len(thresholds) != len(TIERS) - 1 or list(thresholds) != sorted(thresholds):
+        raise ValueError(f"Informe {len(TIERS) - 1} limiares crescentes para {', '.join(TIERS[1:])}")
+    return thresholds
+
+
+class MemoryWatchdog:
+    """Avança/recua níveis de degradação conforme o RSS do processo"""
+
+    def __init__(
+        self,
+        on_change: Callable[[int, int], None],
+        thresholds: Sequence[float] = DEFAULT_THRESHOLDS,
+        interval: float = 2.0,
+        hysteresis: float = 0.05,
+        limit_bytes: Optional[int] = None
+    ):
+        self.on_change = on_change
+        self.thresholds = tuple(thresholds)
+        self.interval = interval
+        self.hysteresis = hysteresis
+        self.limit_bytes = limit_bytes or memory_limit()
+        self.process = psutil.Process()
+        self.tier = 0
+        self.rss = 0
+        self.pressure = 0.0
+        self.transitions = 0
+        self.task: Optional[asyncio.Task] = None
+
+    @property
+    def tier_name(self) -> str:
+        return TIERS[self.tier]
+
+    def target_tier(self, pressure: float) -> int:
+        """Nível para a pressão medida, respeitando a histerese na descida"""
+        rising = sum(1 for threshold in self.thresholds if pressure >= threshold)
+        if rising >= self.tier:
+            return rising
+        # Descer um nível só quando a pressão ficar abaixo do limiar dele menos a histerese
+        if pressure < self.thresholds[self.tier - 1] - self.hysteresis:
+            return self.tier - 1
+        return self.tier
+
+    def check(self) -> int:
+        """Mede o RSS e aplica a mudança de nível (se houver)"""
+        self.rss = self.process.memory_info().rss
+        self.pressure = self.rss / self.limit_bytes
+        tier = self.target_tier(self.pressure)
+        if tier != self.tier:
+            previous, self.tier = self.tier, tier
+            self.transitions += 1
+            logger.warning(
+                f"Pressão de memória {self.pressure:.0%}: nível {TIERS[previous]} -> {TIERS[tier]}"
+            )
+            try:
+                self.on_change(previous, tier)
+            except Exception as e:
+                logger.error(f"Erro ao aplicar nível de degradação {TIERS[tier]}: {e}")
+        return self.tier
+
+    async def start(self):
+        if self.task is None:
+            self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+
+    async def _run(self):
+        while True:
+            try:
+                self.check()
+            except Exception as e:
+                logger.warning(f"Falha no watchdog de memória: {e}")
+            await asyncio.sleep(self.interval)
+
+    def stats(self) -> dict:
+        return {
+            "tier": self.tier,
+            "tier_name": self.tier_name,
+            "rss_mb": round(self.rss / 1024 / 1024, 1),
+            "limit_mb": round(self.limit_bytes / 1024 / 1024, 1),
+            "pressure": round(self.pressure, 3),
+            "thresholds": dict(zip(TIERS[1:], self.thresholds)),
+            "transitions": self.transitions
+        }
@@ -0,0 +1,95 @@
+"""
+Métricas Prometheus compartilhadas pelos serviços (endpoint /metrics).
+
+Cada serviço é um alvo de scrape separado, então as séries não levam o
+nome do serviço: o Prometheus já adiciona job/instance.
+"""
+import functools
+import time
+from contextlib import contextmanager
+from typing import Callable
+
+from fastapi import Response
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+
+# De poucos ms (hash, parse) a minutos (inferência de mídias longas)
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+STAGE_SECONDS = Histogram(
+    "avantar_stage_seconds",
+    "Duração de cada etapa do pipeline",
+    ["stage"],
+    buckets=STAGE_BUCKETS
+)
+CACHE_REQUESTS = Counter(
+    "avantar_cache_requests_total",
+    "Consultas ao cache de resultados por camada e resultado",
+    ["tier", "result"]
+)
+QUEUE_DEPTH = Gauge(
+    "avantar_queue_depth",
+    "Itens aguardando em cada fila",
+    ["queue"]
+)
+MODEL_LOADS = Counter(
+    "avantar_model_loads_total",
+    "Carregamentos de modelo (inclui recarregamentos após despejo)",
+    ["model"]
+)
+MODEL_LOAD_SECONDS = Histogram(
+    "avantar_model_load_seconds",
+    "Tempo de carregamento de modelo",
+    ["model"],
+    buckets=(0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+)
+
+
+@contextmanager
+def observe_stage(stage: str):
+    """Mede o bloco como uma etapa do pipeline"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.labels(stage).observe(time.perf_counter() - start)
+
+
+def timed_stage(stage: str):
+    """Decorador: mede cada chamada da função como uma etapa"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with observe_stage(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record_stage(stage: str, seconds: float):
+    """Registra uma etapa medida fora de observe_stage"""
+    STAGE_SECONDS.labels(stage).observe(seconds)
+
+
+def record_cache(tier: str, hit: bool):
+    CACHE_REQUESTS.labels(tier, "hit" if hit else "miss").inc()
+
+
+def track_queue(queue: str, depth: Callable[[], float]):
+    """Profundidade da fila lida no momento do scrape"""
+    QUEUE_DEPTH.labels(queue).set_function(depth)
+
+
+def timed_loader(loader: Callable) -> Callable:
+    """Envolve o loader de modelos contando carregamentos e tempo"""
+    def load(name: str):
+        start = time.perf_counter()
+        model = loader(name)
+        MODEL_LOADS.labels(name).inc()
+        MODEL_LOAD_SECONDS.labels(name).observe(time.perf_counter() - start)
+        return model
+
+    return load
+
+
+def metrics_response() -> Response:
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
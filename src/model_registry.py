@@ -0,0 +1,159 @@
+"""
+Registro de modelos Whisper com carregamento sob demanda.
+
+Cada modelo é carregado na primeira vez em que é pedido e tem sua memória
+contabilizada (parâmetros + buffers). Quando o total passa do orçamento
+configurado, os modelos usados há mais tempo são descarregados (LRU).
+"""
+import gc
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def load_whisper_model(name: str):
+    """Loader padrão (o whisper só é importado no primeiro carregamento)"""
+    from weight_store import load_whisper
+
+    return load_whisper(name)
+
+
+def model_memory_bytes(model) -> int:
+    """Memória ocupada pelos tensores do modelo"""
+    total = 0
+    for tensor in list(model.parameters()) + list(model.buffers()):
+        if tensor.is_sparse:
+            continue
+        total += tensor.numel() * tensor.element_size()
+    return total
+
+
+class ModelRegistry:
+    """Modelos carregados sob demanda com orçamento de memória e despejo LRU"""
+
+    def __init__(
+        self,
+        loader: Optional[Callable[[str], Any]] = None,
+        memory_budget_mb: int = 0,
+        pinned: Iterable[str] = ()
+    ):
+        self.loader = loader or load_whisper_model
+        self.memory_budget = memory_budget_mb * 1024 * 1024  # 0 = sem limite
+        self.pinned = set(pinned)
+        self.models: "OrderedDict[str, Any]" = OrderedDict()
+        self.sizes: Dict[str, int] = {}
+        self.last_used: Dict[str, float] = {}
+        self.load_counts: Dict[str, int] = {}
+        self.load_seconds: Dict[str, float] = {}
+        self.evictions = 0
+        self.lock = threading.Lock()
+        self.load_locks: Dict[str, threading.Lock] = {}
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.models
+
+    def get(self, name: str):
+        """Retorna o modelo, carregando-o se necessário (bloqueante)"""
+        with self.lock:
+            model = self.models.get(name)
+            if model is not None:
+                self.models.move_to_end(name)
+                self.last_used[name] = time.time()
+                return model
+            load_lock = self.load_locks.setdefault(name, threading.Lock())
+
+        # Um carregamento por modelo; requisições concorrentes aguardam o mesmo
+        with load_lock:
+            with self.lock:
+                if name in self.models:
+                    self.models.move_to_end(name)
+                    self.last_used[name] = time.time()
+                    return self.models[name]
+
+            logger.info(f"Carregando modelo Whisper: {name}")
+            start = time.time()
+            model = self.loader(name)
+            elapsed = time.time() - start
+            size = model_memory_bytes(model)
+            logger.info(f"Modelo {name} carregado em {elapsed:.1f}s ({size / 1024 / 1024:.0f}MB)")
+
+            with self.lock:
+                self.models[name] = model
+                self.sizes[name] = size
+                self.last_used[name] = time.time()
+                self.load_counts[name] = self.load_counts.get(name, 0) + 1
+                self.load_seconds[name] = round(elapsed, 2)
+                self._enforce_budget(keep=name)
+            return model
+
+    def _enforce_budget(self, keep: Optional[str] = None):
+        """Descarrega modelos LRU até caber no orçamento (chamar com lock)"""
+        if not self.memory_budget:
+            return
+        for name in list(self.models):
+            if self.total_bytes() <= self.memory_budget:
+                break
+            if name == keep or name in self.pinned:
+                continue
+            self._evict(name)
+        if self.total_bytes() > self.memory_budget:
+            logger.warning(
+                f"Modelos carregados ({self.total_bytes() / 1024 / 1024:.0f}MB) "
+                f"excedem o orçamento de {self.memory_budget / 1024 / 1024:.0f}MB"
+            )
+
+    def _evict(self, name: str):
+        logger.info(f"Descarregando modelo {name} (LRU)")
+        del self.models[name]
+        self.sizes.pop(name, None)
+        self.evictions += 1
+        # Quem estiver usando o modelo mantém a referência até terminar
+        gc.collect()
+
+    def evict(self, name: str) -> bool:
+        """Descarrega um modelo explicitamente"""
+        with self.lock:
+            if name not in self.models:
+                return False
+            self._evict(name)
+            return True
+
+    def evict_idle(self, idle_seconds: float) -> list:
+        """Descarrega os modelos sem uso há mais de idle_seconds (exceto fixados)"""
+        cutoff = time.time() - idle_seconds
+        with self.lock:
+            idle = [
+                name for name in self.models
+                if name not in self.pinned and self.last_used.get(name, 0) < cutoff
+            ]
+            for name in idle:
+                self._evict(name)
+            return idle
+
+    def total_bytes(self) -> int:
+        return sum(self.sizes.values())
+
+    def loaded(self) -> list:
+        return list(self.models.keys())
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "loaded": [
+                    {
+                        "name": name,
+                        "memory_mb": round(self.sizes[name] / 1024 / 1024, 1),
+                        "last_used": self.last_used.get(name),
+                        "load_seconds": self.load_seconds.get(name)
+                    }
+                    for name in self.models
+                ],
+                "total_memory_mb": round(self.total_bytes() / 1024 / 1024, 1),
+                "memory_budget_mb": self.memory_budget // (1024 * 1024) or None,
+                "load_counts": dict(self.load_counts),
+                "evictions": self.evictions
+            }
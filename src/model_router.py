@@ -0,0 +1,147 @@
+"""
+Roteamento de modelos pela duração do áudio.
+
+A duração vem do cabeçalho do container (ffprobe, sem decodificar), e cada
+modelo tem um fator de tempo real (RTF = segundos de inferência / segundos
+de áudio) estimado por média móvel exponencial dos jobs recentes. O
+roteador escolhe o modelo mais preciso cuja latência estimada, somada à
+espera da fila atual, cabe na meta configurada.
+"""
+import asyncio
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# RTF inicial em CPU (ponto de partida da média móvel dos jobs medidos)
+DEFAULT_RTF = {
+    "tiny": 0.1,
+    "base": 0.2,
+    "small": 0.6,
+    "medium": 1.8,
+    "large": 3.5
+}
+
+
+async def probe_duration(path: str, timeout: float = 10) -> Optional[float]:
+    """Lê a duração (s) do cabeçalho com ffprobe; None se não for possível"""
+    try:
+        process = await asyncio.create_subprocess_exec(
+            'ffprobe', '-v', 'error',
+            '-show_entries', 'format=duration',
+            '-of', 'default=noprint_wrappers=1:nokey=1',
+            path,
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL
+        )
+    except OSError as e:
+        logger.warning(f"ffprobe indisponível: {e}")
+        return None
+    try:
+        stdout, _ = await asyncio.wait_for(process.communicate(), timeout)
+    except asyncio.TimeoutError:
+        process.kill()
+        await process.wait()
+        return None
+
+    try:
+        duration = float(stdout.decode().strip().splitlines()[0])
+    except (IndexError, ValueError):
+        # Alguns containers (ex.: opus em webm) não trazem a duração no cabeçalho
+        return None
+    return duration if duration > 0 else None
+
+
+class ModelRouter:
+    """Escolhe o modelo pela duração, RTF medido e profundidade da fila"""
+
+    def __init__(
+        self,
+        models: List[str],
+        latency_target: float = 30,
+        parallelism: int = 1,
+        alpha: float = 0.3
+    ):
+        self.models = list(models)  # do mais rápido para o mais preciso
+        self.latency_target = latency_target
+        self.parallelism = max(1, parallelism)
+        self.alpha = alpha
+        self.rtf: Dict[str, float] = {m: DEFAULT_RTF.get(m, 1.0) for m in self.models}
+        self.samples: Dict[str, int] = {m: 0 for m in self.models}
+        self.routed: Dict[str, int] = {m: 0 for m in self.models}
+        self.avg_job_seconds: Optional[float] = None
+        self.inflight = 0
+        self.lock = threading.Lock()
+
+    def estimate(self, model: str, duration: float, queue_depth: Optional[int] = None) -> float:
+        """Latência estimada (s): espera da fila + inferência deste áudio"""
+        if queue_depth is None:
+            queue_depth = self.inflight
+        job_seconds = self.rtf.get(model, 1.0) * duration
+        # Jobs à frente que não cabem nos slots livres formam "ondas" de espera
+        waves = queue_depth // self.parallelism
+        wait = waves * (self.avg_job_seconds if self.avg_job_seconds is not None else job_seconds)
+        return wait + job_seconds
+
+    def choose(self, duration: float, queue_depth: Optional[int] = None, candidates: Optional[List[str]] = None) -> str:
+        """Modelo mais preciso que cumpre a meta; o mais rápido se nenhum cumprir"""
+        models = [m for m in self.models if candidates is None or m in candidates] or self.models
+        chosen = models[0]
+        for model in models:
+            if self.estimate(model, duration, queue_depth) <= self.latency_target:
+                chosen = model
+        with self.lock:
+            self.routed[chosen] = self.routed.get(chosen, 0) + 1
+        return chosen
+
+    def record(self, model: str, audio_seconds: float, elapsed: float):
+        """Atualiza o RTF do modelo com a medição de um job"""
+        if audio_seconds <= 0:
+            return
+        rtf = elapsed / audio_seconds
+        with self.lock:
+            # A primeira medição também entra na média: um job atípico (ex.: o
+            # primeiro após o aquecimento) não substitui o valor inicial
+            previous = self.rtf.get(model, DEFAULT_RTF.get(model, 1.0))
+            self.rtf[model] = self.alpha * rtf + (1 - self.alpha) * previous
+            self.samples[model] = self.samples.get(model, 0) + 1
+            if self.avg_job_seconds is None:
+                self.avg_job_seconds = elapsed
+            else:
+                self.avg_job_seconds = self.alpha * elapsed + (1 - self.alpha) * self.avg_job_seconds
+
+    def record_result(self, model: str, audio_seconds: float, result: dict):
+        """Registra o tempo de inferência medido no worker (chave inference_seconds)"""
+        elapsed = result.pop("inference_seconds", None)
+        if elapsed is not None:
+            self.record(model, audio_seconds, elapsed)
+
+    @contextmanager
+    def track(self):
+        """
+        Conta o job como em andamento (profundidade da fila usada pelo estimate).
+        O RTF é registrado à parte com record(), só com o tempo da inferência:
+        a espera na fila já entra no estimate pela profundidade.
+        """
+        with self.lock:
+            self.inflight += 1
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.inflight -= 1
+
+    def stats(self) -> dict:
+        return {
+            "models": self.models,
+            "latency_target_seconds": self.latency_target,
+            "parallelism": self.parallelism,
+            "inflight": self.inflight,
+            "rtf": {m: round(v, 3) for m, v in self.rtf.items()},
+            "samples": dict(self.samples),
+            "routed": dict(self.routed),
+            "avg_job_seconds": round(self.avg_job_seconds, 2) if self.avg_job_seconds is not None else None
+        }
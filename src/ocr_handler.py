@@ -0,0 +1,104 @@
+"""
+Capacidade "ocr": OCR de imagens (EasyOCR e Tesseract).
+
+Importado sob demanda pelo serviço (capabilities.py). O leitor do EasyOCR
+(que carrega o torch e os pesos de detecção/reconhecimento) é criado por
+load_easyocr() no primeiro uso; o aquecimento só o antecipa.
+"""
+import logging
+import threading
+from typing import Optional
+
+import pytesseract
+from fastapi import HTTPException
+from PIL import Image
+
+from metrics import timed_stage
+
+logger = logging.getLogger(__name__)
+
+# EasyOCR - melhor para textos complexos; criado uma única vez, no aquecimento
+# ou na primeira requisição que precisar dele
+easyocr_reader = None
+easyocr_lock = threading.Lock()
+
+# Configurar Tesseract (se disponível)
+try:
+    # Tentar detectar Tesseract
+    pytesseract.pytesseract.tesseract_cmd = 'tesseract'  # Linux/Docker
+    pytesseract.get_tesseract_version()
+    tesseract_available = True
+    logger.info("Tesseract OCR disponível!")
+except:
+    tesseract_available = False
+    logger.warning("Tesseract OCR não encontrado")
+
+
+def load_easyocr():
+    """Cria o leitor do EasyOCR se ainda não existir (chamadas concorrentes aguardam o mesmo)"""
+    global easyocr_reader
+    with easyocr_lock:
+        if easyocr_reader is None:
+            import easyocr
+
+            easyocr_reader = easyocr.Reader(['pt', 'en'], gpu=False)
+            logger.info("EasyOCR inicializado com sucesso!")
+    return easyocr_reader
+
+
+def get_easyocr_reader() -> Optional[object]:
+    """Leitor do EasyOCR, carregando-o no primeiro uso; None se não puder ser criado"""
+    try:
+        return load_easyocr()
+    except Exception as e:
+        logger.warning(f"EasyOCR indisponível: {e}")
+        return None
+
+
+def status() -> dict:
+    return {
+        "easyocr": easyocr_reader is not None,
+        "tesseract": tesseract_available
+    }
+
+
+@timed_stage("ocr_page")
+def extract_text_from_image(image_path: str, method: str = "easyocr") -> dict:
+    """Extrai texto de imagem usando OCR"""
+    try:
+        reader = get_easyocr_reader() if method == "easyocr" else None
+        if reader is not None:
+            # EasyOCR - melhor para textos complexos
+            results = reader.readtext(image_path)
+            text = " ".join([result[1] for result in results])
+            confidence = sum([result[2] for result in results]) / len(results) if results else 0
+
+            return {
+                "text": text.strip(),
+                "method": "EasyOCR",
+                "confidence": confidence,
+                "details": results
+            }
+
+        elif method == "tesseract" and tesseract_available:
+            # Tesseract OCR
+            image = Image.open(image_path)
+            text = pytesseract.image_to_string(image, lang='por+eng')
+
+            # Obter dados detalhados
+            data = pytesseract.image_to_data(image, output_type=pytesseract.Output.DICT, lang='por+eng')
+            confidences = [int(conf) for conf in data['conf'] if int(conf) > 0]
+            avg_confidence = sum(confidences) / len(confidences) if confidences else 0
+
+            return {
+                "text": text.strip(),
+                "method": "Tesseract",
+                "confidence": avg_confidence / 100,
+                "details": data
+            }
+        else:
+            raise Exception("Nenhum OCR disponível")
+
+    except Exception as e:
+        logger.error(f"Erro no OCR: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Erro no OCR: {str(e)}")
@@ -0,0 +1,104 @@
+"""
+Capacidade "documents": extração de texto de Word, Excel e PowerPoint.
+
+Importado sob demanda pelo serviço (capabilities.py).
+"""
+import logging
+
+import openpyxl
+from docx import Document
+from fastapi import HTTPException
+from pptx import Presentation
+
+logger = logging.getLogger(__name__)
+
+
+def extract_text_from_docx(docx_path: str) -> dict:
+    """Extrai texto de arquivo Word"""
+    try:
+        doc = Document(docx_path)
+        text_content = ""
+
+        for paragraph in doc.paragraphs:
+            text_content += paragraph.text + "\n"
+
+        # Extrair texto de tabelas também
+        for table in doc.tables:
+            for row in table.rows:
+                for cell in row.cells:
+                    text_content += cell.text + " "
+                text_content += "\n"
+
+        return {
+            "text": text_content.strip(),
+            "method": "Direct extraction",
+            "paragraphs": len(doc.paragraphs),
+            "tables": len(doc.tables)
+        }
+
+    except Exception as e:
+        logger.error(f"Erro ao processar DOCX: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Erro ao processar DOCX: {str(e)}")
+
+
+def extract_text_from_excel(excel_path: str) -> dict:
+    """Extrai texto de arquivo Excel"""
+    try:
+        workbook = openpyxl.load_workbook(excel_path, data_only=True)
+        text_content = ""
+        sheets_processed = 0
+
+        for sheet_name in workbook.sheetnames:
+            sheet = workbook[sheet_name]
+            text_content += f"\n=== {sheet_name} ===\n"
+
+            for row in sheet.iter_rows(values_only=True):
+                row_text = " | ".join([str(cell) if cell is not None else "" for cell in row])
+                if row_text.strip():
+                    text_content += row_text + "\n"
+
+            sheets_processed += 1
+
+        return {
+            "text": text_content.strip(),
+            "method": "Direct extraction",
+            "sheets": sheets_processed
+        }
+
+    except Exception as e:
+        logger.error(f"Erro ao processar Excel: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Erro ao processar Excel: {str(e)}")
+
+
+def extract_text_from_pptx(pptx_path: str) -> dict:
+    """Extrai texto de arquivo PowerPoint"""
+    try:
+        presentation = Presentation(pptx_path)
+        text_content = ""
+        slides_processed = 0
+
+        for i, slide in enumerate(presentation.slides):
+            text_content += f"\n=== Slide {i+1} ===\n"
+
+            for shape in slide.shapes:
+                if hasattr(shape, "text") and shape.text:
+                    text_content += shape.text + "\n"
+
+            slides_processed += 1
+
+        return {
+            "text": text_content.strip(),
+            "method": "Direct extraction",
+            "slides": slides_processed
+        }
+
+    except Exception as e:
+        logger.error(f"Erro ao processar PPTX: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Erro ao processar PPTX: {str(e)}")
+
+
+EXTRACTORS = {
+    ".docx": extract_text_from_docx,
+    ".xlsx": extract_text_from_excel,
+    ".pptx": extract_text_from_pptx
+}
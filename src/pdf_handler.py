@@ -0,0 +1,86 @@
+"""
+Capacidade "pdf": extração de texto de PDFs (direta e por OCR).
+
+Importado sob demanda pelo serviço (capabilities.py). PDFs escaneados
+usam o OCR de imagens de ocr_handler página a página; o leitor do EasyOCR é
+carregado aqui se ainda não existir (mesmo com a capacidade "ocr" desligada).
+"""
+import logging
+import os
+import tempfile
+
+import pdfplumber
+from fastapi import HTTPException
+from pdf2image import convert_from_path
+
+from metrics import timed_stage
+from ocr_handler import extract_text_from_image, get_easyocr_reader, tesseract_available
+
+logger = logging.getLogger(__name__)
+
+
+@timed_stage("pdf_extraction")
+def extract_text_from_pdf(pdf_path: str, method: str = "auto") -> dict:
+    """Extrai texto de PDF"""
+    try:
+        text_content = ""
+        pages_processed = 0
+
+        if method in ["auto", "direct"]:
+            # Tentar extrair texto direto primeiro (PDFs com texto)
+            try:
+                with pdfplumber.open(pdf_path) as pdf:
+                    for page in pdf.pages:
+                        page_text = page.extract_text()
+                        if page_text:
+                            text_content += page_text + "\n"
+                            pages_processed += 1
+
+                if text_content.strip():
+                    return {
+                        "text": text_content.strip(),
+                        "method": "Direct extraction",
+                        "pages": pages_processed,
+                        "type": "text_pdf"
+                    }
+            except Exception as e:
+                logger.warning(f"Falha na extração direta: {e}")
+
+        if method in ["auto", "ocr"] and not text_content.strip():
+            # PDF escaneado - usar OCR
+            logger.info("PDF parece ser escaneado, usando OCR...")
+
+            # EasyOCR carregado sob demanda; sem ele, Tesseract
+            ocr_method = "easyocr" if get_easyocr_reader() is not None else "tesseract"
+            if ocr_method == "tesseract" and not tesseract_available:
+                raise Exception("Nenhum OCR disponível para PDF escaneado")
+
+            # Converter PDF para imagens
+            images = convert_from_path(pdf_path, dpi=200)
+
+            for i, image in enumerate(images):
+                # Salvar imagem temporária
+                with tempfile.NamedTemporaryFile(suffix='.png', delete=False) as temp_img:
+                    image.save(temp_img.name, 'PNG')
+
+                    # Extrair texto da imagem
+                    result = extract_text_from_image(temp_img.name, ocr_method)
+                    text_content += result["text"] + "\n"
+                    pages_processed += 1
+
+                    # Limpar arquivo temporário
+                    os.unlink(temp_img.name)
+
+            return {
+                "text": text_content.strip(),
+                "method": "OCR (scanned PDF)",
+                "pages": pages_processed,
+                "type": "scanned_pdf"
+            }
+
+        if not text_content.strip():
+            raise Exception("Não foi possível extrair texto do PDF")
+
+    except Exception as e:
+        logger.error(f"Erro ao processar PDF: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Erro ao processar PDF: {str(e)}")
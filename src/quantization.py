@@ -0,0 +1,78 @@
+"""
+Variantes de precisão dos modelos Whisper para inferência em CPU.
+
+"int8" aplica quantização dinâmica (pesos int8, ativações quantizadas em
+tempo de execução) às camadas Linear, que concentram o custo do encoder e
+do decoder. Convoluções, embeddings e LayerNorm continuam em fp32.
+
+No registro de modelos cada variante é uma entrada própria: "base" (fp32)
+e "base:int8".
+"""
+import logging
+import platform
+from typing import Tuple
+
+logger = logging.getLogger(__name__)
+
+PRECISIONS = ("fp32", "int8")
+DEFAULT_PRECISION = "fp32"
+
+
+def model_key(model_name: str, precision: str = DEFAULT_PRECISION) -> str:
+    """Nome da variante no registro de modelos"""
+    if precision == DEFAULT_PRECISION:
+        return model_name
+    return f"{model_name}:{precision}"
+
+
+def split_model_key(key: str) -> Tuple[str, str]:
+    """'base:int8' -> ('base', 'int8'); 'base' -> ('base', 'fp32')"""
+    model_name, _, precision = key.partition(":")
+    return model_name, precision or DEFAULT_PRECISION
+
+
+def validate_precision(precision: str) -> str:
+    if precision not in PRECISIONS:
+        raise ValueError(f"Precisão inválida: {precision}. Use: {', '.join(PRECISIONS)}")
+    return precision
+
+
+def _select_quantized_engine():
+    import torch
+
+    # fbgemm/x86 em Intel/AMD; qnnpack em ARM (ex.: Graviton)
+    engines = torch.backends.quantized.supported_engines
+    if platform.machine().lower() in ("aarch64", "arm64") and "qnnpack" in engines:
+        torch.backends.quantized.engine = "qnnpack"
+
+
+def quantize_model(model):
+    """Quantiza (no próprio objeto) as camadas Linear do modelo para int8"""
+    import torch
+    import whisper
+    from torch import nn
+
+    _select_quantized_engine()
+
+    # whisper.model.Linear é uma subclasse de nn.Linear que só converte o dtype
+    # dos pesos; quantize_dynamic compara o tipo exato, então voltamos para nn.Linear
+    for module in model.modules():
+        if type(module) is whisper.model.Linear:
+            module.__class__ = nn.Linear
+
+    model.eval()
+    return torch.quantization.quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8, inplace=True)
+
+
+def load_model_variant(key: str):
+    """Loader do registro: carrega o modelo e aplica a precisão da variante"""
+    from weight_store import load_whisper
+
+    model_name, precision = split_model_key(key)
+    validate_precision(precision)
+    if precision == "int8":
+        # Quantização dinâmica só tem kernels para CPU
+        model = load_whisper(model_name, device="cpu")
+        logger.info(f"Quantizando modelo {model_name} para int8")
+        return quantize_model(model)
+    return load_whisper(model_name)
@@ -0,0 +1,127 @@
+"""
+Cache de resultados em memória com orçamento em bytes (LRU).
+
+get/put/despejo em O(1) sobre um OrderedDict. O tamanho de cada entrada é
+medido uma vez, ao gravar (sys.getsizeof recursivo sobre dicts, listas e
+strings), e o total fica contabilizado, então estatísticas não percorrem o
+cache. Entradas maiores que o orçamento inteiro não são guardadas.
+"""
+import sys
+import threading
+from collections import OrderedDict
+from typing import Any, Optional
+
+
+def entry_size(value: Any) -> int:
+    """Memória aproximada do valor (objetos compartilhados contados uma vez)"""
+    seen = set()
+    total = 0
+    stack = [value]
+    while stack:
+        item = stack.pop()
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+        total += sys.getsizeof(item)
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set)):
+            stack.extend(item)
+    return total
+
+
+class ResultCache:
+    """LRU limitado por bytes (e, opcionalmente, por número de entradas)"""
+
+    def __init__(self, max_bytes: int, max_entries: int = 0):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries  # 0 = sem limite
+        self.entries: "OrderedDict[str, Any]" = OrderedDict()
+        self.sizes = {}
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.rejected = 0
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.entries
+
+    def get(self, key: str) -> Optional[Any]:
+        with self.lock:
+            value = self.entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: str, value: Any) -> bool:
+        """Grava a entrada e despeja as menos usadas; False se não couber"""
+        size = entry_size(value)
+        with self.lock:
+            self._remove(key)
+            if size > self.max_bytes:
+                self.rejected += 1
+                return False
+            self.entries[key] = value
+            self.sizes[key] = size
+            self.bytes += size
+            self._evict_over_budget()
+            return True
+
+    def resize(self, max_bytes: int):
+        """Muda o orçamento, despejando as entradas que não couberem mais"""
+        with self.lock:
+            self.max_bytes = max_bytes
+            self._evict_over_budget()
+
+    def _evict_over_budget(self):
+        """Despeja as menos usadas até caber no orçamento (chamar com lock)"""
+        while self.entries and (
+            self.bytes > self.max_bytes or (self.max_entries and len(self.entries) > self.max_entries)
+        ):
+            oldest = next(iter(self.entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def pop(self, key: str) -> Optional[Any]:
+        with self.lock:
+            return self._remove(key)
+
+    def _remove(self, key: str) -> Optional[Any]:
+        """Remove a entrada (chamar com lock)"""
+        value = self.entries.pop(key, None)
+        if value is not None:
+            self.bytes -= self.sizes.pop(key)
+        return value
+
+    def clear(self) -> int:
+        """Esvazia o cache; retorna quantas entradas foram removidas"""
+        with self.lock:
+            removed = len(self.entries)
+            self.entries.clear()
+            self.sizes.clear()
+            self.bytes = 0
+            return removed
+
+    def stats(self) -> dict:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "max_entries": self.max_entries or None,
+                "memory_usage_mb": round(self.bytes / 1024 / 1024, 2),
+                "memory_budget_mb": round(self.max_bytes / 1024 / 1024, 2),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+                "evictions": self.evictions,
+                "rejected": self.rejected
+            }
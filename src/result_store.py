@@ -0,0 +1,150 @@
+"""
+Cache persistente de resultados em SQLite.
+
+Segunda camada abaixo do cache em memória: sobrevive a reinícios/deploys e
+é compartilhado entre workers e processos que usam o mesmo CACHE_DIR. O
+modo WAL permite leituras concorrentes com um escritor por vez.
+
+As chamadas ao SQLite bloqueiam (até busy_timeout com o banco travado): no
+event loop elas passam por DiskResultStore.run, num pool de threads próprio.
+"""
+import asyncio
+import functools
+import json
+import logging
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Limpeza de expirados/excedentes a cada N gravações
+PRUNE_EVERY = 50
+
+
+def _json_default(value):
+    # Tipos NumPy (ex.: coordenadas do EasyOCR) não são serializáveis por padrão
+    if hasattr(value, "item"):
+        return value.item()
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    return str(value)
+
+
+class DiskResultStore:
+    """Resultados indexados pela cache_key, com TTL e limite de entradas"""
+
+    def __init__(self, path: Path, ttl_seconds: int = 3600, max_entries: int = 1000, threads: int = 4):
+        self.path = str(path)
+        self.ttl = ttl_seconds
+        self.max_entries = max_entries
+        self.local = threading.local()
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="result-store")
+        self.writes = 0
+        self.hits = 0
+        self.misses = 0
+
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                " key TEXT PRIMARY KEY,"
+                " value TEXT NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " accessed_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_results_accessed ON results (accessed_at)")
+
+    def _connect(self) -> sqlite3.Connection:
+        """Uma conexão por thread (sqlite3 não compartilha conexões entre threads)"""
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self.local.conn = conn
+        return conn
+
+    async def run(self, func: Callable, *args, **kwargs):
+        """Executa um método do cache fora do event loop"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(func, *args, **kwargs))
+
+    def get(self, key: str) -> Optional[Any]:
+        try:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT value, created_at FROM results WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+
+            value, created_at = row
+            now = time.time()
+            if self.ttl and now - created_at > self.ttl:
+                conn.execute("DELETE FROM results WHERE key = ?", (key,))
+                self.misses += 1
+                return None
+
+            conn.execute("UPDATE results SET accessed_at = ? WHERE key = ?", (now, key))
+            self.hits += 1
+            return json.loads(value)
+        except sqlite3.Error as e:
+            logger.warning(f"Erro ao ler cache em disco: {e}")
+            return None
+
+    def put(self, key: str, value: Any):
+        try:
+            data = json.dumps(value, ensure_ascii=False, default=_json_default)
+            now = time.time()
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO results (key, value, size, created_at, accessed_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (key, data, len(data), now, now)
+            )
+            self.writes += 1
+            if self.writes % PRUNE_EVERY == 0:
+                self.prune()
+        except (sqlite3.Error, TypeError, ValueError) as e:
+            logger.warning(f"Erro ao gravar cache em disco: {e}")
+
+    def prune(self):
+        """Remove entradas expiradas e as menos acessadas acima do limite"""
+        conn = self._connect()
+        if self.ttl:
+            conn.execute("DELETE FROM results WHERE created_at < ?", (time.time() - self.ttl,))
+        if self.max_entries:
+            conn.execute(
+                "DELETE FROM results WHERE key IN ("
+                " SELECT key FROM results ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+
+    def clear(self) -> int:
+        conn = self._connect()
+        removed = conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        conn.execute("DELETE FROM results")
+        return removed
+
+    def stats(self) -> dict:
+        try:
+            count, size = self._connect().execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results"
+            ).fetchone()
+        except sqlite3.Error:
+            count, size = None, None
+        return {
+            "path": self.path,
+            "entries": count,
+            "size_mb": round(size / (1024 * 1024), 2) if size is not None else None,
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses
+        }
@@ -0,0 +1,83 @@
+"""
+Representação compacta dos segmentos de transcrição.
+
+Os segmentos do Whisper são uma lista de dicts com tokens, avg_logprob,
+compression_ratio etc., que dominam o tamanho do cache e das respostas.
+Internamente eles são guardados como arrays paralelos (start, end, text
+e só os demais campos pedidos); o id é a posição. As respostas expandem
+apenas os campos solicitados pelo cliente (detail= ou fields=).
+"""
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+BASIC_FIELDS = ("id", "start", "end", "text")
+FULL_FIELDS = (
+    "id", "seek", "start", "end", "text", "tokens",
+    "temperature", "avg_logprob", "compression_ratio", "no_speech_prob"
+)
+DETAIL_LEVELS = {
+    "none": (),
+    "basic": BASIC_FIELDS,
+    "full": FULL_FIELDS
+}
+
+# Campos sempre guardados (necessários para duração, streaming e detail=basic)
+STORED_FIELDS = ("start", "end", "text")
+
+
+def resolve_fields(detail: Optional[str] = "basic", fields: Optional[str] = None) -> Tuple[str, ...]:
+    """Campos pedidos: fields= (lista separada por vírgula) tem precedência sobre detail="""
+    if fields:
+        requested = {f.strip() for f in fields.split(",") if f.strip()}
+        unknown = requested - set(FULL_FIELDS)
+        if unknown:
+            raise ValueError(f"Campos inválidos: {', '.join(sorted(unknown))}. Use: {', '.join(FULL_FIELDS)}")
+        return tuple(f for f in FULL_FIELDS if f in requested)
+
+    detail = detail or "basic"
+    if detail not in DETAIL_LEVELS:
+        raise ValueError(f"detail inválido: {detail}. Use: {', '.join(DETAIL_LEVELS)}")
+    return DETAIL_LEVELS[detail]
+
+
+def compact_segments(segments: List[dict], fields: Iterable[str] = ()) -> dict:
+    """Lista de segmentos -> arrays paralelos com os campos básicos + fields"""
+    stored = [f for f in FULL_FIELDS if f != "id" and (f in STORED_FIELDS or f in fields)]
+    compact = {"fields": stored}
+    for field in stored:
+        if field == "text":
+            compact[field] = [segment.get("text", "").strip() for segment in segments]
+        else:
+            compact[field] = [segment.get(field) for segment in segments]
+    return compact
+
+
+def as_compact(segments) -> dict:
+    """Aceita também entradas antigas do cache (lista de dicts completos)"""
+    if isinstance(segments, list):
+        return compact_segments(segments, FULL_FIELDS)
+    return segments
+
+
+def covers(segments, fields: Sequence[str]) -> bool:
+    """Se os segmentos guardados têm todos os campos pedidos"""
+    stored = set(as_compact(segments)["fields"]) | {"id"}
+    return all(field in stored for field in fields)
+
+
+def expand_segments(segments, fields: Sequence[str]) -> List[dict]:
+    """Arrays paralelos -> lista de dicts apenas com os campos pedidos"""
+    compact = as_compact(segments)
+    count = len(compact["start"])
+    expanded = []
+    for i in range(count):
+        segment = {}
+        for field in fields:
+            segment[field] = i if field == "id" else compact[field][i]
+        expanded.append(segment)
+    return expanded
+
+
+def segments_end(segments) -> float:
+    """Fim do último segmento (duração transcrita)"""
+    ends = as_compact(segments)["end"]
+    return ends[-1] if ends else 0
@@ -0,0 +1,65 @@
+"""
+Deduplicação de trabalho em andamento (single-flight).
+
+A primeira requisição de uma chave inicia o processamento como uma task;
+requisições com a mesma chave que chegam antes de ele terminar aguardam a
+mesma task em vez de repetir o trabalho. A task é protegida com shield:
+se o cliente que a iniciou desconectar, as demais continuam esperando o
+resultado. Por isso a função executada deve ser dona dos seus arquivos
+temporários (removê-los ela mesma ao final).
+"""
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """Uma execução por chave; chamadas concorrentes compartilham o resultado"""
+
+    def __init__(self):
+        self.calls: Dict[str, asyncio.Future] = {}
+        self.started = 0
+        self.coalesced = 0
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.calls
+
+    def _finished(self, key: str, task: asyncio.Future):
+        if self.calls.get(key) is task:
+            del self.calls[key]
+        # Marca a exceção como lida mesmo se todos os que aguardavam desistiram
+        if not task.cancelled():
+            task.exception()
+
+    async def run(
+        self,
+        key: str,
+        factory: Callable[[], Awaitable[Any]],
+        on_join: Optional[Callable[[], Any]] = None
+    ) -> Any:
+        """
+        Executa factory() uma vez por chave em andamento.
+        on_join é chamado quando a chamada pega carona em outra já iniciada
+        (ex.: remover o próprio upload, que não será usado).
+        """
+        task = self.calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(factory())
+            self.calls[key] = task
+            task.add_done_callback(lambda t: self._finished(key, t))
+            self.started += 1
+        else:
+            self.coalesced += 1
+            logger.info(f"Aguardando processamento idêntico em andamento: {key}")
+            if on_join is not None:
+                on_join()
+        return await asyncio.shield(task)
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self.calls),
+            "started": self.started,
+            "coalesced": self.coalesced
+        }
@@ -1,8 +1,6 @@
 from fastapi import FastAPI, UploadFile, File, HTTPException, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
-import whisper
-import tempfile
 import os
 import uvicorn
 from typing import Optional, List
@@ -10,16 +8,27 @@ import logging
 import asyncio
 import aiofiles
 from pathlib import Path
-import subprocess
 import shutil
 from datetime import datetime
-import hashlib
 import json
 import gc
+import functools
 import psutil
-import threading
 from concurrent.futures import ThreadPoolExecutor
-import time
+
+from uploads import spool_upload, upload_suffix, is_oversized_request
+from audio_decode import decode_audio, AudioDecodeError, AudioDecodeTimeout, SAMPLE_RATE
+from model_registry import ModelRegistry
+from result_store import DiskResultStore
+from result_cache import ResultCache
+from singleflight import SingleFlight
+from admission import AdmissionController, AdmissionRejected
+from memory_watchdog import MemoryWatchdog, parse_thresholds
+from model_router import ModelRouter
+from quantization import PRECISIONS, load_model_variant, model_key
+from cpu_scheduler import CpuScheduler
+from worker_pool import transcribe_with_model
+from segments import compact_segments, covers, expand_segments, resolve_fields, segments_end
 
 # OCR e processamento de documentos (opcional)
 try:
@@ -54,23 +63,54 @@ CACHE_DIR.mkdir(exist_ok=True)
 
 MAX_FILE_SIZE = 25 * 1024 * 1024  # 25MB (reduzido)
 CHUNK_SIZE = 512 * 1024  # 512KB chunks
-MAX_CONCURRENT_REQUESTS = 2  # Limitar concorrência
+MAX_CONCURRENT_REQUESTS = int(os.getenv("MAX_CONCURRENT_REQUESTS", "2"))  # Limitar concorrência
+ADMISSION_QUEUE_SIZE = int(os.getenv("ADMISSION_QUEUE_SIZE", "8"))  # Requisições aguardando vaga
 MAX_CACHE_SIZE = 50  # Máximo 50 itens no cache
+CACHE_MEMORY_MB = int(os.getenv("CACHE_MEMORY_MB", "32"))
+AUDIO_FILTER = 'volume=1.5,highpass=f=200,lowpass=f=3000'  # Filtros para voz
+
+# Cache de resultados em memória: LRU limitado em bytes e em itens
+transcription_cache = ResultCache(CACHE_MEMORY_MB * 1024 * 1024, max_entries=MAX_CACHE_SIZE)
 
-# Cache de resultados com limpeza automática
-transcription_cache = {}
-cache_access_times = {}
+# Cache persistente em disco (sobrevive a reinícios)
+CACHE_ENABLED = os.getenv("CACHE_ENABLED", "true").lower() == "true"
+CACHE_TTL = int(os.getenv("CACHE_TTL", "3600"))
+CACHE_SIZE_LIMIT = int(os.getenv("CACHE_SIZE_LIMIT", "1000"))
+result_store = DiskResultStore(
+    CACHE_DIR / "results.sqlite3",
+    ttl_seconds=CACHE_TTL,
+    max_entries=CACHE_SIZE_LIMIT
+) if CACHE_ENABLED else None
 
 # Pool de threads para processamento
 executor = ThreadPoolExecutor(max_workers=2)
 
-# Modelo Whisper único (carregado sob demanda)
-whisper_model = None
-model_lock = threading.Lock()
+# Cores divididos entre os jobs ativos: cada transcrição/OCR usa só a sua fatia
+CPU_SCHEDULER_ENABLED = os.getenv("CPU_SCHEDULER_ENABLED", "true").lower() == "true"
+CPU_AFFINITY = os.getenv("CPU_AFFINITY", "false").lower() == "true"
+cpu_scheduler = CpuScheduler(use_affinity=CPU_AFFINITY, enabled=CPU_SCHEDULER_ENABLED)
+
+# Modelos Whisper carregados sob demanda, limitados por orçamento de memória (LRU)
+MODEL_MEMORY_BUDGET_MB = int(os.getenv("MODEL_MEMORY_BUDGET_MB", "1024"))
+model_registry = ModelRegistry(
+    loader=lambda key: cpu_scheduler.attach(load_model_variant(key)),
+    memory_budget_mb=MODEL_MEMORY_BUDGET_MB
+)
+
+# Precisão padrão: fp32 ou int8 (Linear quantizadas, ~1/4 da memória dessas camadas)
+INFERENCE_PRECISION = os.getenv("INFERENCE_PRECISION", "fp32")
+if INFERENCE_PRECISION not in PRECISIONS:
+    raise ValueError(f"INFERENCE_PRECISION inválida: {INFERENCE_PRECISION}. Use: {', '.join(PRECISIONS)}")
+
+# Roteamento pela duração e RTF medido (do mais rápido para o mais preciso)
+ROUTER_MODELS = [m.strip() for m in os.getenv("ROUTER_MODELS", "tiny,base").split(",") if m.strip()]
+ROUTER_LATENCY_TARGET = float(os.getenv("ROUTER_LATENCY_TARGET", "30"))
+model_router = ModelRouter(ROUTER_MODELS, latency_target=ROUTER_LATENCY_TARGET, parallelism=2)
 
 def get_system_resources():
     """Monitora recursos do sistema"""
-    cpu_percent = psutil.cpu_percent(interval=1)
+    # interval=None não bloqueia: uso desde a chamada anterior
+    cpu_percent = psutil.cpu_percent(interval=None)
     memory = psutil.virtual_memory()
     return {
         "cpu_percent": cpu_percent,
@@ -79,113 +119,75 @@ def get_system_resources():
         "memory_used_mb": memory.used // (1024 * 1024)
     }
 
-def cleanup_cache():
-    """Limpa cache baseado em LRU e tamanho"""
-    global transcription_cache, cache_access_times
-    
-    if len(transcription_cache) <= MAX_CACHE_SIZE:
-        return
-    
-    # Ordenar por tempo de acesso
-    sorted_items = sorted(cache_access_times.items(), key=lambda x: x[1])
-    
-    # Remover itens mais antigos
-    items_to_remove = len(transcription_cache) - MAX_CACHE_SIZE + 5
-    for cache_key, _ in sorted_items[:items_to_remove]:
-        if cache_key in transcription_cache:
-            del transcription_cache[cache_key]
-        if cache_key in cache_access_times:
-            del cache_access_times[cache_key]
-    
-    # Forçar garbage collection
-    gc.collect()
-    logger.info(f"Cache limpo. Itens restantes: {len(transcription_cache)}")
+async def get_cached_result(cache_key: str) -> Optional[dict]:
+    """Busca no cache em memória e, se não houver, no cache em disco"""
+    cached = transcription_cache.get(cache_key)
+    if cached is None and result_store is not None:
+        cached = await result_store.run(result_store.get, cache_key)
+        if cached is not None:
+            transcription_cache.put(cache_key, cached)
+    return cached
 
-def load_whisper_model(model_name: str = "tiny"):
-    """Carrega modelo Whisper sob demanda"""
-    global whisper_model
-    
-    with model_lock:
-        if whisper_model is None:
-            logger.info(f"Carregando modelo Whisper: {model_name}")
-            try:
-                whisper_model = whisper.load_model(model_name)
-                logger.info("Modelo carregado com sucesso!")
-            except Exception as e:
-                logger.error(f"Erro ao carregar modelo: {e}")
-                raise HTTPException(status_code=500, detail="Erro ao carregar modelo Whisper")
-        
-        return whisper_model
+async def store_cached_result(cache_key: str, response: dict):
+    """Grava o resultado no cache em memória (LRU) e em disco"""
+    entry = response.copy()
+    entry["cached"] = True
+    transcription_cache.put(cache_key, entry)
+    if result_store is not None:
+        await result_store.run(result_store.put, cache_key, entry)
+
+def project_result(entry: dict, fields) -> dict:
+    """Resposta com os segmentos expandidos só nos campos pedidos (sem a chave se nenhum)"""
+    response = {k: v for k, v in entry.items() if k != "segments"}
+    if fields:
+        response["segments"] = expand_segments(entry.get("segments", []), fields)
+    return response
 
-def get_file_hash(content: bytes) -> str:
-    """Gera hash do arquivo para cache"""
-    return hashlib.md5(content).hexdigest()
+# Uploads idênticos simultâneos aguardam o primeiro processamento
+inflight = SingleFlight()
 
-def choose_optimal_model(file_size: int) -> str:
-    """Escolhe modelo baseado no tamanho e recursos disponíveis"""
-    resources = get_system_resources()
-    
-    # Se memória baixa, usar tiny sempre
-    if resources["memory_available_mb"] < 2000:
-        return "tiny"
-    
-    # Se arquivo pequeno, usar tiny
-    if file_size < 5 * 1024 * 1024:  # < 5MB
-        return "tiny"
-    
-    # Se CPU baixo, usar tiny
-    if resources["cpu_percent"] > 80:
-        return "tiny"
-    
-    # Caso contrário, usar base
-    return "base"
+# Vagas de processamento e fila limitada; recursos amostrados em segundo plano
+admission = AdmissionController(
+    max_concurrent=MAX_CONCURRENT_REQUESTS,
+    max_queue=ADMISSION_QUEUE_SIZE,
+    sampler=get_system_resources
+)
 
-async def convert_video_to_audio(video_path: str) -> str:
-    """Converte vídeo para áudio usando ffmpeg otimizado"""
-    audio_path = video_path.rsplit('.', 1)[0] + '_audio.wav'
-    
-    # Comando otimizado para VPS
-    cmd = [
-        'ffmpeg', '-i', video_path,
-        '-vn',  # Sem vídeo
-        '-acodec', 'pcm_s16le',
-        '-ar', '16000',  # Sample rate otimizado
-        '-ac', '1',  # Mono
-        '-threads', '1',  # Limitar threads
-        '-y',
-        audio_path
-    ]
-    
+# Degradação sob pressão de memória (RSS / limite do container), em vez de OOM:
+# 1 reduz o cache, 2 descarrega modelos ociosos, 3 só o modelo mais leve,
+# 4 OCR em resolução menor. Volta de nível quando a pressão cai.
+MEMORY_TIER_THRESHOLDS = parse_thresholds(os.getenv("MEMORY_TIER_THRESHOLDS", ""))
+MODEL_IDLE_SECONDS = float(os.getenv("MODEL_IDLE_SECONDS", "60"))
+OCR_MAX_SIDE = 2000
+OCR_REDUCED_MAX_SIDE = 1000
+
+def apply_memory_tier(previous: int, tier: int):
+    """Aplica os efeitos do nível de degradação (os níveis 3 e 4 são lidos na hora do uso)"""
+    cache_budget = CACHE_MEMORY_MB * 1024 * 1024
+    transcription_cache.resize(cache_budget // 4 if tier >= 1 else cache_budget)
+    if tier >= 2 and previous < 2:
+        unloaded = model_registry.evict_idle(MODEL_IDLE_SECONDS)
+        if unloaded:
+            logger.warning(f"Modelos ociosos descarregados: {', '.join(unloaded)}")
+    gc.collect()
+
+memory_watchdog = MemoryWatchdog(apply_memory_tier, thresholds=MEMORY_TIER_THRESHOLDS)
+
+def load_whisper_model(model_name: str = "tiny"):
+    """Obtém o modelo pedido do registro (carrega sob demanda)"""
     try:
-        result = subprocess.run(cmd, capture_output=True, text=True, check=True, timeout=300)
-        return audio_path
-    except subprocess.TimeoutExpired:
-        logger.error("Timeout na conversão de vídeo")
-        raise HTTPException(status_code=408, detail="Timeout na conversão")
-    except subprocess.CalledProcessError as e:
-        logger.error(f"Erro na conversão: {e.stderr}")
-        raise HTTPException(status_code=500, detail="Erro na conversão do vídeo")
-
-def preprocess_audio(audio_path: str) -> str:
-    """Otimiza áudio para transcrição"""
-    output_path = audio_path.rsplit('.', 1)[0] + '_processed.wav'
-    
-    cmd = [
-        'ffmpeg', '-i', audio_path,
-        '-ar', '16000',
-        '-ac', '1',
-        '-filter:a', 'volume=1.5,highpass=f=200,lowpass=f=3000',
-        '-threads', '1',
-        '-y',
-        output_path
-    ]
+        return model_registry.get(model_name)
+    except Exception as e:
+        logger.error(f"Erro ao carregar modelo: {e}")
+        raise HTTPException(status_code=500, detail="Erro ao carregar modelo Whisper")
+
+def choose_optimal_model(duration: float) -> str:
+    """Escolhe modelo pela duração, RTF medido, fila e memória disponível"""
+    # Se memória baixa (ou sob pressão no watchdog), usar o modelo mais leve sempre
+    if memory_watchdog.tier >= 3 or psutil.virtual_memory().available // (1024 * 1024) < 2000:
+        return model_router.choose(duration, candidates=ROUTER_MODELS[:1])
     
-    try:
-        subprocess.run(cmd, capture_output=True, check=True, timeout=120)
-        return output_path
-    except (subprocess.CalledProcessError, subprocess.TimeoutExpired):
-        logger.warning("Falha no pré-processamento, usando arquivo original")
-        return audio_path
+    return model_router.choose(duration)
 
 def extract_text_from_image_simple(image_path: str) -> dict:
     """OCR simples usando apenas Tesseract (se disponível)"""
@@ -198,9 +200,10 @@ def extract_text_from_image_simple(image_path: str) -> dict:
     
     try:
         image = Image.open(image_path)
-        # Redimensionar se muito grande
-        if image.size[0] > 2000 or image.size[1] > 2000:
-            image.thumbnail((2000, 2000), Image.Resampling.LANCZOS)
+        # Redimensionar se muito grande (menor ainda sob pressão de memória)
+        max_side = OCR_REDUCED_MAX_SIDE if memory_watchdog.tier >= 4 else OCR_MAX_SIDE
+        if image.size[0] > max_side or image.size[1] > max_side:
+            image.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
         
         text = pytesseract.image_to_string(image, lang='por+eng')
         
@@ -220,17 +223,37 @@ def extract_text_from_image_simple(image_path: str) -> dict:
 # Middleware para limitar concorrência
 @app.middleware("http")
 async def limit_concurrency(request, call_next):
-    # Verificar recursos do sistema
-    resources = get_system_resources()
+    # Rejeitar uploads grandes pelo Content-Length antes de receber o corpo
+    if is_oversized_request(request.headers.get("content-length"), MAX_FILE_SIZE):
+        return JSONResponse(
+            status_code=413,
+            content={"detail": f"Arquivo muito grande. Máximo: {MAX_FILE_SIZE // (1024*1024)}MB"}
+        )
     
-    if resources["cpu_percent"] > 90 or resources["memory_percent"] > 90:
+    # Consultas (GET) não ocupam vaga; processamentos (POST) aguardam na fila
+    if request.method != "POST":
+        return await call_next(request)
+    
+    try:
+        async with admission.slot():
+            return await call_next(request)
+    except AdmissionRejected as e:
+        detail = "Fila cheia" if e.reason == "queue_full" else "Memória do servidor esgotada"
         return JSONResponse(
             status_code=503,
-            content={"error": "Servidor sobrecarregado. Tente novamente em alguns segundos."}
+            content={"error": f"{detail}. Tente novamente em {e.retry_after} segundos."},
+            headers={"Retry-After": str(e.retry_after)}
         )
-    
-    response = await call_next(request)
-    return response
+
+@app.on_event("startup")
+async def start_background_tasks():
+    await admission.start()
+    await memory_watchdog.start()
+
+@app.on_event("shutdown")
+async def stop_background_tasks():
+    await admission.stop()
+    await memory_watchdog.stop()
 
 @app.get("/")
 async def root():
@@ -238,89 +261,52 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    resources = get_system_resources()
+    resources = admission.resources
     
     return {
-        "status": "healthy" if resources["cpu_percent"] < 90 and resources["memory_percent"] < 90 else "overloaded",
+        "status": "overloaded" if admission.overloaded else "healthy",
         "resources": resources,
         "cache_size": len(transcription_cache),
         "max_file_size_mb": MAX_FILE_SIZE // (1024 * 1024),
         "ocr_available": OCR_AVAILABLE,
-        "max_concurrent_requests": MAX_CONCURRENT_REQUESTS
+        "models_loaded": model_registry.loaded(),
+        "cpu_scheduler": cpu_scheduler.stats(),
+        "max_concurrent_requests": MAX_CONCURRENT_REQUESTS,
+        "admission": {k: v for k, v in admission.stats().items() if k != "resources"},
+        "memory": memory_watchdog.stats()
     }
 
-@app.post("/transcribe")
-async def transcribe_audio(
-    file: UploadFile = File(...),
-    language: Optional[str] = "pt",
-    use_cache: bool = True
-):
-    """
-    Transcreve arquivo de áudio/vídeo - Versão Otimizada
-    """
-    
-    # Verificar tamanho do arquivo
-    content = await file.read()
-    if len(content) > MAX_FILE_SIZE:
-        raise HTTPException(
-            status_code=413,
-            detail=f"Arquivo muito grande. Máximo: {MAX_FILE_SIZE // (1024*1024)}MB"
-        )
-    
-    # Verificar cache
-    file_hash = get_file_hash(content)
-    cache_key = f"{file_hash}_{language}"
-    
-    if use_cache and cache_key in transcription_cache:
-        cache_access_times[cache_key] = time.time()
-        logger.info(f"Resultado encontrado no cache para {file.filename}")
-        return transcription_cache[cache_key]
-    
-    # Verificar tipo de arquivo
-    allowed_types = {
-        'audio/mpeg', 'audio/wav', 'audio/mp4', 'audio/m4a', 
-        'audio/ogg', 'audio/webm', 'audio/flac',
-        'video/mp4', 'video/avi', 'video/mov', 'video/mkv'
-    }
-    
-    if file.content_type not in allowed_types:
-        ext = file.filename.split('.')[-1].lower() if file.filename else ""
-        if ext not in ['mp3', 'wav', 'm4a', 'ogg', 'webm', 'flac', 'mp4', 'avi', 'mov', 'mkv']:
-            raise HTTPException(
-                status_code=400, 
-                detail=f"Tipo de arquivo não suportado: {file.content_type}"
-            )
-    
-    temp_files = []
+async def process_audio_file(
+    temp_file_path: str,
+    filename: Optional[str],
+    file_size: int,
+    language: Optional[str],
+    precision: str,
+    segment_fields,
+    cache_key: Optional[str] = None
+) -> dict:
+    """Transcreve um arquivo já salvo em disco; o arquivo é removido ao final"""
+    temp_files = [temp_file_path]
     try:
-        # Criar arquivo temporário
-        suffix = f".{file.filename.split('.')[-1]}" if file.filename else ".tmp"
-        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as temp_file:
-            temp_file.write(content)
-            temp_file_path = temp_file.name
-            temp_files.append(temp_file_path)
-        
-        logger.info(f"Processando: {file.filename} ({len(content)} bytes)")
-        
-        # Processar vídeo se necessário
-        is_video = any(ext in file.content_type for ext in ['video/', '.mp4', '.avi', '.mov', '.mkv'])
-        if is_video:
-            logger.info("Convertendo vídeo para áudio...")
-            audio_path = await convert_video_to_audio(temp_file_path)
-            temp_files.append(audio_path)
-            temp_file_path = audio_path
+        logger.info(f"Processando: {filename} ({file_size} bytes)")
         
-        # Otimizar áudio
-        processed_path = preprocess_audio(temp_file_path)
-        if processed_path != temp_file_path:
-            temp_files.append(processed_path)
-            temp_file_path = processed_path
+        # Decodificar áudio/vídeo com filtros de voz direto para PCM 16 kHz
+        # (um único ffmpeg assíncrono, sem WAVs intermediários)
+        try:
+            audio = await decode_audio(temp_file_path, AUDIO_FILTER, threads=1, timeout=300)
+        except AudioDecodeTimeout:
+            logger.error("Timeout na conversão de áudio")
+            raise HTTPException(status_code=408, detail="Timeout na conversão")
+        except AudioDecodeError as e:
+            logger.error(f"Erro na conversão: {e}")
+            raise HTTPException(status_code=500, detail="Erro na conversão do áudio/vídeo")
         
-        # Escolher modelo otimizado
-        model_name = choose_optimal_model(len(content))
-        model = load_whisper_model(model_name)
+        # Escolher modelo otimizado pela duração real do áudio decodificado
+        duration = len(audio) / SAMPLE_RATE
+        model_name = choose_optimal_model(duration)
         
-        logger.info(f"Usando modelo: {model_name}")
+        variant = model_key(model_name, precision)
+        logger.info(f"Usando modelo: {model_name} ({precision}, {duration:.1f}s de áudio)")
         
         # Transcrever com configurações otimizadas
         transcribe_options = {
@@ -334,35 +320,41 @@ async def transcribe_audio(
         if language and language != "auto":
             transcribe_options["language"] = language
         
-        # Processar em thread separada para não bloquear
+        def run_transcription():
+            model = load_whisper_model(variant)
+            with cpu_scheduler.job("inference"):
+                return transcribe_with_model(model, audio, **transcribe_options)
+        
+        # Processar em thread separada para não bloquear (inclusive o carregamento do modelo)
         loop = asyncio.get_event_loop()
-        result = await loop.run_in_executor(
-            executor, 
-            lambda: model.transcribe(temp_file_path, **transcribe_options)
-        )
+        with model_router.track():
+            result = await loop.run_in_executor(executor, run_transcription)
+        # O RTF do roteamento é o da precisão padrão do deploy (só o tempo da inferência)
+        model_router.record_result(model_name if precision == INFERENCE_PRECISION else variant, duration, result)
         
-        # Preparar resposta
+        # Preparar resposta (segmentos em arrays paralelos, só com os campos pedidos)
+        segments = compact_segments(result.get("segments", []), segment_fields)
         response = {
             "text": result["text"].strip(),
             "language": result["language"],
-            "segments": result["segments"],
-            "filename": file.filename,
+            "segments": segments,
+            "filename": filename,
             "model_used": model_name,
-            "duration": result.get("segments", [])[-1]["end"] if result.get("segments") else 0,
+            "precision": precision,
+            "duration": segments_end(segments),
             "cached": False,
-            "resources_used": get_system_resources()
+            "resources_used": admission.resources
         }
         
         # Salvar no cache com limpeza automática
-        if use_cache:
-            cleanup_cache()  # Limpar antes de adicionar
-            transcription_cache[cache_key] = response.copy()
-            transcription_cache[cache_key]["cached"] = True
-            cache_access_times[cache_key] = time.time()
+        if cache_key:
+            await store_cached_result(cache_key, response)
         
         logger.info("Transcrição concluída com sucesso")
-        return response
+        return project_result(response, segment_fields)
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Erro na transcrição: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Erro na transcrição: {str(e)}")
@@ -376,57 +368,106 @@ async def transcribe_audio(
             except Exception as e:
                 logger.warning(f"Erro ao limpar arquivo {temp_path}: {e}")
 
-@app.post("/transcribe-simple")
-async def transcribe_simple(file: UploadFile = File(...)):
-    """
-    Versão simples - retorna apenas o texto
-    """
-    result = await transcribe_audio(file=file, language="pt", use_cache=True)
-    return {"text": result["text"]}
-
-@app.post("/ocr/image")
-async def ocr_image(file: UploadFile = File(...)):
+@app.post("/transcribe")
+async def transcribe_audio(
+    file: UploadFile = File(...),
+    language: Optional[str] = "pt",
+    use_cache: bool = True,
+    precision: Optional[str] = None,
+    detail: Optional[str] = "basic",
+    fields: Optional[str] = None
+):
     """
-    OCR de imagem - Versão Otimizada
+    Transcreve arquivo de áudio/vídeo - Versão Otimizada
+    
+    - **precision**: fp32 ou int8 (padrão: INFERENCE_PRECISION)
+    - **detail**: Campos dos segmentos: none, basic (id, start, end, text) ou full
+    - **fields**: Lista de campos dos segmentos separados por vírgula (tem precedência sobre detail)
     """
-    content = await file.read()
-    if len(content) > MAX_FILE_SIZE:
+    precision = precision or INFERENCE_PRECISION
+    if precision not in PRECISIONS:
         raise HTTPException(
-            status_code=413,
-            detail=f"Arquivo muito grande. Máximo: {MAX_FILE_SIZE // (1024*1024)}MB"
+            status_code=400,
+            detail=f"Precisão inválida: {precision}. Use: {', '.join(PRECISIONS)}"
         )
+    try:
+        segment_fields = resolve_fields(detail, fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    # Verificar tipo de arquivo
+    allowed_types = {
+        'audio/mpeg', 'audio/wav', 'audio/mp4', 'audio/m4a', 
+        'audio/ogg', 'audio/webm', 'audio/flac',
+        'video/mp4', 'video/avi', 'video/mov', 'video/mkv'
+    }
+    
+    if file.content_type not in allowed_types:
+        ext = file.filename.split('.')[-1].lower() if file.filename else ""
+        if ext not in ['mp3', 'wav', 'm4a', 'ogg', 'webm', 'flac', 'mp4', 'avi', 'mov', 'mkv']:
+            raise HTTPException(
+                status_code=400, 
+                detail=f"Tipo de arquivo não suportado: {file.content_type}"
+            )
+    
+    # Gravar em disco em blocos calculando o hash (rejeita acima do tamanho máximo)
+    upload = await spool_upload(file, MAX_FILE_SIZE, CHUNK_SIZE, upload_suffix(file.filename))
     
     # Verificar cache
-    file_hash = get_file_hash(content)
-    cache_key = f"ocr_{file_hash}"
+    cache_key = f"{upload.file_hash}_{language}"
+    if precision != "fp32":
+        cache_key += f"_{precision}"
     
-    if cache_key in transcription_cache:
-        cache_access_times[cache_key] = time.time()
-        return transcription_cache[cache_key]
+    # Entradas guardadas sem algum campo pedido contam como miss (retranscreve e substitui)
+    cached = await get_cached_result(cache_key) if use_cache else None
+    if cached is not None and covers(cached.get("segments", []), segment_fields):
+        logger.info(f"Resultado encontrado no cache para {file.filename}")
+        upload.cleanup()
+        return project_result(cached, segment_fields)
     
-    temp_files = []
+    return await inflight.run(
+        f"{cache_key}|{','.join(segment_fields)}",
+        functools.partial(
+            process_audio_file,
+            upload.path,
+            filename=file.filename,
+            file_size=upload.size,
+            language=language,
+            precision=precision,
+            segment_fields=segment_fields,
+            cache_key=cache_key if use_cache else None
+        ),
+        on_join=upload.cleanup
+    )
+
+@app.post("/transcribe-simple")
+async def transcribe_simple(file: UploadFile = File(...)):
+    """
+    Versão simples - retorna apenas o texto
+    """
+    result = await transcribe_audio(file=file, language="pt", use_cache=True, detail="none")
+    return {"text": result["text"]}
+
+async def process_image_file(temp_file_path: str, filename: Optional[str], file_size: int, cache_key: str) -> dict:
+    """OCR de uma imagem já salva em disco; o arquivo é removido ao final"""
+    temp_files = [temp_file_path]
     try:
-        suffix = f".{file.filename.split('.')[-1]}" if file.filename else ".jpg"
-        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as temp_file:
-            temp_file.write(content)
-            temp_file_path = temp_file.name
-            temp_files.append(temp_file_path)
+        # Processar OCR fora do event loop, com sua fatia de cores
+        def run_ocr():
+            with cpu_scheduler.job("ocr"):
+                return extract_text_from_image_simple(temp_file_path)
         
-        # Processar OCR
-        result = extract_text_from_image_simple(temp_file_path)
+        result = await asyncio.get_event_loop().run_in_executor(executor, run_ocr)
         
         response = {
             **result,
-            "filename": file.filename,
-            "file_size": len(content),
+            "filename": filename,
+            "file_size": file_size,
             "cached": False
         }
         
         # Salvar no cache
-        cleanup_cache()
-        transcription_cache[cache_key] = response.copy()
-        transcription_cache[cache_key]["cached"] = True
-        cache_access_times[cache_key] = time.time()
+        await store_cached_result(cache_key, response)
         
         return response
         
@@ -442,13 +483,36 @@ async def ocr_image(file: UploadFile = File(...)):
             except Exception as e:
                 logger.warning(f"Erro ao limpar arquivo {temp_path}: {e}")
 
+@app.post("/ocr/image")
+async def ocr_image(file: UploadFile = File(...)):
+    """
+    OCR de imagem - Versão Otimizada
+    """
+    upload = await spool_upload(file, MAX_FILE_SIZE, CHUNK_SIZE, upload_suffix(file.filename, ".jpg"))
+    
+    # Verificar cache
+    cache_key = f"ocr_{upload.file_hash}"
+    
+    cached = await get_cached_result(cache_key)
+    if cached is not None:
+        upload.cleanup()
+        return cached
+    
+    return await inflight.run(cache_key, functools.partial(
+        process_image_file, upload.path, file.filename, upload.size, cache_key
+    ), on_join=upload.cleanup)
+
+@app.get("/models")
+async def models_status():
+    """Modelos carregados, memória ocupada, despejos e RTF medido por modelo"""
+    return {**model_registry.stats(), "routing": model_router.stats()}
+
 @app.get("/cache/clear")
 async def clear_cache():
     """Limpa o cache de transcrições"""
-    global transcription_cache, cache_access_times
-    cache_size = len(transcription_cache)
-    transcription_cache.clear()
-    cache_access_times.clear()
+    cache_size = transcription_cache.clear()
+    if result_store is not None:
+        cache_size += await result_store.run(result_store.clear)
     gc.collect()
     return {"message": f"Cache limpo. {cache_size} itens removidos."}
 
@@ -459,7 +523,9 @@ async def cache_stats():
         "cache_size": len(transcription_cache),
         "max_cache_size": MAX_CACHE_SIZE,
         "resources": get_system_resources(),
-        "memory_usage_mb": sum(len(str(v)) for v in transcription_cache.values()) / (1024 * 1024)
+        **transcription_cache.stats(),
+        "disk": await result_store.run(result_store.stats) if result_store else None,
+        "in_flight": inflight.stats()
     }
 
 if __name__ == "__main__":
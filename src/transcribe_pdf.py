@@ -6,6 +6,8 @@ import logging
 from PIL import Image
 import pytesseract
 
+from metrics import metrics_response, observe_stage
+
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -16,6 +18,11 @@ app = FastAPI()
 def health(): 
     return {"ok": True}
 
+@app.get("/metrics")
+def metrics():
+    """Métricas no formato Prometheus (latência por etapa)"""
+    return metrics_response()
+
 @app.get("/test")
 def test():
     """Endpoint de teste para verificar funcionamento"""
@@ -317,7 +324,8 @@ async def extract(file: UploadFile = File(...)):
         logger.info(f"Iniciando processamento do arquivo: {file.filename}")
         
         # Ler dados do arquivo
-        data = await file.read()
+        with observe_stage("upload_read"):
+            data = await file.read()
         logger.info(f"Arquivo lido com sucesso. Tamanho: {len(data)} bytes")
         
         if len(data) == 0:
@@ -335,8 +343,9 @@ async def extract(file: UploadFile = File(...)):
             # Processar como imagem usando OCR
             logger.info("Processando como imagem com OCR...")
             try:
-                image = Image.open(io.BytesIO(data))
-                text = pytesseract.image_to_string(image, lang='por')
+                with observe_stage("ocr_page"):
+                    image = Image.open(io.BytesIO(data))
+                    text = pytesseract.image_to_string(image, lang='por')
                 text = clean_text(text)
                 
                 if not text.strip():
@@ -347,9 +356,10 @@ async def extract(file: UploadFile = File(...)):
                     }
                 
                 # Processar o texto extraído
-                processed_text = remove_ocr_artifacts(text)
-                processed_text = normalize_text(processed_text)
-                markdown_text = structure_as_markdown(processed_text)
+                with observe_stage("markdown"):
+                    processed_text = remove_ocr_artifacts(text)
+                    processed_text = normalize_text(processed_text)
+                    markdown_text = structure_as_markdown(processed_text)
                 
                 return {
                     "text": markdown_text,
@@ -394,7 +404,8 @@ async def extract(file: UploadFile = File(...)):
                 logger.info(f"Processando página {page_num}")
                 
                 # Extrair texto direto do PDF
-                page_text = page.extract_text() or ""
+                with observe_stage("pdf_extraction"):
+                    page_text = page.extract_text() or ""
                 page_text = clean_text(page_text)
                 
                 if page_text.strip():
@@ -419,19 +430,20 @@ async def extract(file: UploadFile = File(...)):
         logger.info(f"Texto combinado: {len(raw_text)} caracteres")
         
         # Processar o texto final
-        processed_text = raw_text
-        
-        # 1. Remover lixo de OCR e layout
-        processed_text = remove_ocr_artifacts(processed_text)
-        
-        # 2. Normalizar texto
-        processed_text = normalize_text(processed_text)
-        
-        # 3. Estruturar em Markdown
-        markdown_text = structure_as_markdown(processed_text)
-        
-        # 4. Criar tabela de serviços (se aplicável)
-        service_table = create_service_table(markdown_text)
+        with observe_stage("markdown"):
+            processed_text = raw_text
+            
+            # 1. Remover lixo de OCR e layout
+            processed_text = remove_ocr_artifacts(processed_text)
+            
+            # 2. Normalizar texto
+            processed_text = normalize_text(processed_text)
+            
+            # 3. Estruturar em Markdown
+            markdown_text = structure_as_markdown(processed_text)
+            
+            # 4. Criar tabela de serviços (se aplicável)
+            service_table = create_service_table(markdown_text)
         
         # 5. Combinar markdown com tabela
         final_markdown = markdown_text
@@ -460,7 +472,8 @@ async def extract(file: UploadFile = File(...)):
 async def extract_structured(file: UploadFile = File(...)):
     """Endpoint que retorna texto estruturado em JSON"""
     try:
-        data = await file.read()
+        with observe_stage("upload_read"):
+            data = await file.read()
         reader = PdfReader(io.BytesIO(data))
         
         all_text = []
@@ -469,7 +482,8 @@ async def extract_structured(file: UploadFile = File(...)):
             logger.info(f"Processando página {page_num}")
             
             # Extrair texto direto do PDF
-            page_text = page.extract_text() or ""
+            with observe_stage("pdf_extraction"):
+                page_text = page.extract_text() or ""
             page_text = clean_text(page_text)
             
             if page_text.strip():
@@ -9,6 +9,8 @@ import pandas as pd
 import requests
 from datetime import datetime
 
+from metrics import metrics_response, observe_stage, timed_stage
+
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -19,6 +21,11 @@ app = FastAPI()
 def health():
     return {"ok": True, "service": "spreadsheet-processor"}
 
+@app.get("/metrics")
+def metrics():
+    """Métricas no formato Prometheus (latência por etapa)"""
+    return metrics_response()
+
 @app.get("/test")
 def test():
     """Endpoint de teste para verificar funcionamento"""
@@ -33,7 +40,8 @@ def test():
 async def debug_file(file: UploadFile = File(...)):
     """Endpoint para debug de arquivos - mostra informações detalhadas"""
     try:
-        data = await file.read()
+        with observe_stage("upload_read"):
+            data = await file.read()
         
         # Informações básicas
         info = {
@@ -116,6 +124,7 @@ def detect_file_type(filename: str, content_type: str = None, data: bytes = None
     else:
         return "UNKNOWN"
 
+@timed_stage("spreadsheet_parse")
 def process_csv(data: bytes) -> Dict[str, Any]:
     """Processa arquivo CSV"""
     try:
@@ -216,6 +225,7 @@ def _generate_markdown_from_sheet(sheet_name: str, headers: List[str], rows: Lis
     return "\n".join(lines)
 
 
+@timed_stage("spreadsheet_parse")
 def process_excel(data: bytes) -> Dict[str, Any]:
     """Processa arquivo Excel (xlsx/xls) com múltiplas abas, limpa vazios e gera markdown por aba."""
     try:
@@ -282,6 +292,7 @@ def process_excel(data: bytes) -> Dict[str, Any]:
     workbook.close()
     return all_sheets_data
 
+@timed_stage("serialization")
 def format_for_rag(sheets_data: Dict[str, Any], include_metadata: bool = True) -> str:
     """
     Formata os dados da planilha em texto estruturado para RAG.
@@ -312,6 +323,7 @@ def format_for_rag(sheets_data: Dict[str, Any], include_metadata: bool = True) -
     
     return ''.join(rag_text)
 
+@timed_stage("serialization")
 def format_for_rag_compact(sheets_data: Dict[str, Any]) -> str:
     """
     Formata os dados de forma mais compacta, ideal para RAG com muitos dados.
@@ -342,6 +354,7 @@ def format_for_rag_compact(sheets_data: Dict[str, Any]) -> str:
     
     return ''.join(rag_text)
 
+@timed_stage("serialization")
 def format_as_json(sheets_data: Dict[str, Any]) -> Dict[str, Any]:
     """
     Formata os dados como JSON estruturado para envio direto ao n8n.
@@ -372,7 +385,8 @@ async def extract_spreadsheet(
         logger.info(f"Iniciando processamento da planilha: {file.filename}")
         
         # Ler dados do arquivo
-        data = await file.read()
+        with observe_stage("upload_read"):
+            data = await file.read()
         logger.info(f"Arquivo lido com sucesso. Tamanho: {len(data)} bytes")
         
         if len(data) == 0:
@@ -450,7 +464,8 @@ async def extract_for_n8n(file: UploadFile = File(...)):
         logger.info(f"Processando planilha para n8n: {file.filename}")
         
         # Ler dados do arquivo
-        data = await file.read()
+        with observe_stage("upload_read"):
+            data = await file.read()
         logger.info(f"Arquivo lido: {len(data)} bytes")
         
         if len(data) == 0:
@@ -539,7 +554,8 @@ async def extract_and_send_to_n8n(
         logger.info(f"Processando e enviando para n8n: {file.filename}")
         
         # Usar o endpoint otimizado
-        data = await file.read()
+        with observe_stage("upload_read"):
+            data = await file.read()
         file_type = detect_file_type(
             file.filename, 
             file.content_type, 
@@ -588,12 +604,13 @@ async def extract_and_send_to_n8n(
         
         # Enviar para n8n
         logger.info(f"Enviando para n8n: {n8n_webhook_url}")
-        response = requests.post(
-            n8n_webhook_url,
-            json=payload,
-            headers={"Content-Type": "application/json"},
-            timeout=60
-        )
+        with observe_stage("webhook"):
+            response = requests.post(
+                n8n_webhook_url,
+                json=payload,
+                headers={"Content-Type": "application/json"},
+                timeout=60
+            )
         
         response.raise_for_status()
         
@@ -625,7 +642,8 @@ async def analyze_spreadsheet(file: UploadFile = File(...)):
     Útil para preview e validação.
     """
     try:
-        data = await file.read()
+        with observe_stage("upload_read"):
+            data = await file.read()
         file_type = detect_file_type(
             file.filename, 
             file.content_type, 
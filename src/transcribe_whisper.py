@@ -1,32 +1,41 @@
 from fastapi import FastAPI, UploadFile, File, HTTPException, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-import whisper
-import tempfile
+from fastapi.responses import JSONResponse, StreamingResponse
 import os
 import uvicorn
-from typing import Optional, List
+from typing import Optional
 import logging
 import asyncio
-import aiofiles
 from pathlib import Path
-import subprocess
 import shutil
-from datetime import datetime
-import hashlib
 import json
+import functools
+import socket
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from job_queue import JobManager, post_callback
+from job_broker import NODE_ROLES, BrokerWorker, JobBroker
+from batching import MicroBatcher, fits_single_window, transcribe_batch
+from uploads import SpooledUpload, spool_upload, upload_suffix, is_oversized_request
+from audio_decode import decode_audio, AudioDecodeError, WHATSAPP_VOICE_FILTER, SAMPLE_RATE
+from long_media import LongMediaTranscriber, split_on_silence, stitch_results
+from worker_pool import ForkedWorkerPool, transcribe_with_model
+from model_registry import ModelRegistry
+from result_store import DiskResultStore
+from result_cache import ResultCache
+from singleflight import SingleFlight
+from fair_scheduler import LANES, FairScheduler, parse_weights
+from warmup import Warmup
+from capabilities import CapabilityLoader, parse_capabilities
+from model_router import ModelRouter, probe_duration
+from quantization import PRECISIONS, load_model_variant, model_key
+from cpu_scheduler import CpuScheduler
+from segments import BASIC_FIELDS, compact_segments, covers, expand_segments, resolve_fields, segments_end
+from metrics import (
+    metrics_response, observe_stage, record_cache, record_stage, timed_loader, track_queue
+)
 
-# OCR e processamento de documentos
-import pytesseract
-import easyocr
-from PIL import Image
-from pdf2image import convert_from_path
-import fitz  # PyMuPDF
-import pdfplumber
-from docx import Document
-import openpyxl
-from pptx import Presentation
-import io
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
@@ -54,380 +63,513 @@ CACHE_DIR.mkdir(exist_ok=True)
 MAX_FILE_SIZE = 100 * 1024 * 1024  # 100MB
 CHUNK_SIZE = 1024 * 1024  # 1MB chunks para upload
 
-# Cache de resultados
-transcription_cache = {}
+# Capacidades desta instância (audio, ocr, pdf, documents); cada uma importa
+# suas dependências pesadas só no primeiro uso ou no aquecimento
+ENABLED_CAPABILITIES = parse_capabilities(os.getenv("ENABLED_CAPABILITIES", ""))
+capabilities = CapabilityLoader(ENABLED_CAPABILITIES)
 
-# Carregar modelos Whisper otimizados
-logger.info("Carregando modelos Whisper...")
-models = {
-    "tiny": whisper.load_model("tiny"),    # Para áudios curtos do WhatsApp
-    "base": whisper.load_model("base"),    # Para uso geral
-    "small": whisper.load_model("small")   # Para vídeos maiores
-}
-logger.info("Modelos Whisper carregados com sucesso!")
-
-# Inicializar OCRs
-logger.info("Inicializando OCRs...")
-try:
-    # EasyOCR - melhor para textos complexos
-    easyocr_reader = easyocr.Reader(['pt', 'en'], gpu=False)
-    logger.info("EasyOCR inicializado com sucesso!")
-except Exception as e:
-    logger.warning(f"Falha ao inicializar EasyOCR: {e}")
-    easyocr_reader = None
-
-# Configurar Tesseract (se disponível)
-try:
-    # Tentar detectar Tesseract
-    pytesseract.pytesseract.tesseract_cmd = 'tesseract'  # Linux/Docker
-    pytesseract.get_tesseract_version()
-    tesseract_available = True
-    logger.info("Tesseract OCR disponível!")
-except:
-    tesseract_available = False
-    logger.warning("Tesseract OCR não encontrado")
-
-def get_file_hash(content: bytes) -> str:
-    """Gera hash do arquivo para cache"""
-    return hashlib.md5(content).hexdigest()
-
-def choose_optimal_model(file_size: int, duration: float = None) -> str:
-    """Escolhe o modelo ideal baseado no tamanho e duração"""
-    if file_size < 1024 * 1024:  # < 1MB (típico do WhatsApp)
-        return "tiny"
-    elif file_size < 10 * 1024 * 1024:  # < 10MB
-        return "base"
-    else:
-        return "small"
-
-async def convert_video_to_audio(video_path: str) -> str:
-    """Converte vídeo para áudio usando ffmpeg"""
-    audio_path = video_path.rsplit('.', 1)[0] + '_audio.wav'
-    
-    cmd = [
-        'ffmpeg', '-i', video_path,
-        '-vn',  # Sem vídeo
-        '-acodec', 'pcm_s16le',  # Codec de áudio
-        '-ar', '16000',  # Sample rate otimizado para Whisper
-        '-ac', '1',  # Mono
-        '-y',  # Sobrescrever
-        audio_path
-    ]
-    
-    try:
-        result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-        return audio_path
-    except subprocess.CalledProcessError as e:
-        logger.error(f"Erro na conversão: {e.stderr}")
-        raise HTTPException(status_code=500, detail="Erro na conversão do vídeo")
-
-def preprocess_whatsapp_audio(audio_path: str) -> str:
-    """Otimiza áudio do WhatsApp para transcrição"""
-    output_path = audio_path.rsplit('.', 1)[0] + '_processed.wav'
-    
-    cmd = [
-        'ffmpeg', '-i', audio_path,
-        '-ar', '16000',  # Sample rate ideal
-        '-ac', '1',      # Mono
-        '-filter:a', 'volume=2.0,highpass=f=200,lowpass=f=3000',  # Filtros para voz
-        '-y',
-        output_path
-    ]
-    
-    try:
-        subprocess.run(cmd, capture_output=True, check=True)
-        return output_path
-    except subprocess.CalledProcessError:
-        logger.warning("Falha no pré-processamento, usando arquivo original")
-        return audio_path
+# Papel do nó: all (recebe e transcreve, padrão), api (recebe e enfileira no
+# broker, sem modelos) ou worker (puxa jobs do broker e transcreve)
+NODE_ROLE = os.getenv("NODE_ROLE", "all")
+if NODE_ROLE not in NODE_ROLES:
+    raise ValueError(f"NODE_ROLE inválido: {NODE_ROLE}. Use: {', '.join(NODE_ROLES)}")
 
-# ========== FUNÇÕES DE OCR E PROCESSAMENTO DE DOCUMENTOS ==========
+# Pool de inferência e fila de jobs
+MAX_WORKERS = int(os.getenv("MAX_WORKERS", "2"))
+JOB_QUEUE_SIZE = int(os.getenv("JOB_QUEUE_SIZE", "100"))
+JOB_RESULT_TTL = int(os.getenv("JOB_RESULT_TTL", "3600"))
 
-def extract_text_from_image(image_path: str, method: str = "easyocr") -> dict:
-    """Extrai texto de imagem usando OCR"""
-    try:
-        if method == "easyocr" and easyocr_reader:
-            # EasyOCR - melhor para textos complexos
-            results = easyocr_reader.readtext(image_path)
-            text = " ".join([result[1] for result in results])
-            confidence = sum([result[2] for result in results]) / len(results) if results else 0
-            
-            return {
-                "text": text.strip(),
-                "method": "EasyOCR",
-                "confidence": confidence,
-                "details": results
-            }
-            
-        elif method == "tesseract" and tesseract_available:
-            # Tesseract OCR
-            image = Image.open(image_path)
-            text = pytesseract.image_to_string(image, lang='por+eng')
-            
-            # Obter dados detalhados
-            data = pytesseract.image_to_data(image, output_type=pytesseract.Output.DICT, lang='por+eng')
-            confidences = [int(conf) for conf in data['conf'] if int(conf) > 0]
-            avg_confidence = sum(confidences) / len(confidences) if confidences else 0
-            
-            return {
-                "text": text.strip(),
-                "method": "Tesseract",
-                "confidence": avg_confidence / 100,
-                "details": data
-            }
-        else:
-            raise Exception("Nenhum OCR disponível")
-            
-    except Exception as e:
-        logger.error(f"Erro no OCR: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Erro no OCR: {str(e)}")
+inference_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS)
 
-def extract_text_from_pdf(pdf_path: str, method: str = "auto") -> dict:
-    """Extrai texto de PDF"""
-    try:
-        text_content = ""
-        pages_processed = 0
-        
-        if method in ["auto", "direct"]:
-            # Tentar extrair texto direto primeiro (PDFs com texto)
-            try:
-                with pdfplumber.open(pdf_path) as pdf:
-                    for page in pdf.pages:
-                        page_text = page.extract_text()
-                        if page_text:
-                            text_content += page_text + "\n"
-                            pages_processed += 1
-                
-                if text_content.strip():
-                    return {
-                        "text": text_content.strip(),
-                        "method": "Direct extraction",
-                        "pages": pages_processed,
-                        "type": "text_pdf"
-                    }
-            except Exception as e:
-                logger.warning(f"Falha na extração direta: {e}")
-        
-        if method in ["auto", "ocr"] and not text_content.strip():
-            # PDF escaneado - usar OCR
-            logger.info("PDF parece ser escaneado, usando OCR...")
-            
-            # Converter PDF para imagens
-            images = convert_from_path(pdf_path, dpi=200)
-            
-            for i, image in enumerate(images):
-                # Salvar imagem temporária
-                with tempfile.NamedTemporaryFile(suffix='.png', delete=False) as temp_img:
-                    image.save(temp_img.name, 'PNG')
-                    
-                    # Extrair texto da imagem
-                    result = extract_text_from_image(temp_img.name)
-                    text_content += result["text"] + "\n"
-                    pages_processed += 1
-                    
-                    # Limpar arquivo temporário
-                    os.unlink(temp_img.name)
-            
-            return {
-                "text": text_content.strip(),
-                "method": "OCR (scanned PDF)",
-                "pages": pages_processed,
-                "type": "scanned_pdf"
-            }
-        
-        if not text_content.strip():
-            raise Exception("Não foi possível extrair texto do PDF")
-            
-    except Exception as e:
-        logger.error(f"Erro ao processar PDF: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Erro ao processar PDF: {str(e)}")
+# Cores divididos entre os jobs de inferência/OCR ativos (threads do torch por job)
+CPU_SCHEDULER_ENABLED = os.getenv("CPU_SCHEDULER_ENABLED", "true").lower() == "true"
+CPU_SCHEDULER_CORES = int(os.getenv("CPU_SCHEDULER_CORES", "0"))  # 0 = todos disponíveis
+CPU_AFFINITY = os.getenv("CPU_AFFINITY", "false").lower() == "true"
 
-def extract_text_from_docx(docx_path: str) -> dict:
-    """Extrai texto de arquivo Word"""
-    try:
-        doc = Document(docx_path)
-        text_content = ""
-        
-        for paragraph in doc.paragraphs:
-            text_content += paragraph.text + "\n"
-        
-        # Extrair texto de tabelas também
-        for table in doc.tables:
-            for row in table.rows:
-                for cell in row.cells:
-                    text_content += cell.text + " "
-                text_content += "\n"
-        
-        return {
-            "text": text_content.strip(),
-            "method": "Direct extraction",
-            "paragraphs": len(doc.paragraphs),
-            "tables": len(doc.tables)
-        }
-        
-    except Exception as e:
-        logger.error(f"Erro ao processar DOCX: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Erro ao processar DOCX: {str(e)}")
+cpu_scheduler = CpuScheduler(CPU_SCHEDULER_CORES, use_affinity=CPU_AFFINITY, enabled=CPU_SCHEDULER_ENABLED)
+job_manager = JobManager(
+    # No nó de API os jobs locais (refinamento) só aguardam o broker
+    max_workers=JOB_QUEUE_SIZE if NODE_ROLE == "api" else MAX_WORKERS,
+    max_queue_size=JOB_QUEUE_SIZE,
+    result_ttl=JOB_RESULT_TTL
+)
 
-def extract_text_from_excel(excel_path: str) -> dict:
-    """Extrai texto de arquivo Excel"""
-    try:
-        workbook = openpyxl.load_workbook(excel_path, data_only=True)
-        text_content = ""
-        sheets_processed = 0
-        
-        for sheet_name in workbook.sheetnames:
-            sheet = workbook[sheet_name]
-            text_content += f"\n=== {sheet_name} ===\n"
-            
-            for row in sheet.iter_rows(values_only=True):
-                row_text = " | ".join([str(cell) if cell is not None else "" for cell in row])
-                if row_text.strip():
-                    text_content += row_text + "\n"
-            
-            sheets_processed += 1
-        
-        return {
-            "text": text_content.strip(),
-            "method": "Direct extraction",
-            "sheets": sheets_processed
-        }
-        
-    except Exception as e:
-        logger.error(f"Erro ao processar Excel: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Erro ao processar Excel: {str(e)}")
+# Broker da implantação dividida: SQLite e uploads enfileirados num volume
+# compartilhado por API e workers
+BROKER_PATH = Path(os.getenv("BROKER_PATH", str(CACHE_DIR / "broker.sqlite3")))
+BROKER_SPOOL_DIR = Path(os.getenv("BROKER_SPOOL_DIR", str(CACHE_DIR / "spool")))
+BROKER_POLL_SECONDS = float(os.getenv("BROKER_POLL_SECONDS", "0.2"))
+BROKER_WAIT_TIMEOUT = float(os.getenv("BROKER_WAIT_TIMEOUT", "900"))
+BROKER_LEASE_SECONDS = float(os.getenv("BROKER_LEASE_SECONDS", "60"))
+BROKER_AFFINITY_SECONDS = float(os.getenv("BROKER_AFFINITY_SECONDS", "1"))
+
+# Worker: vagas (jobs simultâneos), faixas que aceita e identificação no broker
+WORKER_SLOTS = int(os.getenv("WORKER_SLOTS", "0")) or MAX_WORKERS
+# Vazio (ou só espaços) equivale a todas as faixas
+WORKER_LANES = [lane.strip() for lane in os.getenv("WORKER_LANES", "").split(",") if lane.strip()] or list(LANES)
+if set(WORKER_LANES) - set(LANES):
+    raise ValueError(f"WORKER_LANES inválido: {', '.join(WORKER_LANES)}. Use: {', '.join(LANES)}")
+WORKER_ID = os.getenv("WORKER_ID", "") or f"{socket.gethostname()}-{os.getpid()}"
+
+job_broker = JobBroker(
+    BROKER_PATH,
+    max_queued=JOB_QUEUE_SIZE,
+    lease_seconds=BROKER_LEASE_SECONDS,
+    affinity_seconds=BROKER_AFFINITY_SECONDS,
+    result_ttl=JOB_RESULT_TTL
+) if NODE_ROLE != "all" else None
+if NODE_ROLE == "api":
+    BROKER_SPOOL_DIR.mkdir(parents=True, exist_ok=True)
+
+# Precisão padrão da inferência: fp32 ou int8 (Linear quantizadas dinamicamente);
+# pode ser trocada por requisição pelo parâmetro precision
+INFERENCE_PRECISION = os.getenv("INFERENCE_PRECISION", "fp32")
+if INFERENCE_PRECISION not in PRECISIONS:
+    raise ValueError(f"INFERENCE_PRECISION inválida: {INFERENCE_PRECISION}. Use: {', '.join(PRECISIONS)}")
+
+# Micro-batching de clipes curtos entre requisições
+BATCH_ENABLED = os.getenv("BATCH_ENABLED", "true").lower() == "true"
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "8"))
+BATCH_MAX_WAIT_MS = float(os.getenv("BATCH_MAX_WAIT_MS", "10"))
+BATCH_MODELS = set(os.getenv("BATCH_MODELS", "tiny").split(","))
+
+# Mídias longas: VAD + trechos transcritos em paralelo na faixa bulk do
+# escalonador (mesmos workers/threads de inferência, sem pool próprio)
+LONG_MEDIA_MODEL = os.getenv("LONG_MEDIA_MODEL", "small")
+LONG_MEDIA_MIN_SECONDS = float(os.getenv("LONG_MEDIA_MIN_SECONDS", "120"))
+LONG_MEDIA_CHUNK_SECONDS = float(os.getenv("LONG_MEDIA_CHUNK_SECONDS", "60"))
 
-def extract_text_from_pptx(pptx_path: str) -> dict:
-    """Extrai texto de arquivo PowerPoint"""
+long_media_transcriber = LongMediaTranscriber(max_chunk_seconds=LONG_MEDIA_CHUNK_SECONDS)
+
+# Streaming de segmentos (SSE): tamanho máximo de cada trecho decodificado
+STREAM_CHUNK_SECONDS = float(os.getenv("STREAM_CHUNK_SECONDS", "30"))
+
+# Workers de inferência pré-criados (fork) compartilhando os pesos dos modelos.
+# 0 = inferência no próprio processo (pool de threads)
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "0"))
+INFERENCE_WORKER_THREADS = int(os.getenv("INFERENCE_WORKER_THREADS", "0")) or max(
+    1, (os.cpu_count() or 1) // max(INFERENCE_WORKERS, 1)
+)
+
+worker_pool = ForkedWorkerPool(INFERENCE_WORKERS, INFERENCE_WORKER_THREADS) if (
+    INFERENCE_WORKERS > 0 and capabilities.is_enabled("audio") and NODE_ROLE != "api"
+) else None
+
+# Rascunho + refinamento (/transcribe-whatsapp?refine=true): resposta imediata
+# com o modelo rascunho e retranscrição em segundo plano com um modelo melhor
+REFINE_DRAFT_MODEL = os.getenv("REFINE_DRAFT_MODEL", "tiny")
+REFINE_MODEL = os.getenv("REFINE_MODEL", "base")
+
+# Cache de resultados: memória + SQLite persistente em CACHE_DIR
+CACHE_ENABLED = os.getenv("CACHE_ENABLED", "true").lower() == "true"
+CACHE_TTL = int(os.getenv("CACHE_TTL", "3600"))
+CACHE_SIZE_LIMIT = int(os.getenv("CACHE_SIZE_LIMIT", "1000"))
+CACHE_MEMORY_MB = int(os.getenv("CACHE_MEMORY_MB", "128"))
+
+# Camada em memória: LRU limitado pelo tamanho medido das entradas
+transcription_cache = ResultCache(CACHE_MEMORY_MB * 1024 * 1024, max_entries=CACHE_SIZE_LIMIT)
+result_store = DiskResultStore(
+    CACHE_DIR / "results.sqlite3",
+    ttl_seconds=CACHE_TTL,
+    max_entries=CACHE_SIZE_LIMIT
+) if CACHE_ENABLED else None
+
+async def get_cached_result(cache_key: str) -> Optional[dict]:
+    """Busca no cache em memória e, se não houver, no cache em disco"""
+    cached = transcription_cache.get(cache_key)
+    record_cache("memory", cached is not None)
+    if cached is None and result_store is not None:
+        cached = await result_store.run(result_store.get, cache_key)
+        record_cache("disk", cached is not None)
+        if cached is not None:
+            transcription_cache.put(cache_key, cached)
+    return cached
+
+async def store_cached_result(cache_key: str, response: dict):
+    """Grava o resultado nas duas camadas de cache"""
+    entry = response.copy()
+    entry["cached"] = True
+    transcription_cache.put(cache_key, entry)
+    if result_store is not None:
+        await result_store.run(result_store.put, cache_key, entry)
+
+# Uploads idênticos simultâneos (ex.: áudio encaminhado num grupo) aguardam o
+# primeiro processamento em vez de rodar o Whisper/OCR em paralelo
+inflight = SingleFlight()
+
+def project_result(entry: dict, fields) -> dict:
+    """Resposta com os segmentos expandidos só nos campos pedidos (sem a chave se nenhum)"""
+    response = {k: v for k, v in entry.items() if k != "segments"}
+    if fields:
+        response["segments"] = expand_segments(entry.get("segments", []), fields)
+    return response
+
+async def get_cached_transcription(cache_key: str, fields) -> Optional[dict]:
+    """Cache hit só se a entrada guardada tiver todos os campos de segmento pedidos"""
+    cached = await get_cached_result(cache_key)
+    if cached is None or not covers(cached.get("segments", []), fields):
+        return None
+    return project_result(cached, fields)
+
+def resolve_segment_fields(detail: Optional[str], fields: Optional[str]) -> tuple:
+    """Valida detail/fields dos endpoints"""
     try:
-        presentation = Presentation(pptx_path)
-        text_content = ""
-        slides_processed = 0
-        
-        for i, slide in enumerate(presentation.slides):
-            text_content += f"\n=== Slide {i+1} ===\n"
-            
-            for shape in slide.shapes:
-                if hasattr(shape, "text") and shape.text:
-                    text_content += shape.text + "\n"
-            
-            slides_processed += 1
-        
-        return {
-            "text": text_content.strip(),
-            "method": "Direct extraction",
-            "slides": slides_processed
-        }
-        
-    except Exception as e:
-        logger.error(f"Erro ao processar PPTX: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Erro ao processar PPTX: {str(e)}")
+        return resolve_fields(detail, fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+# Modelos Whisper carregados sob demanda, com orçamento de memória (LRU)
+# tiny: áudios curtos do WhatsApp / base: uso geral / small: vídeos maiores
+LOAD_MODELS = [m.strip() for m in os.getenv("LOAD_MODELS", "tiny").split(",") if m.strip()]
+MODEL_MEMORY_BUDGET_MB = int(os.getenv("MODEL_MEMORY_BUDGET_MB", "0"))
+
+def load_scheduled_model(key: str):
+    """Carrega a variante e instala o rebalanceamento de threads por janela"""
+    return cpu_scheduler.attach(load_model_variant(key))
+
+model_registry = ModelRegistry(loader=timed_loader(load_scheduled_model), memory_budget_mb=MODEL_MEMORY_BUDGET_MB)
+
+# Aquecimento em segundo plano, na ordem de LOAD_MODELS: o servidor sobe na hora
+# (/live) e só fica pronto (/ready) quando os modelos estiverem carregados
+WARMUP_CONCURRENCY = int(os.getenv("WARMUP_CONCURRENCY", "2"))
+warmup = Warmup(WARMUP_CONCURRENCY)
+warmup_task: Optional[asyncio.Task] = None
+
+# Entradas com sufixo (ex.: "base:int8") escolhem a variante explicitamente
+WARMUP_MODEL_KEYS = [
+    m if ":" in m else model_key(m, INFERENCE_PRECISION) for m in LOAD_MODELS
+] if capabilities.is_enabled("audio") and NODE_ROLE != "api" else []
+for key in WARMUP_MODEL_KEYS:
+    warmup.add(f"whisper:{key}", functools.partial(model_registry.get, key))
+
+def load_ocr_reader():
+    capabilities.load("ocr").load_easyocr()
+
+# Capacidades sem modelo a aquecer: só o import dos módulos (não obrigatório)
+if capabilities.is_enabled("ocr"):
+    warmup.add("easyocr", load_ocr_reader, required=False)
+for name in ("pdf", "documents"):
+    if capabilities.is_enabled(name):
+        warmup.add(f"import:{name}", functools.partial(capabilities.load, name), required=False)
+
+# Roteamento pela duração: o modelo mais preciso (ordem da lista) cuja latência
+# estimada pelo RTF medido, somada à espera da fila, cabe na meta
+ROUTER_MODELS = [m.strip() for m in os.getenv("ROUTER_MODELS", "tiny,base,small").split(",") if m.strip()]
+ROUTER_LATENCY_TARGET = float(os.getenv("ROUTER_LATENCY_TARGET", "30"))
+
+# Modelos que uma requisição pode forçar (parâmetro model): só os já previstos
+# no deploy, para um cliente não provocar o carregamento de um large-v3
+ALLOWED_MODELS = list(dict.fromkeys(
+    [m.split(":")[0] for m in LOAD_MODELS] + ROUTER_MODELS
+    + [LONG_MEDIA_MODEL, REFINE_DRAFT_MODEL, REFINE_MODEL]
+))
+
+# Modelos de refinamento que a requisição pode pedir: também só os permitidos
+REFINE_MODELS = [m for m in ("base", "small", "medium") if m in ALLOWED_MODELS]
+
+model_router = ModelRouter(
+    ROUTER_MODELS,
+    latency_target=ROUTER_LATENCY_TARGET,
+    parallelism=INFERENCE_WORKERS or MAX_WORKERS
+)
+
+# Faixas de prioridade pela duração (fila justa ponderada): notas de voz curtas
+# não esperam atrás de vídeos longos, que rodam trecho a trecho
+FAIR_SCHEDULER_ENABLED = os.getenv("FAIR_SCHEDULER_ENABLED", "true").lower() == "true"
+LANE_WEIGHTS = parse_weights(os.getenv("LANE_WEIGHTS", ""))
+INTERACTIVE_MAX_SECONDS = float(os.getenv("INTERACTIVE_MAX_SECONDS", "60"))
+BULK_MIN_SECONDS = float(os.getenv("BULK_MIN_SECONDS", "600"))
+
+fair_scheduler = FairScheduler(
+    INFERENCE_WORKERS or MAX_WORKERS, LANE_WEIGHTS
+) if FAIR_SCHEDULER_ENABLED else None
+
+def lane_for(duration: float) -> str:
+    """Faixa de prioridade pela duração do áudio"""
+    if duration <= INTERACTIVE_MAX_SECONDS:
+        return "interactive"
+    if duration >= BULK_MIN_SECONDS:
+        return "bulk"
+    return "standard"
+
+def choose_optimal_model(duration: float) -> str:
+    """Escolhe o modelo pela duração do áudio, RTF medido e fila atual"""
+    return model_router.choose(duration)
+
+@app.middleware("http")
+async def reject_large_uploads(request, call_next):
+    # Rejeita pelo Content-Length antes de o corpo ser recebido
+    if is_oversized_request(request.headers.get("content-length"), MAX_FILE_SIZE):
+        return JSONResponse(
+            status_code=413,
+            content={"detail": f"Arquivo muito grande. Máximo: {MAX_FILE_SIZE // (1024*1024)}MB"}
+        )
+    return await call_next(request)
+
+async def warm_up():
+    """Aquece modelos e OCR; os workers pré-criados só depois (herdam os pesos no fork)"""
+    if worker_pool is not None:
+        import torch
+        # Nenhuma região paralela do OpenMP no processo pai antes do fork dos workers
+        torch.set_num_threads(1)
+    await warmup.run()
+    if worker_pool is not None and not worker_pool.processes:
+        worker_pool.start(model_registry)
+    if broker_worker is not None:
+        # Só puxa jobs do broker com os modelos já aquecidos
+        await broker_worker.start()
+
+def is_ready() -> bool:
+    return warmup.ready and (worker_pool is None or bool(worker_pool.processes))
+
+@app.on_event("startup")
+async def start_job_queue():
+    global warmup_task
+    await job_manager.start()
+    warmup_task = asyncio.create_task(warm_up())
+
+@app.on_event("shutdown")
+async def stop_job_queue():
+    await job_manager.stop()
+    if broker_worker is not None:
+        await broker_worker.stop()
+    inference_executor.shutdown(wait=False)
+    if worker_pool is not None:
+        worker_pool.shutdown()
 
 @app.get("/")
 async def root():
     return {"message": "Universal Transcription API está funcionando!"}
 
+@app.get("/live")
+async def liveness():
+    """Sonda de vida: o processo responde (não depende dos modelos)"""
+    return {"status": "alive"}
+
+@app.get("/ready")
+async def readiness():
+    """Sonda de prontidão: 200 só com os modelos de LOAD_MODELS carregados"""
+    ready = is_ready()
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            "status": "ready" if ready else "warming_up",
+            "models": {key: key in model_registry for key in WARMUP_MODEL_KEYS},
+            "warmup": warmup.stats()["items"],
+            "inference_workers": bool(worker_pool.processes) if worker_pool else None
+        }
+    )
+
 @app.get("/health")
 async def health_check():
-    ocr_status = {
-        "easyocr": easyocr_reader is not None,
-        "tesseract": tesseract_available
-    }
+    ocr_status = capabilities.load("ocr").status() if capabilities.is_loaded("ocr") else None
     
     return {
         "status": "healthy", 
+        "ready": is_ready(),
         "services": {
             "whisper": {
-                "available": True,
-                "models": list(models.keys())
+                "available": capabilities.is_enabled("audio"),
+                "models": model_registry.loaded()
             },
             "ocr": ocr_status,
-            "document_processing": True
+            "document_processing": capabilities.is_enabled("documents")
         },
+        "capabilities": capabilities.stats(),
         "cache_size": len(transcription_cache),
+        "jobs": job_manager.stats(),
+        "node_role": NODE_ROLE,
+        "broker": await job_broker.run(job_broker.stats) if job_broker else None,
+        "broker_worker": broker_worker.stats() if broker_worker else None,
+        "batching": {"enabled": BATCH_ENABLED, **micro_batcher.stats()},
+        "inference_workers": worker_pool.stats() if worker_pool else None,
+        "cpu_scheduler": cpu_scheduler.stats(),
+        "lanes": fair_scheduler.stats() if fair_scheduler else None,
+        "routing": model_router.stats(),
         "max_file_size_mb": MAX_FILE_SIZE // (1024 * 1024)
     }
 
-@app.post("/transcribe")
-async def transcribe_audio(
-    file: UploadFile = File(...),
-    language: Optional[str] = "pt",
-    use_cache: bool = True,
-    whatsapp_optimization: bool = False
-):
-    """
-    Transcreve arquivo de áudio/vídeo para texto com otimizações
-    
-    - **file**: Arquivo de áudio/vídeo
-    - **language**: Código do idioma (pt, en, es, etc.)
-    - **use_cache**: Usar cache de resultados
-    - **whatsapp_optimization**: Aplicar filtros específicos para WhatsApp
-    """
-    
-    # Verificar tamanho do arquivo
-    content = await file.read()
-    if len(content) > MAX_FILE_SIZE:
-        raise HTTPException(
-            status_code=413,
-            detail=f"Arquivo muito grande. Máximo: {MAX_FILE_SIZE // (1024*1024)}MB"
-        )
-    
-    # Verificar cache
-    file_hash = get_file_hash(content)
-    cache_key = f"{file_hash}_{language}_{whatsapp_optimization}"
-    
-    if use_cache and cache_key in transcription_cache:
-        logger.info(f"Resultado encontrado no cache para {file.filename}")
-        return transcription_cache[cache_key]
-    
-    # Verificar tipo de arquivo
-    allowed_types = {
-        'audio/mpeg', 'audio/wav', 'audio/mp4', 'audio/m4a', 
-        'audio/ogg', 'audio/webm', 'audio/flac',
-        'video/mp4', 'video/avi', 'video/mov', 'video/mkv'
-    }
-    
-    if file.content_type not in allowed_types:
+ALLOWED_AUDIO_TYPES = {
+    'audio/mpeg', 'audio/wav', 'audio/mp4', 'audio/m4a', 
+    'audio/ogg', 'audio/webm', 'audio/flac',
+    'video/mp4', 'video/avi', 'video/mov', 'video/mkv'
+}
+ALLOWED_AUDIO_EXTENSIONS = ['mp3', 'wav', 'm4a', 'ogg', 'webm', 'flac', 'mp4', 'avi', 'mov', 'mkv']
+
+def validate_audio_upload(file: UploadFile):
+    """Verifica se o upload é um áudio/vídeo suportado"""
+    capabilities.check("audio")
+    if file.content_type not in ALLOWED_AUDIO_TYPES:
         # Tentar detectar pelo nome do arquivo
         ext = file.filename.split('.')[-1].lower() if file.filename else ""
-        if ext not in ['mp3', 'wav', 'm4a', 'ogg', 'webm', 'flac', 'mp4', 'avi', 'mov', 'mkv']:
+        if ext not in ALLOWED_AUDIO_EXTENSIONS:
             raise HTTPException(
                 status_code=400, 
                 detail=f"Tipo de arquivo não suportado: {file.content_type}"
             )
+
+async def run_inference(func, *args, **kwargs):
+    """Executa inferência no pool de workers, fora do event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(inference_executor, functools.partial(func, *args, **kwargs))
+
+async def run_model(model_name: str, func, *args, lane: str = "standard", cost: float = 1.0, **kwargs):
+    """Executa func(modelo, ...) na vez da faixa (lane), com custo em segundos de áudio"""
+    if fair_scheduler is None:
+        return await execute_model(model_name, func, *args, **kwargs)
+    
+    async with fair_scheduler.slot(lane, cost) as waited:
+        record_stage(f"queue_{lane}", waited)
+        return await execute_model(model_name, func, *args, **kwargs)
+
+async def run_bulk_chunk(model_name: str, audio, **options):
+    """Trecho de mídia longa: disputa a vaga de novo a cada trecho (faixa bulk)"""
+    return await run_model(
+        model_name, transcribe_with_model, audio,
+        lane="bulk", cost=len(audio) / SAMPLE_RATE, **options
+    )
+
+async def execute_model(model_name: str, func, *args, **kwargs):
+    """Executa func(modelo, ...) nos workers pré-criados ou no pool de threads"""
+    if worker_pool is not None:
+        if not worker_pool.processes:
+            raise HTTPException(status_code=503, detail="Servidor aquecendo. Tente novamente em alguns segundos.")
+        with observe_stage("inference"):
+            return await worker_pool.run(model_name, func, *args, **kwargs)
     
-    temp_files = []
+    def call():
+        # O modelo é obtido (e carregado, se preciso) fora do event loop;
+        # só a inferência em si entra na métrica (sem fila nem carregamento)
+        model = model_registry.get(model_name)
+        with cpu_scheduler.job("inference"), observe_stage("inference"):
+            return func(model, *args, **kwargs)
+    
+    return await run_inference(call)
+
+async def load_capability(name: str):
+    """Módulo da capacidade; o primeiro import roda fora do event loop"""
+    if capabilities.is_loaded(name):
+        return capabilities.load(name)
+    capabilities.check(name)
+    return await asyncio.get_running_loop().run_in_executor(None, capabilities.load, name)
+
+async def run_ocr(func, *args, **kwargs):
+    """Executa OCR/extração no pool, com sua fatia de cores ao lado da inferência"""
+    def call():
+        with cpu_scheduler.job("ocr"):
+            return func(*args, **kwargs)
+    
+    return await run_inference(call)
+
+async def receive_upload(file: UploadFile, suffix: str) -> SpooledUpload:
+    """Grava o upload em disco (com hash) registrando as etapas de leitura e hash"""
+    upload = await spool_upload(file, MAX_FILE_SIZE, CHUNK_SIZE, suffix)
+    record_stage("upload_read", upload.read_seconds)
+    record_stage("hashing", upload.hash_seconds)
+    return upload
+
+def resolve_precision(precision: Optional[str]) -> str:
+    """Precisão da requisição ou a padrão do deploy"""
+    precision = precision or INFERENCE_PRECISION
+    if precision not in PRECISIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Precisão inválida: {precision}. Use: {', '.join(PRECISIONS)}"
+        )
+    return precision
+
+def resolve_model(model: Optional[str]) -> Optional[str]:
+    """Modelo forçado pela requisição, se estiver entre os permitidos no deploy"""
+    if model and model not in ALLOWED_MODELS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Modelo inválido: {model}. Use: {', '.join(ALLOWED_MODELS)}"
+        )
+    return model or None
+
+def audio_cache_key(
+    file_hash: str,
+    language: Optional[str],
+    whatsapp_optimization: bool,
+    precision: str,
+    model: Optional[str] = None
+) -> str:
+    """Chave de cache das transcrições (precisão e modelo só entram quando não são os padrões)"""
+    cache_key = f"{file_hash}_{language}_{whatsapp_optimization}"
+    if precision != "fp32":
+        cache_key += f"_{precision}"
+    if model:
+        cache_key += f"_{model}"
+    return cache_key
+
+def prefetch_model(model_name: str):
+    """Carrega o modelo em segundo plano enquanto o áudio é decodificado"""
+    if worker_pool is None and model_name not in model_registry:
+        asyncio.get_running_loop().run_in_executor(inference_executor, model_registry.get, model_name)
+
+async def run_whisper_batch(key, audios: list) -> list:
+    """Executa um lote de clipes do mesmo modelo/idioma"""
+    model_name, language = key
+    logger.info(f"Decodificando lote de {len(audios)} clipes com modelo {model_name}")
+    cost = sum(len(audio) for audio in audios) / SAMPLE_RATE
+    return await run_model(model_name, transcribe_batch, audios, language, lane="interactive", cost=cost)
+
+micro_batcher = MicroBatcher(
+    run_whisper_batch,
+    max_batch_size=BATCH_MAX_SIZE,
+    max_wait_ms=BATCH_MAX_WAIT_MS
+)
+
+async def process_audio_file(
+    temp_file_path: str,
+    filename: Optional[str],
+    content_type: Optional[str],
+    file_size: int,
+    language: Optional[str] = "pt",
+    whatsapp_optimization: bool = False,
+    cache_key: Optional[str] = None,
+    long_media: bool = False,
+    model: Optional[str] = None,
+    keep_file: bool = False,
+    precision: Optional[str] = None,
+    segment_fields=BASIC_FIELDS,
+    lane: Optional[str] = None
+) -> dict:
+    """
+    Executa o pipeline de transcrição sobre um arquivo já salvo em disco.
+    O arquivo de entrada é removido ao final, exceto com keep_file=True.
+    model força o modelo em vez do roteamento pela duração.
+    segment_fields: campos de segmento guardados no cache e devolvidos.
+    lane: faixa de prioridade (padrão: pela duração).
+    """
+    temp_files = [] if keep_file else [temp_file_path]
+    precision = precision or INFERENCE_PRECISION
     try:
-        # Criar arquivo temporário
-        suffix = f".{file.filename.split('.')[-1]}" if file.filename else ".tmp"
-        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as temp_file:
-            temp_file.write(content)
-            temp_file_path = temp_file.name
-            temp_files.append(temp_file_path)
-        
-        logger.info(f"Processando: {file.filename} ({len(content)} bytes)")
-        
-        # Processar vídeo se necessário
-        is_video = any(ext in file.content_type for ext in ['video/', '.mp4', '.avi', '.mov', '.mkv'])
-        if is_video:
-            logger.info("Convertendo vídeo para áudio...")
-            audio_path = await convert_video_to_audio(temp_file_path)
-            temp_files.append(audio_path)
-            temp_file_path = audio_path
-        
-        # Otimizar áudio do WhatsApp
-        if whatsapp_optimization:
-            logger.info("Aplicando otimizações para WhatsApp...")
-            processed_path = preprocess_whatsapp_audio(temp_file_path)
-            if processed_path != temp_file_path:
-                temp_files.append(processed_path)
-                temp_file_path = processed_path
+        logger.info(f"Processando: {filename} ({content_type}, {file_size} bytes)")
         
-        # Escolher modelo otimizado
-        model_name = choose_optimal_model(len(content))
-        model = models[model_name]
+        # Duração pelo cabeçalho (sem decodificar): o modelo é escolhido já e,
+        # se não estiver carregado, carrega em paralelo com o ffmpeg
+        model_name = model
+        if model_name is not None:
+            prefetch_model(model_key(model_name, precision))
+        duration = await probe_duration(temp_file_path) if model_name is None else None
+        if duration is not None and not (long_media and duration >= LONG_MEDIA_MIN_SECONDS):
+            model_name = choose_optimal_model(duration)
+            prefetch_model(model_key(model_name, precision))
         
-        logger.info(f"Usando modelo: {model_name}")
+        # Decodificar (áudio ou vídeo) direto para PCM 16 kHz, com filtros de voz
+        # do WhatsApp quando solicitado, em um único processo ffmpeg
+        if whatsapp_optimization:
+            logger.info("Aplicando otimizações para WhatsApp...")
+        try:
+            with observe_stage("ffmpeg"):
+                audio = await decode_audio(
+                    temp_file_path,
+                    audio_filter=WHATSAPP_VOICE_FILTER if whatsapp_optimization else None
+                )
+        except AudioDecodeError as e:
+            logger.error(f"Erro na conversão: {e}")
+            raise HTTPException(status_code=500, detail="Erro na conversão do áudio/vídeo")
         
         # Transcrever
         transcribe_options = {
@@ -438,27 +580,57 @@ async def transcribe_audio(
         if language and language != "auto":
             transcribe_options["language"] = language
         
-        result = model.transcribe(temp_file_path, **transcribe_options)
+        duration = len(audio) / SAMPLE_RATE
+        if long_media and model is None and duration >= LONG_MEDIA_MIN_SECONDS:
+            # Trechos de fala em paralelo, cada um disputando a vaga na faixa bulk
+            model_name = LONG_MEDIA_MODEL
+            run_chunk = functools.partial(run_bulk_chunk, model_key(model_name, precision))
+            logger.info(f"Usando modelo: {model_name} ({precision}, modo mídia longa)")
+            result = await long_media_transcriber.transcribe(audio, transcribe_options, run_chunk)
+        else:
+            # Escolher modelo otimizado (sem duração no cabeçalho, usa a decodificada)
+            if model_name is None:
+                model_name = choose_optimal_model(duration)
+            
+            logger.info(f"Usando modelo: {model_name} ({precision}, {duration:.1f}s de áudio)")
+            
+            variant = model_key(model_name, precision)
+            with model_router.track():
+                result = None
+                if BATCH_ENABLED and model_name in BATCH_MODELS and fits_single_window(audio):
+                    # Clipes de até 30s entram no lote compartilhado entre requisições
+                    batch_key = (variant, transcribe_options.get("language"))
+                    result = await micro_batcher.submit(batch_key, audio)
+                if result is None:
+                    result = await run_model(
+                        variant, transcribe_with_model, audio,
+                        lane=lane or lane_for(duration), cost=duration, **transcribe_options
+                    )
+            # O RTF do roteamento é o da precisão padrão do deploy
+            model_router.record_result(model_name if precision == INFERENCE_PRECISION else variant, duration, result)
         
-        # Preparar resposta
+        # Preparar resposta (segmentos em arrays paralelos, só com os campos pedidos)
+        segments = compact_segments(result.get("segments", []), segment_fields)
         response = {
             "text": result["text"].strip(),
-            "language": result["language"],
-            "segments": result["segments"],
-            "filename": file.filename,
+            "language": result["language"] or language,
+            "segments": segments,
+            "filename": filename,
             "model_used": model_name,
-            "duration": result.get("segments", [])[-1]["end"] if result.get("segments") else 0,
+            "precision": precision,
+            "duration": segments_end(segments),
             "cached": False
         }
         
         # Salvar no cache
-        if use_cache:
-            transcription_cache[cache_key] = response.copy()
-            transcription_cache[cache_key]["cached"] = True
+        if cache_key:
+            await store_cached_result(cache_key, response)
         
         logger.info("Transcrição concluída com sucesso")
-        return response
+        return project_result(response, segment_fields)
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Erro na transcrição: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Erro na transcrição: {str(e)}")
@@ -472,6 +644,134 @@ async def transcribe_audio(
             except Exception as e:
                 logger.warning(f"Erro ao limpar arquivo {temp_path}: {e}")
 
+async def enqueue_audio_file(
+    temp_file_path: str,
+    keep_file: bool = False,
+    callback_url: Optional[str] = None,
+    metadata: Optional[dict] = None,
+    **options
+) -> dict:
+    """
+    NODE_ROLE=api: move o arquivo para o spool compartilhado e enfileira no broker.
+    Faixa e modelo (dica de afinidade para os workers) saem da duração no cabeçalho.
+    """
+    spool_path = BROKER_SPOOL_DIR / f"{uuid.uuid4().hex}{Path(temp_file_path).suffix}"
+    if keep_file:
+        shutil.copyfile(temp_file_path, spool_path)
+    else:
+        shutil.move(temp_file_path, spool_path)
+    try:
+        duration = await probe_duration(str(spool_path))
+        model_name = options.get("model")
+        if model_name is None and duration is not None:
+            long_media = options.get("long_media") and duration >= LONG_MEDIA_MIN_SECONDS
+            model_name = LONG_MEDIA_MODEL if long_media else choose_optimal_model(duration)
+        precision = options.get("precision") or INFERENCE_PRECISION
+        lane = options.get("lane") or (lane_for(duration) if duration is not None else "standard")
+        return await job_broker.run(
+            job_broker.enqueue,
+            {**options, "temp_file_path": str(spool_path)},
+            lane=lane,
+            model=model_key(model_name, precision) if model_name else None,
+            cost=duration or 0,
+            callback_url=callback_url,
+            metadata=metadata
+        )
+    except Exception:
+        spool_path.unlink(missing_ok=True)
+        raise
+
+async def transcribe_file(temp_file_path: str, **options) -> dict:
+    """process_audio_file neste nó ou, com NODE_ROLE=api, num worker via broker"""
+    if NODE_ROLE != "api":
+        return await process_audio_file(temp_file_path, **options)
+    job = await enqueue_audio_file(temp_file_path, **options)
+    return await job_broker.wait(job["job_id"], BROKER_POLL_SECONDS, BROKER_WAIT_TIMEOUT)
+
+async def run_broker_job(job: dict) -> dict:
+    """NODE_ROLE=worker: transcreve um job puxado do broker (o arquivo do spool é removido)"""
+    options = dict(job["payload"])
+    temp_file_path = options.pop("temp_file_path")
+    if not os.path.exists(temp_file_path):
+        raise HTTPException(status_code=500, detail="Arquivo do job não encontrado no spool compartilhado")
+    if "segment_fields" in options:
+        # JSON devolve listas; os campos são usados como tupla (chaves e cache)
+        options["segment_fields"] = tuple(options["segment_fields"])
+    return await process_audio_file(temp_file_path, **options)
+
+broker_worker = BrokerWorker(
+    job_broker,
+    WORKER_ID,
+    run_broker_job,
+    slots=WORKER_SLOTS,
+    loaded_models=model_registry.loaded,
+    lanes=WORKER_LANES,
+    poll_interval=BROKER_POLL_SECONDS
+) if NODE_ROLE == "worker" else None
+
+@app.post("/transcribe")
+async def transcribe_audio(
+    file: UploadFile = File(...),
+    language: Optional[str] = "pt",
+    use_cache: bool = True,
+    whatsapp_optimization: bool = False,
+    long_media: bool = False,
+    precision: Optional[str] = None,
+    model: Optional[str] = None,
+    detail: Optional[str] = "basic",
+    fields: Optional[str] = None
+):
+    """
+    Transcreve arquivo de áudio/vídeo para texto com otimizações
+    
+    - **file**: Arquivo de áudio/vídeo
+    - **language**: Código do idioma (pt, en, es, etc.)
+    - **use_cache**: Usar cache de resultados
+    - **whatsapp_optimization**: Aplicar filtros específicos para WhatsApp
+    - **long_media**: Dividir nos silêncios e transcrever os trechos em paralelo
+    - **precision**: fp32 ou int8 (padrão: INFERENCE_PRECISION)
+    - **model**: Força um modelo de LOAD_MODELS/ROUTER_MODELS em vez do roteamento pela duração
+    - **detail**: Campos dos segmentos: none, basic (id, start, end, text) ou full (todos do Whisper)
+    - **fields**: Lista de campos dos segmentos separados por vírgula (tem precedência sobre detail)
+    """
+    
+    # Verificar tipo de arquivo
+    validate_audio_upload(file)
+    precision = resolve_precision(precision)
+    segment_fields = resolve_segment_fields(detail, fields)
+    model = resolve_model(model)
+    
+    # Gravar em disco calculando o hash (rejeita acima do tamanho máximo)
+    upload = await receive_upload(file, upload_suffix(file.filename))
+    
+    # Verificar cache
+    cache_key = audio_cache_key(upload.file_hash, language, whatsapp_optimization, precision, model)
+    
+    cached = await get_cached_transcription(cache_key, segment_fields) if use_cache else None
+    if cached is not None:
+        logger.info(f"Resultado encontrado no cache para {file.filename}")
+        upload.cleanup()
+        return cached
+    
+    return await inflight.run(
+        f"{cache_key}|{','.join(segment_fields)}",
+        functools.partial(
+            transcribe_file,
+            upload.path,
+            filename=file.filename,
+            content_type=file.content_type,
+            file_size=upload.size,
+            language=language,
+            whatsapp_optimization=whatsapp_optimization,
+            cache_key=cache_key if use_cache else None,
+            long_media=long_media,
+            precision=precision,
+            model=model,
+            segment_fields=segment_fields
+        ),
+        on_join=upload.cleanup
+    )
+
 @app.post("/transcribe-simple")
 async def transcribe_simple(
     file: UploadFile = File(...),
@@ -484,53 +784,500 @@ async def transcribe_simple(
         file=file, 
         language="pt",
         use_cache=True,
-        whatsapp_optimization=whatsapp_optimization
+        whatsapp_optimization=whatsapp_optimization,
+        detail="none"
     )
     
     return {"text": result["text"]}
 
 @app.post("/transcribe-whatsapp")
-async def transcribe_whatsapp(file: UploadFile = File(...)):
+async def transcribe_whatsapp(
+    file: UploadFile = File(...),
+    refine: bool = False,
+    refine_model: Optional[str] = None,
+    callback_url: Optional[str] = None
+):
     """
     Endpoint específico para áudios do WhatsApp com otimizações automáticas
+    
+    - **refine**: Responde na hora com o modelo rascunho (tiny) e retranscreve em
+      segundo plano com um modelo melhor, substituindo o resultado no cache
+    - **refine_model**: Modelo do refinamento (padrão: REFINE_MODEL)
+    - **callback_url**: URL que receberá um POST com o texto refinado
     """
-    result = await transcribe_audio(
-        file=file,
-        language="pt", 
-        use_cache=True,
-        whatsapp_optimization=True
+    if not refine:
+        result = await transcribe_audio(
+            file=file,
+            language="pt", 
+            use_cache=True,
+            whatsapp_optimization=True,
+            detail="none"
+        )
+        
+        return {
+            "text": result["text"],
+            "duration": result["duration"],
+            "model_used": result["model_used"],
+            "cached": result["cached"]
+        }
+    
+    refine_model = refine_model or REFINE_MODEL
+    if refine_model not in REFINE_MODELS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Modelo de refinamento inválido. Use: {', '.join(REFINE_MODELS)}"
+        )
+    
+    validate_audio_upload(file)
+    upload = await receive_upload(file, upload_suffix(file.filename))
+    cache_key = audio_cache_key(upload.file_hash, "pt", True, INFERENCE_PRECISION)
+    
+    # Já refinado (ou transcrito por outro modelo que não o rascunho): nada a fazer
+    result = await get_cached_result(cache_key)
+    if result is not None and result["model_used"] != REFINE_DRAFT_MODEL:
+        upload.cleanup()
+        return {
+            "text": result["text"],
+            "duration": result["duration"],
+            "model_used": result["model_used"],
+            "cached": result["cached"],
+            "refine_job_id": None
+        }
+    
+    if result is None:
+        try:
+            # Cada cópia mantém o próprio arquivo para o seu job de refinamento
+            result = await inflight.run(f"{cache_key}|draft", functools.partial(
+                transcribe_file,
+                upload.path,
+                filename=file.filename,
+                content_type=file.content_type,
+                file_size=upload.size,
+                language="pt",
+                whatsapp_optimization=True,
+                cache_key=cache_key,
+                model=REFINE_DRAFT_MODEL,
+                keep_file=True
+            ))
+        except Exception:
+            upload.cleanup()
+            raise
+    
+    # Refinamento pela fila de jobs: substitui o rascunho no cache e notifica o callback
+    handler = functools.partial(
+        inflight.run,
+        f"{cache_key}|refine:{refine_model}",
+        functools.partial(
+            transcribe_file,
+            upload.path,
+            filename=file.filename,
+            content_type=file.content_type,
+            file_size=upload.size,
+            language="pt",
+            whatsapp_optimization=True,
+            cache_key=cache_key,
+            model=refine_model,
+            lane="bulk"
+        ),
+        on_join=upload.cleanup
     )
+    try:
+        job = job_manager.submit(handler, callback_url, {"filename": file.filename, "refine_of": REFINE_DRAFT_MODEL})
+        refine_job_id = job["job_id"]
+    except HTTPException as e:
+        # Fila cheia: o rascunho já atende o cliente
+        logger.warning(f"Refinamento não enfileirado: {e.detail}")
+        upload.cleanup()
+        refine_job_id = None
     
     return {
         "text": result["text"],
         "duration": result["duration"],
         "model_used": result["model_used"],
-        "cached": result["cached"]
+        "cached": result["cached"],
+        "refine_job_id": refine_job_id,
+        "status_url": f"/jobs/{refine_job_id}" if refine_job_id else None
     }
 
 @app.post("/transcribe-video")
 async def transcribe_video(
     file: UploadFile = File(...),
-    language: Optional[str] = "pt"
+    language: Optional[str] = "pt",
+    long_media: bool = True
 ):
     """
     Endpoint específico para vídeos grandes
+    
+    - **long_media**: Transcrever trechos em paralelo (mídias acima de LONG_MEDIA_MIN_SECONDS)
     """
     return await transcribe_audio(
         file=file,
         language=language,
         use_cache=True,
-        whatsapp_optimization=False
+        whatsapp_optimization=False,
+        long_media=long_media
+    )
+
+# ========== STREAMING DE SEGMENTOS (SSE) ==========
+
+def sse_event(event: str, data: dict) -> str:
+    """Formata um evento Server-Sent Events"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+def segment_event(segment: dict) -> str:
+    return sse_event("segment", {
+        "id": segment["id"],
+        "start": segment["start"],
+        "end": segment["end"],
+        "text": segment["text"].strip()
+    })
+
+async def stream_chunks(
+    upload,
+    filename: Optional[str],
+    language: Optional[str],
+    whatsapp_optimization: bool,
+    cache_key: Optional[str],
+    precision: str,
+    streamed: asyncio.Queue
+) -> dict:
+    """
+    Transcreve trecho a trecho (cortes nos silêncios), colocando cada segmento
+    em streamed assim que é decodificado. Roda como task do single-flight:
+    é dona do upload e o remove ao final, mesmo se o cliente desconectar.
+    """
+    try:
+        try:
+            with observe_stage("ffmpeg"):
+                audio = await decode_audio(
+                    upload.path,
+                    audio_filter=WHATSAPP_VOICE_FILTER if whatsapp_optimization else None
+                )
+        except AudioDecodeError as e:
+            logger.error(f"Erro na conversão: {e}")
+            raise HTTPException(status_code=500, detail="Erro na conversão do áudio/vídeo")
+        
+        model_name = choose_optimal_model(len(audio) / SAMPLE_RATE)
+        variant = model_key(model_name, precision)
+        logger.info(f"Streaming com modelo: {model_name} ({precision})")
+        
+        transcribe_options = {
+            "fp16": False,
+            "temperature": 0.0,
+        }
+        if language and language != "auto":
+            transcribe_options["language"] = language
+        
+        segments = []
+        texts = []
+        detected_language = None
+        lane = lane_for(len(audio) / SAMPLE_RATE)
+        for start, end in split_on_silence(audio, STREAM_CHUNK_SECONDS):
+            seconds = (end - start) / SAMPLE_RATE
+            with model_router.track():
+                result = await run_model(
+                    variant, transcribe_with_model, audio[start:end],
+                    lane=lane, cost=seconds, **transcribe_options
+                )
+            model_router.record_result(model_name if precision == INFERENCE_PRECISION else variant, seconds, result)
+            
+            # Fixar o idioma detectado no primeiro trecho para os seguintes
+            if detected_language is None:
+                detected_language = result["language"]
+                transcribe_options.setdefault("language", detected_language)
+            
+            chunk = stitch_results([result], [start / SAMPLE_RATE])
+            if chunk["text"]:
+                texts.append(chunk["text"])
+            for segment in chunk["segments"]:
+                segment["id"] = len(segments)
+                segments.append(segment)
+                streamed.put_nowait(segment)
+        
+        response = {
+            "text": " ".join(texts),
+            "language": detected_language or language,
+            "segments": compact_segments(segments),
+            "filename": filename,
+            "model_used": model_name,
+            "precision": precision,
+            "duration": segments[-1]["end"] if segments else 0,
+            "cached": False
+        }
+        if cache_key:
+            await store_cached_result(cache_key, response)
+        
+        logger.info("Transcrição em streaming concluída com sucesso")
+        # Mesmo formato de /transcribe com detail=basic: quem pegou carona recebe igual
+        return project_result(response, BASIC_FIELDS)
+    
+    finally:
+        upload.cleanup()
+
+async def stream_transcription(
+    upload,
+    filename: Optional[str],
+    language: Optional[str],
+    whatsapp_optimization: bool,
+    cache_key: Optional[str],
+    flight_key: str,
+    precision: str = "fp32"
+):
+    """
+    Emite cada segmento assim que é decodificado, seguido de um evento final
+    de resumo. Uploads idênticos em andamento (aqui ou em /transcribe) não são
+    transcritos de novo: a requisição aguarda o resultado e emite tudo no final.
+    """
+    flight = None
+    try:
+        cached = await get_cached_result(cache_key) if cache_key else None
+        if cached is not None:
+            for segment in expand_segments(cached["segments"], BASIC_FIELDS):
+                yield segment_event(segment)
+            yield sse_event("summary", {k: v for k, v in cached.items() if k != "segments"})
+            return
+        
+        streamed: asyncio.Queue = asyncio.Queue()
+        if NODE_ROLE == "api":
+            # Sem modelos neste nó: um worker transcreve tudo e os segmentos saem no final
+            factory = functools.partial(
+                transcribe_file,
+                upload.path,
+                filename=filename,
+                content_type=None,
+                file_size=upload.size,
+                language=language,
+                whatsapp_optimization=whatsapp_optimization,
+                cache_key=cache_key,
+                precision=precision,
+                segment_fields=BASIC_FIELDS
+            )
+        else:
+            factory = functools.partial(
+                stream_chunks, upload, filename, language, whatsapp_optimization,
+                cache_key, precision, streamed
+            )
+        flight = asyncio.ensure_future(inflight.run(flight_key, factory, on_join=upload.cleanup))
+        
+        # Segmentos conforme a task (se for a desta requisição) os decodifica
+        emitted = 0
+        while not flight.done():
+            segment = asyncio.ensure_future(streamed.get())
+            await asyncio.wait({segment, flight}, return_when=asyncio.FIRST_COMPLETED)
+            if not segment.done():
+                segment.cancel()
+                break
+            yield segment_event(segment.result())
+            emitted += 1
+        
+        result = flight.result()
+        while not streamed.empty():
+            yield segment_event(streamed.get_nowait())
+            emitted += 1
+        # Carona em outra requisição: todos os segmentos chegam com o resultado
+        for segment in result["segments"][emitted:]:
+            yield segment_event(segment)
+        yield sse_event("summary", {k: v for k, v in result.items() if k != "segments"})
+        
+    except HTTPException as e:
+        logger.error(f"Erro na transcrição em streaming: {e.detail}")
+        yield sse_event("error", {"detail": e.detail})
+    except Exception as e:
+        logger.error(f"Erro na transcrição em streaming: {str(e)}")
+        yield sse_event("error", {"detail": f"Erro na transcrição: {str(e)}"})
+    
+    finally:
+        if flight is None:
+            upload.cleanup()
+        elif not flight.done():
+            # Cliente desconectou: a transcrição segue (shield) para quem aguarda
+            flight.cancel()
+
+@app.post("/transcribe-stream")
+async def transcribe_stream(
+    file: UploadFile = File(...),
+    language: Optional[str] = "pt",
+    use_cache: bool = True,
+    whatsapp_optimization: bool = False,
+    precision: Optional[str] = None
+):
+    """
+    Transcreve emitindo os segmentos via Server-Sent Events conforme são decodificados
+    
+    - Eventos **segment**: {id, start, end, text}
+    - Evento final **summary**: texto completo, idioma, duração e modelo
+    - Evento **error** em caso de falha
+    """
+    validate_audio_upload(file)
+    precision = resolve_precision(precision)
+    upload = await receive_upload(file, upload_suffix(file.filename))
+    cache_key = audio_cache_key(upload.file_hash, language, whatsapp_optimization, precision)
+    
+    return StreamingResponse(
+        stream_transcription(
+            upload,
+            filename=file.filename,
+            language=language,
+            whatsapp_optimization=whatsapp_optimization,
+            cache_key=cache_key if use_cache else None,
+            # Mesma chave de /transcribe com detail=basic
+            flight_key=f"{cache_key}|{','.join(BASIC_FIELDS)}",
+            precision=precision
+        ),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
     )
 
+# Profundidade das filas, lida a cada scrape
+track_queue("jobs", lambda: job_manager.queue.qsize() if job_manager.queue else 0)
+# (broker: contagem atualizada pelo /metrics fora do event loop, antes do scrape)
+track_queue("broker", lambda: job_broker.queued if job_broker else 0)
+track_queue("inference", lambda: inference_executor._work_queue.qsize())
+track_queue("batching", lambda: sum(len(items) for items in micro_batcher.pending.values()))
+track_queue("inference_workers", lambda: len(worker_pool.pending) if worker_pool else 0)
+for lane in LANES:
+    track_queue(f"lane_{lane}", functools.partial(lambda lane: fair_scheduler.waiting(lane) if fair_scheduler else 0, lane))
+
+@app.get("/metrics")
+async def metrics():
+    """
+    Métricas no formato Prometheus: latência por etapa, cache, filas e carregamento de modelos
+    """
+    if job_broker is not None:
+        await job_broker.run(job_broker.count_queued)
+    return metrics_response()
+
+@app.get("/models")
+async def models_status():
+    """
+    Modelos carregados, memória ocupada e despejos do registro, além do
+    RTF medido por modelo usado no roteamento
+    """
+    return {**model_registry.stats(), "routing": model_router.stats()}
+
+# ========== JOBS ASSÍNCRONOS ==========
+
+@app.post("/jobs/transcribe", status_code=202)
+async def submit_transcription_job(
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(...),
+    language: Optional[str] = "pt",
+    use_cache: bool = True,
+    whatsapp_optimization: bool = False,
+    long_media: bool = False,
+    callback_url: Optional[str] = None,
+    precision: Optional[str] = None,
+    detail: Optional[str] = "basic",
+    fields: Optional[str] = None
+):
+    """
+    Enfileira uma transcrição e retorna imediatamente o ID do job
+    
+    - **file**: Arquivo de áudio/vídeo
+    - **language**: Código do idioma (pt, en, es, etc.)
+    - **use_cache**: Usar cache de resultados
+    - **whatsapp_optimization**: Aplicar filtros específicos para WhatsApp
+    - **long_media**: Dividir nos silêncios e transcrever os trechos em paralelo
+    - **callback_url**: URL que receberá um POST com o resultado ao final
+    - **precision**: fp32 ou int8 (padrão: INFERENCE_PRECISION)
+    - **detail**: Campos dos segmentos: none, basic ou full
+    - **fields**: Lista de campos dos segmentos separados por vírgula
+    """
+    validate_audio_upload(file)
+    precision = resolve_precision(precision)
+    segment_fields = resolve_segment_fields(detail, fields)
+    upload = await receive_upload(file, upload_suffix(file.filename))
+    
+    cache_key = audio_cache_key(upload.file_hash, language, whatsapp_optimization, precision)
+    metadata = {"filename": file.filename, "file_size": upload.size}
+    
+    cached = await get_cached_transcription(cache_key, segment_fields) if use_cache else None
+    if cached is not None:
+        logger.info(f"Resultado encontrado no cache para {file.filename}")
+        upload.cleanup()
+        if NODE_ROLE == "api":
+            # Registro no broker: qualquer nó de API responde a /jobs/{job_id}
+            job = await job_broker.run(job_broker.add_completed, cached, callback_url, metadata)
+            if callback_url:
+                background_tasks.add_task(post_callback, callback_url, job)
+            return job
+        job = job_manager.submit_completed(cached, callback_url, metadata)
+        return job_manager.get(job["job_id"])
+    
+    if NODE_ROLE == "api":
+        # O worker que pegar o job grava o resultado no broker e chama o callback
+        job = await enqueue_audio_file(
+            upload.path,
+            callback_url=callback_url,
+            metadata=metadata,
+            filename=file.filename,
+            content_type=file.content_type,
+            file_size=upload.size,
+            language=language,
+            whatsapp_optimization=whatsapp_optimization,
+            cache_key=cache_key if use_cache else None,
+            long_media=long_media,
+            precision=precision,
+            segment_fields=segment_fields
+        )
+        return {**job, "status_url": f"/jobs/{job['job_id']}"}
+    
+    handler = functools.partial(
+        inflight.run,
+        f"{cache_key}|{','.join(segment_fields)}",
+        functools.partial(
+            transcribe_file,
+            upload.path,
+            filename=file.filename,
+            content_type=file.content_type,
+            file_size=upload.size,
+            language=language,
+            whatsapp_optimization=whatsapp_optimization,
+            cache_key=cache_key if use_cache else None,
+            long_media=long_media,
+            precision=precision,
+            segment_fields=segment_fields
+        ),
+        on_join=upload.cleanup
+    )
+    try:
+        job = job_manager.submit(handler, callback_url, metadata)
+    except HTTPException:
+        upload.cleanup()
+        raise
+    
+    return {
+        **job_manager.get(job["job_id"]),
+        "status_url": f"/jobs/{job['job_id']}"
+    }
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """
+    Status e resultado de um job de transcrição
+    """
+    job = job_manager.get(job_id)
+    if job is None and job_broker is not None:
+        job = await job_broker.run(job_broker.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job não encontrado")
+    return job
+
+@app.get("/jobs")
+async def jobs_stats():
+    """
+    Estatísticas da fila de jobs (e do broker, na implantação dividida)
+    """
+    return {**job_manager.stats(), "broker": await job_broker.run(job_broker.stats) if job_broker else None}
+
 @app.get("/cache/clear")
 async def clear_cache():
     """
     Limpa o cache de transcrições
     """
-    global transcription_cache
-    cache_size = len(transcription_cache)
-    transcription_cache.clear()
+    cache_size = transcription_cache.clear()
+    if result_store is not None:
+        cache_size += await result_store.run(result_store.clear)
     return {"message": f"Cache limpo. {cache_size} itens removidos."}
 
 @app.get("/cache/stats")
@@ -540,11 +1287,57 @@ async def cache_stats():
     """
     return {
         "cache_size": len(transcription_cache),
-        "memory_usage_mb": sum(len(str(v)) for v in transcription_cache.values()) / (1024 * 1024)
+        **transcription_cache.stats(),
+        "disk": await result_store.run(result_store.stats) if result_store else None,
+        "in_flight": inflight.stats()
     }
 
 # ========== ENDPOINTS DE OCR E PROCESSAMENTO DE DOCUMENTOS ==========
 
+async def process_image_file(
+    temp_file_path: str,
+    filename: Optional[str],
+    file_size: int,
+    method: str,
+    cache_key: Optional[str] = None
+) -> dict:
+    """OCR de uma imagem já salva em disco; o arquivo é removido ao final"""
+    temp_files = [temp_file_path]
+    try:
+        logger.info(f"Processando OCR: {filename} ({file_size} bytes)")
+        
+        # Extrair texto
+        ocr = await load_capability("ocr")
+        result = await run_ocr(ocr.extract_text_from_image, temp_file_path, method)
+        
+        # Preparar resposta
+        response = {
+            **result,
+            "filename": filename,
+            "file_size": file_size,
+            "cached": False
+        }
+        
+        # Salvar no cache
+        if cache_key:
+            await store_cached_result(cache_key, response)
+        
+        logger.info("OCR concluído com sucesso")
+        return response
+        
+    except Exception as e:
+        logger.error(f"Erro no OCR: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Erro no OCR: {str(e)}")
+    
+    finally:
+        # Limpar arquivos temporários
+        for temp_path in temp_files:
+            try:
+                if os.path.exists(temp_path):
+                    os.unlink(temp_path)
+            except Exception as e:
+                logger.warning(f"Erro ao limpar arquivo {temp_path}: {e}")
+
 @app.post("/ocr/image")
 async def ocr_image(
     file: UploadFile = File(...),
@@ -559,27 +1352,14 @@ async def ocr_image(
     - **use_cache**: Usar cache de resultados
     """
     
+    capabilities.check("ocr")
+    
     # Verificar tipo de arquivo
     allowed_types = {
         'image/jpeg', 'image/jpg', 'image/png', 'image/bmp', 
         'image/tiff', 'image/webp', 'image/gif'
     }
     
-    content = await file.read()
-    if len(content) > MAX_FILE_SIZE:
-        raise HTTPException(
-            status_code=413,
-            detail=f"Arquivo muito grande. Máximo: {MAX_FILE_SIZE // (1024*1024)}MB"
-        )
-    
-    # Verificar cache
-    file_hash = get_file_hash(content)
-    cache_key = f"ocr_{file_hash}_{method}"
-    
-    if use_cache and cache_key in transcription_cache:
-        logger.info(f"OCR encontrado no cache para {file.filename}")
-        return transcription_cache[cache_key]
-    
     # Verificar extensão se content_type falhar
     if file.content_type not in allowed_types:
         ext = file.filename.split('.')[-1].lower() if file.filename else ""
@@ -589,39 +1369,61 @@ async def ocr_image(
                 detail=f"Tipo de arquivo não suportado: {file.content_type}"
             )
     
-    temp_files = []
+    upload = await receive_upload(file, upload_suffix(file.filename, ".jpg"))
+    
+    # Verificar cache
+    cache_key = f"ocr_{upload.file_hash}_{method}"
+    
+    cached = await get_cached_result(cache_key) if use_cache else None
+    if cached is not None:
+        logger.info(f"OCR encontrado no cache para {file.filename}")
+        upload.cleanup()
+        return cached
+    
+    # Cópias idênticas em andamento aguardam a primeira extração
+    return await inflight.run(cache_key, functools.partial(
+        process_image_file,
+        upload.path,
+        filename=file.filename,
+        file_size=upload.size,
+        method=method,
+        cache_key=cache_key if use_cache else None
+    ), on_join=upload.cleanup)
+
+async def process_pdf_file(
+    temp_file_path: str,
+    filename: Optional[str],
+    file_size: int,
+    method: str,
+    cache_key: Optional[str] = None
+) -> dict:
+    """Extração de um PDF já salvo em disco; o arquivo é removido ao final"""
+    temp_files = [temp_file_path]
     try:
-        # Criar arquivo temporário
-        suffix = f".{file.filename.split('.')[-1]}" if file.filename else ".jpg"
-        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as temp_file:
-            temp_file.write(content)
-            temp_file_path = temp_file.name
-            temp_files.append(temp_file_path)
-        
-        logger.info(f"Processando OCR: {file.filename} ({len(content)} bytes)")
+        logger.info(f"Processando PDF: {filename} ({file_size} bytes)")
         
         # Extrair texto
-        result = extract_text_from_image(temp_file_path, method)
+        pdf = await load_capability("pdf")
+        result = await run_ocr(pdf.extract_text_from_pdf, temp_file_path, method)
         
         # Preparar resposta
         response = {
             **result,
-            "filename": file.filename,
-            "file_size": len(content),
+            "filename": filename,
+            "file_size": file_size,
             "cached": False
         }
         
         # Salvar no cache
-        if use_cache:
-            transcription_cache[cache_key] = response.copy()
-            transcription_cache[cache_key]["cached"] = True
+        if cache_key:
+            await store_cached_result(cache_key, response)
         
-        logger.info("OCR concluído com sucesso")
+        logger.info("Extração de PDF concluída com sucesso")
         return response
         
     except Exception as e:
-        logger.error(f"Erro no OCR: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Erro no OCR: {str(e)}")
+        logger.error(f"Erro ao processar PDF: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Erro ao processar PDF: {str(e)}")
     
     finally:
         # Limpar arquivos temporários
@@ -646,56 +1448,69 @@ async def extract_pdf(
     - **use_cache**: Usar cache de resultados
     """
     
-    content = await file.read()
-    if len(content) > MAX_FILE_SIZE:
-        raise HTTPException(
-            status_code=413,
-            detail=f"Arquivo muito grande. Máximo: {MAX_FILE_SIZE // (1024*1024)}MB"
-        )
+    capabilities.check("pdf")
+    if not file.filename.lower().endswith('.pdf'):
+        raise HTTPException(status_code=400, detail="Arquivo deve ser um PDF")
+    
+    upload = await receive_upload(file, '.pdf')
     
     # Verificar cache
-    file_hash = get_file_hash(content)
-    cache_key = f"pdf_{file_hash}_{method}"
+    cache_key = f"pdf_{upload.file_hash}_{method}"
     
-    if use_cache and cache_key in transcription_cache:
+    cached = await get_cached_result(cache_key) if use_cache else None
+    if cached is not None:
         logger.info(f"PDF encontrado no cache para {file.filename}")
-        return transcription_cache[cache_key]
-    
-    if not file.filename.lower().endswith('.pdf'):
-        raise HTTPException(status_code=400, detail="Arquivo deve ser um PDF")
+        upload.cleanup()
+        return cached
     
-    temp_files = []
+    # Cópias idênticas em andamento aguardam a primeira extração
+    return await inflight.run(cache_key, functools.partial(
+        process_pdf_file,
+        upload.path,
+        filename=file.filename,
+        file_size=upload.size,
+        method=method,
+        cache_key=cache_key if use_cache else None
+    ), on_join=upload.cleanup)
+
+async def process_document_file(
+    temp_file_path: str,
+    filename: Optional[str],
+    file_size: int,
+    suffix: str,
+    cache_key: Optional[str] = None
+) -> dict:
+    """Extração de um documento Office já salvo em disco; o arquivo é removido ao final"""
+    temp_files = [temp_file_path]
     try:
-        # Criar arquivo temporário
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as temp_file:
-            temp_file.write(content)
-            temp_file_path = temp_file.name
-            temp_files.append(temp_file_path)
+        logger.info(f"Processando documento: {filename} ({file_size} bytes)")
         
-        logger.info(f"Processando PDF: {file.filename} ({len(content)} bytes)")
-        
-        # Extrair texto
-        result = extract_text_from_pdf(temp_file_path, method)
+        # Extrair texto baseado no tipo
+        extractor = (await load_capability("documents")).EXTRACTORS.get(suffix)
+        if extractor is None:
+            raise HTTPException(status_code=400, detail="Tipo de documento não suportado")
+        # python-docx/openpyxl/python-pptx são síncronos: fora do event loop
+        result = await asyncio.to_thread(extractor, temp_file_path)
         
         # Preparar resposta
         response = {
             **result,
-            "filename": file.filename,
-            "file_size": len(content),
+            "filename": filename,
+            "file_size": file_size,
+            "document_type": suffix[1:],
             "cached": False
         }
         
         # Salvar no cache
-        if use_cache:
-            transcription_cache[cache_key] = response.copy()
-            transcription_cache[cache_key]["cached"] = True
+        if cache_key:
+            await store_cached_result(cache_key, response)
         
-        logger.info("Extração de PDF concluída com sucesso")
+        logger.info("Extração de documento concluída com sucesso")
         return response
         
     except Exception as e:
-        logger.error(f"Erro ao processar PDF: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Erro ao processar PDF: {str(e)}")
+        logger.error(f"Erro ao processar documento: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Erro ao processar documento: {str(e)}")
     
     finally:
         # Limpar arquivos temporários
@@ -718,20 +1533,7 @@ async def extract_document(
     - **use_cache**: Usar cache de resultados
     """
     
-    content = await file.read()
-    if len(content) > MAX_FILE_SIZE:
-        raise HTTPException(
-            status_code=413,
-            detail=f"Arquivo muito grande. Máximo: {MAX_FILE_SIZE // (1024*1024)}MB"
-        )
-    
-    # Verificar cache
-    file_hash = get_file_hash(content)
-    cache_key = f"doc_{file_hash}"
-    
-    if use_cache and cache_key in transcription_cache:
-        logger.info(f"Documento encontrado no cache para {file.filename}")
-        return transcription_cache[cache_key]
+    capabilities.check("documents")
     
     # Determinar tipo de documento
     filename = file.filename.lower() if file.filename else ""
@@ -742,56 +1544,27 @@ async def extract_document(
             detail="Arquivo deve ser .docx, .xlsx ou .pptx"
         )
     
-    temp_files = []
-    try:
-        # Criar arquivo temporário
-        suffix = f".{filename.split('.')[-1]}"
-        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as temp_file:
-            temp_file.write(content)
-            temp_file_path = temp_file.name
-            temp_files.append(temp_file_path)
-        
-        logger.info(f"Processando documento: {file.filename} ({len(content)} bytes)")
-        
-        # Extrair texto baseado no tipo
-        if filename.endswith('.docx'):
-            result = extract_text_from_docx(temp_file_path)
-        elif filename.endswith('.xlsx'):
-            result = extract_text_from_excel(temp_file_path)
-        elif filename.endswith('.pptx'):
-            result = extract_text_from_pptx(temp_file_path)
-        else:
-            raise HTTPException(status_code=400, detail="Tipo de documento não suportado")
-        
-        # Preparar resposta
-        response = {
-            **result,
-            "filename": file.filename,
-            "file_size": len(content),
-            "document_type": suffix[1:],
-            "cached": False
-        }
-        
-        # Salvar no cache
-        if use_cache:
-            transcription_cache[cache_key] = response.copy()
-            transcription_cache[cache_key]["cached"] = True
-        
-        logger.info("Extração de documento concluída com sucesso")
-        return response
-        
-    except Exception as e:
-        logger.error(f"Erro ao processar documento: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Erro ao processar documento: {str(e)}")
+    suffix = f".{filename.split('.')[-1]}"
+    upload = await receive_upload(file, suffix)
     
-    finally:
-        # Limpar arquivos temporários
-        for temp_path in temp_files:
-            try:
-                if os.path.exists(temp_path):
-                    os.unlink(temp_path)
-            except Exception as e:
-                logger.warning(f"Erro ao limpar arquivo {temp_path}: {e}")
+    # Verificar cache
+    cache_key = f"doc_{upload.file_hash}"
+    
+    cached = await get_cached_result(cache_key) if use_cache else None
+    if cached is not None:
+        logger.info(f"Documento encontrado no cache para {file.filename}")
+        upload.cleanup()
+        return cached
+    
+    # Cópias idênticas em andamento aguardam a primeira extração
+    return await inflight.run(cache_key, functools.partial(
+        process_document_file,
+        upload.path,
+        filename=file.filename,
+        file_size=upload.size,
+        suffix=suffix,
+        cache_key=cache_key if use_cache else None
+    ), on_join=upload.cleanup)
 
 @app.post("/extract/auto")
 async def extract_auto(
@@ -843,14 +1616,11 @@ if __name__ == "__main__":
     
     try:
         # Verificar se consegue carregar as dependências principais
-        print("📦 Carregando dependências...")
-        import torch
-        print(f"🔥 PyTorch: {torch.__version__}")
+        # Dependências pesadas (torch, OCR, PDF, Office) são importadas sob demanda
+        print(f"🧩 Capacidades: {', '.join(ENABLED_CAPABILITIES)}")
         
-        print("🎵 Carregando modelos Whisper...")
-        # Carregar apenas modelo tiny inicialmente para economizar memória
-        whisper_models["tiny"] = whisper.load_model("tiny")
-        print("✅ Modelo 'tiny' carregado!")
+        # Os modelos são aquecidos em segundo plano depois que o servidor sobe
+        print(f"🎵 Modelos Whisper a aquecer: {', '.join(WARMUP_MODEL_KEYS)}")
         
         print("🌐 Iniciando servidor...")
         uvicorn.run(
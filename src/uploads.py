@@ -0,0 +1,99 @@
+"""
+Recebimento de uploads em streaming.
+
+O arquivo é gravado em disco em blocos de CHUNK_SIZE enquanto o hash do
+cache é calculado incrementalmente, sem manter o conteúdo inteiro em
+memória. Uploads acima do limite são rejeitados assim que o ultrapassam.
+"""
+import hashlib
+import logging
+import os
+import tempfile
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+import aiofiles
+from fastapi import HTTPException, UploadFile
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SpooledUpload:
+    """Upload já gravado em disco"""
+    path: str
+    size: int
+    file_hash: str
+    read_seconds: float = 0.0  # recebimento + gravação em disco
+    hash_seconds: float = 0.0
+
+    def cleanup(self):
+        try:
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+        except Exception as e:
+            logger.warning(f"Erro ao limpar arquivo {self.path}: {e}")
+
+
+def file_too_large(max_size: int) -> HTTPException:
+    return HTTPException(
+        status_code=413,
+        detail=f"Arquivo muito grande. Máximo: {max_size // (1024*1024)}MB"
+    )
+
+
+def upload_suffix(filename: Optional[str], default: str = ".tmp") -> str:
+    """Extensão do arquivo temporário baseada no nome original"""
+    return f".{filename.split('.')[-1]}" if filename and '.' in filename else default
+
+
+async def spool_upload(
+    file: UploadFile,
+    max_size: int,
+    chunk_size: int,
+    suffix: str = ".tmp"
+) -> SpooledUpload:
+    """Grava o upload em um arquivo temporário calculando o hash MD5 em streaming"""
+    md5 = hashlib.md5()
+    size = 0
+    hash_seconds = 0.0
+    start = time.perf_counter()
+
+    fd, path = tempfile.mkstemp(suffix=suffix)
+    os.close(fd)
+    try:
+        async with aiofiles.open(path, "wb") as out:
+            while True:
+                chunk = await file.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_size:
+                    raise file_too_large(max_size)
+                hash_start = time.perf_counter()
+                md5.update(chunk)
+                hash_seconds += time.perf_counter() - hash_start
+                await out.write(chunk)
+    except BaseException:
+        os.unlink(path)
+        raise
+
+    return SpooledUpload(
+        path=path,
+        size=size,
+        file_hash=md5.hexdigest(),
+        read_seconds=time.perf_counter() - start - hash_seconds,
+        hash_seconds=hash_seconds
+    )
+
+
+def is_oversized_request(content_length: Optional[str], max_size: int, overhead: int = 64 * 1024) -> bool:
+    """
+    Verifica o Content-Length antes de o corpo multipart ser lido.
+    A margem cobre os cabeçalhos das partes do formulário.
+    """
+    try:
+        return int(content_length) > max_size + overhead
+    except (TypeError, ValueError):
+        return False
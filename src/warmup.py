@@ -0,0 +1,80 @@
+"""
+Aquecimento em segundo plano (modelos Whisper, leitor de OCR).
+
+O servidor aceita conexões logo ao subir; os itens são carregados em
+threads próprias, na ordem em que foram adicionados e até `concurrency`
+ao mesmo tempo. O estado de cada item alimenta a sonda de prontidão
+(/ready): a instância fica pronta quando todos os itens obrigatórios
+estão carregados.
+"""
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+
+class Warmup:
+    """Carrega itens em segundo plano e acompanha a prontidão de cada um"""
+
+    def __init__(self, concurrency: int = 2):
+        self.concurrency = max(1, concurrency)
+        self.items: Dict[str, dict] = {}
+        self.loaders: Dict[str, Callable[[], Any]] = {}
+        self.started = False
+        self.finished = False
+
+    def add(self, name: str, loader: Callable[[], Any], required: bool = True):
+        self.loaders[name] = loader
+        self.items[name] = {
+            "status": "pending",
+            "required": required,
+            "seconds": None,
+            "error": None
+        }
+
+    def _load(self, name: str):
+        item = self.items[name]
+        item["status"] = "loading"
+        start = time.time()
+        try:
+            self.loaders[name]()
+            item["status"] = "ready"
+        except Exception as e:
+            logger.error(f"Falha no aquecimento de {name}: {e}")
+            item["status"] = "failed"
+            item["error"] = str(e)
+        item["seconds"] = round(time.time() - start, 2)
+
+    async def run(self):
+        """Carrega todos os itens (pool próprio, encerrado ao final)"""
+        if self.started:
+            return
+        self.started = True
+        logger.info(f"Aquecendo em segundo plano: {', '.join(self.items)}")
+        loop = asyncio.get_running_loop()
+        # Pool descartável: nenhuma thread do aquecimento sobra para um fork posterior
+        executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="warmup")
+        try:
+            await asyncio.gather(*[
+                loop.run_in_executor(executor, self._load, name) for name in self.items
+            ])
+        finally:
+            executor.shutdown(wait=True)
+        self.finished = True
+        logger.info(f"Aquecimento concluído: {self.stats()['items']}")
+
+    @property
+    def ready(self) -> bool:
+        return self.finished and all(
+            item["status"] == "ready" for item in self.items.values() if item["required"]
+        )
+
+    def stats(self) -> dict:
+        return {
+            "ready": self.ready,
+            "finished": self.finished,
+            "items": {name: dict(item) for name, item in self.items.items()}
+        }
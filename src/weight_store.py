@@ -0,0 +1,121 @@
+"""
+Armazém local de pesos Whisper pré-serializados para carregamento por mmap.
+
+whisper.load_model desserializa o checkpoint (fp16) e copia cada tensor
+para a memória do processo, em todo processo que carrega o modelo. Aqui o
+checkpoint é convertido uma única vez para WEIGHT_STORE_DIR/<modelo>.pt:
+tensores já em fp32 (o dtype usado na CPU), incluindo os buffers que não
+entram no state_dict, num arquivo que torch.load(mmap=True) mapeia sem
+copiar. O modelo é montado no device "meta" (sem alocar nem inicializar
+pesos) e recebe os tensores mapeados. Processos e containers do mesmo host
+que usam o mesmo diretório compartilham as páginas pelo page cache.
+"""
+import fcntl
+import logging
+import os
+import time
+from dataclasses import asdict
+from pathlib import Path
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+WEIGHT_STORE_ENABLED = os.getenv("WEIGHT_STORE_ENABLED", "true").lower() == "true"
+WEIGHT_STORE_DIR = Path(os.getenv("WEIGHT_STORE_DIR", "./models"))
+
+# Muda quando o layout do arquivo muda: arquivos de outra versão são reconstruídos
+FORMAT_VERSION = 1
+
+
+def store_path(model_name: str) -> Path:
+    return WEIGHT_STORE_DIR / f"{model_name}.pt"
+
+
+def _convert(model_name: str, path: Path):
+    """Carrega o checkpoint original e grava a versão mapeável (escrita atômica)"""
+    import torch
+    import whisper
+
+    start = time.time()
+    model = whisper.load_model(model_name, device="cpu")
+    tensors, sparse = {}, []
+    for name, tensor in list(model.named_parameters()) + list(model.named_buffers()):
+        if tensor.is_sparse:
+            # Tensores esparsos (alignment_heads) não são mapeáveis: gravados densos
+            sparse.append(name)
+            tensor = tensor.to_dense()
+        tensors[name] = tensor.detach().contiguous()
+
+    tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+    torch.save({
+        "format": FORMAT_VERSION,
+        "dims": asdict(model.dims),
+        "tensors": tensors,
+        "sparse": sparse
+    }, tmp_path)
+    os.replace(tmp_path, path)
+    logger.info(f"Pesos de {model_name} convertidos para {path} em {time.time() - start:.1f}s")
+
+
+def _assemble(checkpoint: dict):
+    """Monta o modelo sem alocar pesos e liga cada tensor mapeado ao seu módulo"""
+    import torch
+    from torch import nn
+    from whisper.model import ModelDimensions, Whisper
+
+    with torch.device("meta"):
+        model = Whisper(ModelDimensions(**checkpoint["dims"]))
+
+    sparse = set(checkpoint["sparse"])
+    for name, tensor in checkpoint["tensors"].items():
+        module_name, _, attr = name.rpartition(".")
+        module = model.get_submodule(module_name)
+        if name in sparse:
+            tensor = tensor.to_sparse()
+        if attr in module._parameters:
+            module._parameters[attr] = nn.Parameter(tensor, requires_grad=False)
+        else:
+            module._buffers[attr] = tensor
+
+    missing = [name for name, t in list(model.named_parameters()) + list(model.named_buffers()) if t.is_meta]
+    if missing:
+        raise ValueError(f"Tensores ausentes no armazém: {', '.join(missing[:5])}")
+    return model.eval()
+
+
+def load_model(model_name: str):
+    """Modelo Whisper a partir do armazém (convertendo na primeira vez)"""
+    import torch
+
+    path = store_path(model_name)
+    if not path.exists():
+        WEIGHT_STORE_DIR.mkdir(parents=True, exist_ok=True)
+        # Um processo converte; os demais (inclusive de outros containers) esperam o arquivo
+        with open(path.with_suffix(".lock"), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            if not path.exists():
+                _convert(model_name, path)
+
+    start = time.time()
+    checkpoint = torch.load(path, mmap=True, weights_only=True, map_location="cpu")
+    if checkpoint.get("format") != FORMAT_VERSION:
+        logger.info(f"Armazém de {model_name} em formato antigo; reconvertendo")
+        path.unlink(missing_ok=True)
+        return load_model(model_name)
+    model = _assemble(checkpoint)
+    logger.info(f"Modelo {model_name} mapeado de {path} em {(time.time() - start) * 1000:.0f}ms")
+    return model
+
+
+def load_whisper(model_name: str, device: Optional[str] = None):
+    """Loader padrão: armazém mapeado na CPU, ou whisper.load_model (GPU, desabilitado, falha)"""
+    import torch
+    import whisper
+
+    on_cpu = device == "cpu" or (device is None and not torch.cuda.is_available())
+    if WEIGHT_STORE_ENABLED and on_cpu and model_name in whisper.available_models():
+        try:
+            return load_model(model_name)
+        except Exception as e:
+            logger.warning(f"Armazém de pesos indisponível para {model_name}, usando o checkpoint: {e}")
+    return whisper.load_model(model_name, device=device)
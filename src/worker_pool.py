@@ -0,0 +1,231 @@
+"""
+Pool de processos de inferência pré-criados via fork.
+
+O processo principal carrega os modelos uma única vez e faz fork de N
+workers, que herdam os pesos por copy-on-write (as páginas dos tensores
+não são escritas durante a inferência e continuam compartilhadas). O
+FastAPI despacha as tarefas por filas de IPC e recebe os resultados em
+uma thread leitora que resolve os futures do event loop.
+"""
+import asyncio
+import gc
+import itertools
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def transcribe_with_model(model, audio, **options) -> dict:
+    """Tarefa padrão: model.transcribe (função de módulo, serializável por referência)"""
+    start = time.perf_counter()
+    result = model.transcribe(audio, **options)
+    # Só a inferência, sem fila nem carregamento: base do RTF do roteamento
+    result["inference_seconds"] = time.perf_counter() - start
+    return result
+
+
+class WorkerCrashed(Exception):
+    """O processo que executava a tarefa terminou inesperadamente"""
+
+
+# Reposição de workers mortos: espera crescente enquanto continuarem morrendo
+# logo após subir (crash loop), de RESPAWN_BASE_DELAY até RESPAWN_MAX_DELAY
+RESPAWN_BASE_DELAY = 1.0
+RESPAWN_MAX_DELAY = 60.0
+# Um worker que viveu mais que isso zera a sequência de falhas
+RESPAWN_STABLE_SECONDS = 60.0
+
+
+def _worker_main(registry, tasks, results, threads: int):
+    import torch
+
+    # Workers repostos nascem de um fork com outras threads do pai ativas:
+    # os locks do registro podem ter sido copiados travados
+    if hasattr(registry, "lock"):
+        registry.lock = threading.Lock()
+        registry.load_locks = {}
+    torch.set_num_threads(threads)
+    pid = os.getpid()
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        task_id, model_name, func, args, kwargs = task
+        results.put(("start", task_id, pid))
+        try:
+            output = func(registry.get(model_name), *args, **kwargs)
+            results.put(("done", task_id, output))
+        except Exception as e:
+            results.put(("error", task_id, f"{type(e).__name__}: {e}"))
+
+
+class ForkedWorkerPool:
+    """Workers de inferência que compartilham os pesos dos modelos do processo pai"""
+
+    def __init__(self, num_workers: int, threads_per_worker: int = 1):
+        self.num_workers = num_workers
+        self.threads_per_worker = threads_per_worker
+        self.processes = []
+        self.tasks = None
+        self.results = None
+        self.pending: Dict[int, tuple] = {}
+        self.running: Dict[int, int] = {}  # pid -> task_id
+        self.task_ids = itertools.count()
+        self.lock = threading.Lock()
+        self.reader: Optional[threading.Thread] = None
+        self.stopping = False
+        self.registry = None
+        self.ctx = None
+        self.started_at: Dict[int, float] = {}  # pid -> instante do fork
+        self.respawn_due: list = []  # instantes em que um worker deve ser reposto
+        self.consecutive_crashes = 0
+        self.respawns = 0
+
+    def start(self, registry):
+        """
+        Faz o fork dos workers; deve ser chamado antes de qualquer inferência no pai.
+        Os modelos já carregados no registro são compartilhados; os demais são
+        carregados sob demanda em cada worker.
+        """
+        self.ctx = multiprocessing.get_context("fork")
+        self.registry = registry
+        self.tasks = self.ctx.Queue()
+        self.results = self.ctx.Queue()
+
+        # Move os objetos já criados para a geração permanente do GC, evitando
+        # que as coletas nos filhos toquem (e copiem) as páginas herdadas
+        gc.collect()
+        gc.freeze()
+
+        for _ in range(self.num_workers):
+            self._spawn()
+
+        self.reader = threading.Thread(target=self._read_results, daemon=True)
+        self.reader.start()
+        logger.info(
+            f"{self.num_workers} workers de inferência iniciados "
+            f"({self.threads_per_worker} threads cada): {[p.pid for p in self.processes]}"
+        )
+
+    def _spawn(self):
+        process = self.ctx.Process(
+            target=_worker_main,
+            args=(self.registry, self.tasks, self.results, self.threads_per_worker),
+            daemon=True
+        )
+        process.start()
+        self.processes.append(process)
+        self.started_at[process.pid] = time.monotonic()
+        return process
+
+    async def run(self, model_name: str, func: Callable, *args, **kwargs) -> Any:
+        """Despacha func(model, *args, **kwargs) para um worker e aguarda o resultado"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        task_id = next(self.task_ids)
+        with self.lock:
+            self.pending[task_id] = (loop, future)
+        self.tasks.put((task_id, model_name, func, args, kwargs))
+        return await future
+
+    def _resolve(self, task_id: int, result=None, error: Optional[Exception] = None):
+        with self.lock:
+            entry = self.pending.pop(task_id, None)
+        if entry is None:
+            return
+        loop, future = entry
+
+        def set_result():
+            if future.done():
+                return
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+        loop.call_soon_threadsafe(set_result)
+
+    def _read_results(self):
+        while not self.stopping:
+            try:
+                kind, task_id, payload = self.results.get(timeout=1)
+            except queue.Empty:
+                self._check_workers()
+                continue
+            except (EOFError, OSError):
+                break
+
+            if kind == "start":
+                self.running[payload] = task_id
+            elif kind == "done":
+                self._finish_running(task_id)
+                self._resolve(task_id, result=payload)
+            else:
+                self._finish_running(task_id)
+                self._resolve(task_id, error=RuntimeError(payload))
+            self._check_workers()
+
+    def _finish_running(self, task_id: int):
+        for pid, running_id in list(self.running.items()):
+            if running_id == task_id:
+                del self.running[pid]
+
+    def _check_workers(self):
+        """Falha as tarefas de workers que morreram (ex.: OOM kill) e agenda a reposição"""
+        now = time.monotonic()
+        for process in list(self.processes):
+            if process.is_alive():
+                continue
+            logger.error(f"Worker de inferência {process.pid} terminou (exitcode {process.exitcode})")
+            self.processes.remove(process)
+            task_id = self.running.pop(process.pid, None)
+            if task_id is not None:
+                self._resolve(task_id, error=WorkerCrashed(f"Worker {process.pid} terminou durante a tarefa"))
+
+            lived = now - self.started_at.pop(process.pid, now)
+            if lived >= RESPAWN_STABLE_SECONDS:
+                self.consecutive_crashes = 0
+            self.consecutive_crashes += 1
+            delay = min(RESPAWN_BASE_DELAY * 2 ** (self.consecutive_crashes - 1), RESPAWN_MAX_DELAY)
+            logger.warning(f"Worker de inferência será reposto em {delay:.0f}s")
+            self.respawn_due.append(now + delay)
+
+        for due in sorted(self.respawn_due):
+            if due > now or self.stopping:
+                break
+            self.respawn_due.remove(due)
+            process = self._spawn()
+            self.respawns += 1
+            logger.info(f"Worker de inferência reposto: {process.pid}")
+
+        if not self.processes and self.pending:
+            # Sem workers vivos, as tarefas enfileiradas nunca seriam executadas
+            for task_id in list(self.pending):
+                self._resolve(task_id, error=WorkerCrashed("Nenhum worker de inferência disponível"))
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.num_workers,
+            "alive": sum(1 for p in self.processes if p.is_alive()),
+            "threads_per_worker": self.threads_per_worker,
+            "respawns": self.respawns,
+            "respawn_pending": len(self.respawn_due),
+            "pending": len(self.pending),
+            "running": len(self.running)
+        }
+
+    def shutdown(self):
+        self.stopping = True
+        for _ in self.processes:
+            self.tasks.put(None)
+        for process in self.processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        self.processes = []